@@ -24,9 +24,12 @@ from ..utils.datatype_helpers import (
     write_pseudos,
 )
 from ..utils import Cp2kInput
+from ..utils import output_summary
 
+ArrayData = DataFactory('array')  # pylint: disable=invalid-name
 BandsData = DataFactory('array.bands')  # pylint: disable=invalid-name
 StructureData = DataFactory('structure')  # pylint: disable=invalid-name
+TrajectoryData = DataFactory('array.trajectory')  # pylint: disable=invalid-name
 KpointsData = DataFactory('array.kpoints')  # pylint: disable=invalid-name
 
 
@@ -42,7 +45,19 @@ class Cp2kCalculation(CalcJob):
     _DEFAULT_PROJECT_NAME = 'aiida'
     _DEFAULT_RESTART_FILE_NAME = _DEFAULT_PROJECT_NAME + '-1.restart'
     _DEFAULT_TRAJECT_FILE_NAME = _DEFAULT_PROJECT_NAME + '-pos-1.dcd'
+    _DEFAULT_XYZ_TRAJECT_FILE_NAME = _DEFAULT_PROJECT_NAME + '-pos-1.xyz'
+    _DEFAULT_MD_TABLE_FILE_NAMES = {
+        'ener': _DEFAULT_PROJECT_NAME + '-1.ener',
+        'cell': _DEFAULT_PROJECT_NAME + '-1.cell',
+        'stress': _DEFAULT_PROJECT_NAME + '-1.stress',
+    }
+    _DEFAULT_PDOS_FILE_NAME = _DEFAULT_PROJECT_NAME + '-*k*-1.pdos'  # One file per atomic kind and spin
+    _DEFAULT_CUBE_FILE_NAME = _DEFAULT_PROJECT_NAME + '-*.cube'
+    _DEFAULT_SUMMARY_SCRIPT = 'aiida_cp2k_summary.py'
+    _DEFAULT_SUMMARY_FILE_NAME = _DEFAULT_PROJECT_NAME + '-summary.out'
+    _DEFAULT_SUMMARY_STEPS_FILE_NAME = _DEFAULT_PROJECT_NAME + '-summary-steps.npz'
     _DEFAULT_PARENT_CALC_FLDR_NAME = 'parent_calc/'
+    _DEFAULT_OVERSIZED_FLDR_NAME = 'oversized/'
     _DEFAULT_COORDS_FILE_NAME = 'aiida.coords.xyz'
     _DEFAULT_PARSER = 'cp2k_base_parser'
 
@@ -110,13 +125,22 @@ class Cp2kCalculation(CalcJob):
         spec.exit_code(302, 'ERROR_OUTPUT_PARSE', message='The output file could not be parsed.')
         spec.exit_code(303, 'ERROR_OUTPUT_INCOMPLETE', message='The output file was incomplete.')
         spec.exit_code(304, 'ERROR_OUTPUT_CONTAINS_ABORT', message='The output file contains the word "ABORT".')
+        spec.exit_code(305, 'ERROR_OUT_OF_MEMORY', message='CP2K ran out of memory.')
+        spec.exit_code(306, 'ERROR_MPI_ABORT', message='CP2K was stopped by an MPI abort.')
+        spec.exit_code(307,
+                       'ERROR_CHOLESKY_FAILED',
+                       message='A Cholesky decomposition failed: the matrix is not positive definite.')
         spec.exit_code(312, 'ERROR_STRUCTURE_PARSE', message='The output structure could not be parsed.')
+        spec.exit_code(313, 'ERROR_TRAJECTORY_PARSE', message='The output trajectory could not be parsed.')
         spec.exit_code(350, 'ERROR_UNEXPECTED_PARSER_EXCEPTION', message='The parser raised an unexpected exception.')
 
         # Significant errors but calculation can be used to restart.
         spec.exit_code(400,
                        'ERROR_OUT_OF_WALLTIME',
                        message='The calculation stopped prematurely because it ran out of walltime.')
+        spec.exit_code(450,
+                       'ERROR_SCF_NOT_CONVERGED',
+                       message='CP2K stopped because the SCF cycle did not converge for the given thresholds.')
         spec.exit_code(500,
                        'ERROR_GEOMETRY_CONVERGENCE_NOT_REACHED',
                        message='The ionic minimization cycle did not converge for the given thresholds.')
@@ -128,6 +152,44 @@ class Cp2kCalculation(CalcJob):
                     help='The output dictionary containing results of the calculation.')
         spec.output('output_structure', valid_type=StructureData, required=False, help='The relaxed output structure.')
         spec.output('output_bands', valid_type=BandsData, required=False, help='Computed electronic band structure.')
+        spec.output('output_trajectory',
+                    valid_type=TrajectoryData,
+                    required=False,
+                    help='The trajectory read from the DCD file or, if retrieved, the XYZ file.')
+
+        # Arrays parsed from the output and from the other retrieved files.
+        array_outputs = [
+            ('output_motion_step_info', 'Properties at every GEO_OPT, CELL_OPT or MD step (advanced parser).'),
+            ('output_atomic_forces',
+             'The atomic forces [a.u.] of every printed ATOMIC FORCES block (advanced parser).'),
+            ('output_stress', 'The stress tensor at every GEO_OPT, CELL_OPT or MD step (advanced parser).'),
+            ('output_population_analysis',
+             'The Mulliken and Hirshfeld charges and spin moments of every analysis (advanced parser).'),
+            ('output_scf_iterations', 'The table of every SCF iteration, as one array per column (advanced parser).'),
+            ('output_memory_usage',
+             'The memory of the nodes and the estimates of the peak memory of a process (advanced parser).'),
+            ('output_fragment_energies',
+             'The configuration and energy of every fragment of a BSSE run (advanced parser).'),
+            ('output_force_eval_energies', 'The energy printed by every FORCE_EVAL of a MIXED run (advanced parser).'),
+            ('output_tools_blocks',
+             'The blocks printed at every step, as columns (streaming mode of cp2k_tools_parser).'),
+            ('output_md_ener', 'The energies and temperature at every MD step, from the .ener file.'),
+            ('output_md_cell', 'The cell at every MD step, from the .cell file.'),
+            ('output_md_stress', 'The stress tensor at every MD step, from the .stress file.'),
+            ('output_pdos',
+             'The projected densities of states of all the atomic kinds and spins, from the .pdos files.'),
+            ('output_timing', 'The timing report of CP2K: calls and self/total time of every subroutine.'),
+            ('output_summary_steps',
+             'The energies, SCF steps and optimization gradients at every step, if the output was summarised.'),
+        ]
+        for name, help_string in array_outputs:
+            spec.output(name, valid_type=ArrayData, required=False, help=help_string)
+
+        spec.output_namespace('output_cubes',
+                              valid_type=ArrayData,
+                              required=False,
+                              dynamic=True,
+                              help='The grids of the cube files (densities, potentials, ...) as NumPy binary files.')
         spec.default_output_node = 'output_parameters'
 
         spec.outputs.dynamic = True
@@ -213,10 +275,21 @@ class Cp2kCalculation(CalcJob):
                 elif isinstance(obj, StructureData):
                     self._write_structure(obj, folder, name + '.xyz')
 
-        calcinfo.retrieve_list = [
-            self._DEFAULT_OUTPUT_FILE, self._DEFAULT_RESTART_FILE_NAME, self._DEFAULT_TRAJECT_FILE_NAME
-        ]
-        calcinfo.retrieve_list += settings.pop('additional_retrieve_list', [])
+        calcinfo.retrieve_list, calcinfo.retrieve_temporary_list = self._get_retrieve_lists(settings)
+
+        # The output is summarised on the remote computer and only the summary is retrieved, unless the summary could
+        # not be written: the output is then retrieved instead.
+        summarize = settings.pop('summarize_output', False)
+        if summarize:
+            calcinfo.prepend_text = self._write_summary_script(folder, {} if summarize is True else dict(summarize))
+            calcinfo.retrieve_list[1:1] = [self._DEFAULT_SUMMARY_FILE_NAME, self._DEFAULT_SUMMARY_STEPS_FILE_NAME]
+        # Files larger than their limit are moved aside on the remote computer before the retrieval.
+        max_sizes = settings.pop('retrieve_max_size', {})
+        if max_sizes:
+            calcinfo.append_text = "\n".join(filter(None, [calcinfo.append_text, self._limit_sizes(max_sizes)]))
+
+        # Options of the parser, read by the parser from the settings input node.
+        settings.pop('parser_options', None)
 
         # Symlinks.
         calcinfo.remote_symlink_list = []
@@ -241,6 +314,92 @@ class Cp2kCalculation(CalcJob):
 
         return calcinfo
 
+    def _get_retrieve_lists(self, settings):
+        """Return the lists of the files to retrieve and of the files to retrieve only temporarily, for parsing.
+
+        :param settings: the settings, from which the keys defining the retrieved files are popped.
+        """
+
+        retrieve_list = [self._DEFAULT_OUTPUT_FILE, self._DEFAULT_RESTART_FILE_NAME, self._DEFAULT_TRAJECT_FILE_NAME]
+        retrieve_list += settings.pop('additional_retrieve_list', [])
+
+        # The cube files are optional and only needed by the parser, which stores their grids in binary form.
+        retrieve_temporary_list = []
+        if settings.pop('retrieve_cubes', False):
+            retrieve_temporary_list.append(self._DEFAULT_CUBE_FILE_NAME)
+
+        # The MD tables, the PDOS files and the XYZ trajectory are optional and only needed by the parser, which
+        # stores them as arrays.
+        if settings.pop('retrieve_md_tables', False):
+            retrieve_temporary_list += list(self._DEFAULT_MD_TABLE_FILE_NAMES.values())
+        if settings.pop('retrieve_pdos', False):
+            retrieve_temporary_list.append(self._DEFAULT_PDOS_FILE_NAME)
+        if settings.pop('retrieve_xyz', False):
+            retrieve_temporary_list.append(self._DEFAULT_XYZ_TRAJECT_FILE_NAME)
+
+        # With the 'compact' profile, all the files that are parsed into outputs are only retrieved temporarily.
+        profile = settings.pop('retrieve_profile', 'default')
+        if profile not in ('default', 'compact'):
+            raise InputValidationError(f"Unknown retrieve_profile '{profile}', should be 'default' or 'compact'.")
+        if profile == 'compact':
+            parsed = [self._DEFAULT_RESTART_FILE_NAME, self._DEFAULT_TRAJECT_FILE_NAME]
+            retrieve_temporary_list += [fname for fname in retrieve_list if fname in parsed]
+            retrieve_list = [fname for fname in retrieve_list if fname not in parsed]
+        retrieve_temporary_list += settings.pop('additional_retrieve_temporary_list', [])
+
+        return retrieve_list, retrieve_temporary_list
+
+    def _write_summary_script(self, folder, options):
+        """Write the script that summarises the output on the remote computer, return the commands that run it.
+
+        The script is run by a trap on the exit of the job script, so that the summary is also written if the job is
+        stopped by a SIGTERM, e.g. at the end of its walltime. Once the summary is written, the output is moved to the
+        oversized folder, where it is kept but not retrieved.
+
+        :param options: 'python' (the Python 3 interpreter on the remote computer, 'python3' by default), 'head_size'
+            and 'tail_size' (the sizes in bytes of the beginning and of the end of the output kept in the summary).
+        """
+        import inspect
+
+        python = options.pop('python', 'python3')
+        head_size = int(options.pop('head_size', output_summary.DEFAULT_HEAD_SIZE))
+        tail_size = int(options.pop('tail_size', output_summary.DEFAULT_TAIL_SIZE))
+        if options:
+            raise InputValidationError(
+                "The following keys of 'summarize_output' in the settings were not understood: " +
+                ",".join(options.keys()))
+
+        with io.open(folder.get_abs_path(self._DEFAULT_SUMMARY_SCRIPT), mode="w", encoding="utf-8") as fobj:
+            fobj.write(inspect.getsource(output_summary))
+
+        oversized = self._DEFAULT_OVERSIZED_FLDR_NAME
+        command = (f"{python} {self._DEFAULT_SUMMARY_SCRIPT} {self._DEFAULT_OUTPUT_FILE}"
+                   f" --summary {self._DEFAULT_SUMMARY_FILE_NAME} --steps {self._DEFAULT_SUMMARY_STEPS_FILE_NAME}"
+                   f" --head-size {head_size} --tail-size {tail_size}"
+                   f" && mkdir -p {oversized} && mv {self._DEFAULT_OUTPUT_FILE} {oversized}")
+        return f"trap '{command}' EXIT\ntrap 'exit 143' TERM"
+
+    def _limit_sizes(self, max_sizes):
+        """Return the commands that move the files larger than their limit to the oversized folder, where they are kept
+        on the remote computer but not retrieved.
+
+        :param max_sizes: dictionary of glob patterns, relative to the working directory, and maximum sizes in bytes.
+        """
+        import shlex
+        from fnmatch import fnmatch
+
+        protected = [self._DEFAULT_OUTPUT_FILE, self._DEFAULT_SUMMARY_FILE_NAME, self._DEFAULT_SUMMARY_STEPS_FILE_NAME]
+        folder = self._DEFAULT_OVERSIZED_FLDR_NAME
+        commands = []
+        for pattern, max_size in sorted(max_sizes.items()):
+            if any(fnmatch(fname, pattern) for fname in protected):
+                raise InputValidationError(
+                    f"The size of the output of CP2K can not be limited, '{pattern}' matches it.")
+            # The depth of the search is that of the pattern, so that the files already moved are not found again.
+            commands.append(f"find . -maxdepth {pattern.count('/') + 1} -type f -path {shlex.quote('./' + pattern)} "
+                            f"-size +{int(max_size)}c -exec sh -c 'mkdir -p {folder} && mv \"$@\" {folder}' sh {{}} +")
+        return "\n".join(commands)
+
     @staticmethod
     def _write_structure(structure, folder, name):
         """Function that writes a structure and takes care of element tags."""
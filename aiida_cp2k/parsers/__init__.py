@@ -9,6 +9,7 @@
 
 import io
 import os
+from functools import partial
 from aiida.common import exceptions
 
 from aiida.parsers import Parser
@@ -19,11 +20,23 @@ from aiida.plugins import DataFactory
 
 StructureData = DataFactory('structure')  # pylint: disable=invalid-name
 BandsData = DataFactory('array.bands')  # pylint: disable=invalid-name
+ArrayData = DataFactory('array')  # pylint: disable=invalid-name
+TrajectoryData = DataFactory('array.trajectory')  # pylint: disable=invalid-name
 
 
 class Cp2kBaseParser(Parser):
     """Basic AiiDA parser for the output of CP2K."""
 
+    # Folder of the files only retrieved for parsing (see `retrieve_temporary_list`), None if there is none.
+    _temporary_folder = None
+
+    # End of the output and termination of CP2K, read once per parse (see `_get_termination`).
+    _output_tail = None
+    _termination = None
+
+    # Tables of the MD run, read once per parse (see `_read_md_table`).
+    _md_tables = None
+
     def parse(self, **kwargs):
         """Receives in input a dictionary of retrieved nodes. Does all the logic here."""
 
@@ -31,11 +44,35 @@ class Cp2kBaseParser(Parser):
             _ = self.retrieved
         except exceptions.NotExistent:
             return self.exit_codes.ERROR_NO_RETRIEVED_FOLDER
-
-        exit_code = self._parse_stdout()
+        self._temporary_folder = kwargs.get('retrieved_temporary_folder')
+        self._output_tail = self._termination = None
+        self._md_tables = {}
+
+        # The output may have been summarised on the remote computer, see the 'summarize_output' setting.
+        summary = self.node.process_class._DEFAULT_SUMMARY_FILE_NAME  # pylint: disable=protected-access
+        if self._get_output_filename() == summary:
+            exit_code = self._parse_summary()
+        else:
+            exit_code = self._parse_stdout()
         if exit_code is not None:
             return exit_code
 
+        for parse_outputs in (self._parse_structures, self._parse_tables):
+            exit_code = parse_outputs()
+            if exit_code is not None:
+                return exit_code
+
+        # Errors after which the calculation can be restarted (e.g. out of walltime) are only reported once all the
+        # outputs are parsed.
+        try:
+            termination = self._get_termination()
+        except IOError:
+            return self.exit_codes.ERROR_OUTPUT_READ
+        return self._get_exit_code(termination) or ExitCode(0)
+
+    def _parse_structures(self):
+        """Attach the final structure and the trajectory. Return an exit code in case of error, else None."""
+
         try:
             returned = self._parse_trajectory()
             if isinstance(returned, StructureData):
@@ -45,7 +82,151 @@ class Cp2kBaseParser(Parser):
         except exceptions.NotExistent:
             pass
 
-        return ExitCode(0)
+        # The trajectory is read from the DCD file or, if it was retrieved instead, from the XYZ file.
+        for parse_trajectory in (self._parse_dcd_trajectory, self._parse_xyz_trajectory):
+            try:
+                returned = parse_trajectory()
+                if isinstance(returned, TrajectoryData):
+                    self.out('output_trajectory', returned)
+                    break
+                return returned  # in case this is an error code
+            except exceptions.NotExistent:
+                pass
+
+        return None
+
+    def _parse_tables(self):
+        """Attach the timing report, the MD tables, the PDOS and the cube files. Return an exit code in case of error,
+        else None."""
+
+        outputs = [('output_timing', self._parse_timing)]
+        outputs += [(f'output_md_{kind}', partial(self._parse_md_table, kind)) for kind in ('ener', 'cell', 'stress')]
+        outputs += [('output_pdos', self._parse_pdos)]
+        for link_label, parse_table in outputs:
+            try:
+                returned = parse_table()
+                if isinstance(returned, ArrayData):
+                    self.out(link_label, returned)
+                else:  # in case this is an error code
+                    return returned
+            except exceptions.NotExistent:
+                pass
+
+        returned = self._parse_cubes()
+        if isinstance(returned, dict):
+            for key, arraydata in returned.items():
+                self.out(f'output_cubes.{key}', arraydata)
+        else:  # in case this is an error code
+            return returned
+
+        return None
+
+    def _get_structure(self):
+        """Return the output structure or else the input structure, None if there is none."""
+
+        if 'output_structure' in self.outputs:
+            return self.outputs.output_structure
+        try:
+            return self.node.inputs.structure
+        except (AttributeError, exceptions.NotExistent):
+            return None
+
+    def _get_symbols(self):
+        """Return the chemical symbols of the atoms, from the output structure or else from the input structure."""
+
+        structure = self._get_structure()
+        if structure is None:
+            return None
+        return structure.get_ase().get_chemical_symbols()
+
+    def _get_parser_options(self):
+        """Return the options of the parser, given as 'parser_options' in the settings of the calculation."""
+
+        try:
+            settings = self.node.inputs.settings.get_dict()
+        except (AttributeError, exceptions.NotExistent):
+            settings = {}
+        return settings.get('parser_options', {})
+
+    def _get_output_filename(self):
+        """Return the name of the retrieved output: the output of CP2K or, if it was summarised on the remote
+        computer (see the 'summarize_output' setting), its summary."""
+
+        fname = self.node.get_attribute('output_filename')
+        summary = self.node.process_class._DEFAULT_SUMMARY_FILE_NAME  # pylint: disable=protected-access
+        names = self.retrieved.list_object_names()
+        if fname not in names and summary in names:
+            return summary
+        return fname
+
+    def _list_retrieved(self):
+        """Return the names of the retrieved files, including the files only retrieved temporarily for parsing."""
+
+        fnames = set(self.retrieved.list_object_names())
+        if self._temporary_folder is not None:
+            fnames.update(os.listdir(self._temporary_folder))
+        return sorted(fnames)
+
+    def _open_retrieved(self, fname, mode='r'):
+        """Open a retrieved file, from the temporary folder if it was only retrieved temporarily for parsing."""
+
+        if self._temporary_folder is not None:
+            path = os.path.join(self._temporary_folder, fname)
+            if os.path.isfile(path):
+                return open(path, mode)
+        return self.retrieved.open(fname, mode)
+
+    def _parse_file(self, function, fname):
+        """Return `function` applied to the open retrieved file `fname`.
+
+        The result is taken from the parse cache, if it is configured (see `aiida_cp2k.utils.ParseCache`) and the same
+        file was already parsed by the same version of `function`.
+        """
+
+        from aiida_cp2k.utils import ParseCache, file_digest
+
+        cache = ParseCache.from_environment()
+        if cache is None:
+            with self._open_retrieved(fname) as handle:
+                return function(handle)
+
+        with self._open_retrieved(fname, 'rb') as handle:
+            digest = file_digest(handle)
+        with self._open_retrieved(fname) as handle:
+            return cache.parse(function, handle, digest=digest)
+
+    def _read_output_tail(self):
+        """Return the end of the output, read once per parse: it has the termination of CP2K and the timing report."""
+
+        from aiida_cp2k.utils import read_output_tail
+
+        if self._output_tail is None:
+            with self.retrieved.open(self._get_output_filename(), 'rb') as handle:
+                self._output_tail = read_output_tail(handle)
+        return self._output_tail
+
+    def _get_termination(self):
+        """Find out how CP2K terminated by reading the end of the output file.
+
+        If CP2K failed without a known error at the end of the output, the whole output is scanned, e.g. for an error
+        followed by a traceback longer than the end read.
+        """
+
+        from aiida_cp2k.utils import parse_cp2k_termination
+
+        if self._termination is None:
+            self._termination = parse_cp2k_termination(self._read_output_tail())
+            if self._termination["status"] in ("aborted", "truncated") and not self._termination["errors"]:
+                with self.retrieved.open(self._get_output_filename()) as handle:
+                    self._termination = parse_cp2k_termination(handle)
+        return self._termination
+
+    def _get_exit_code(self, termination):
+        """Return the exit code of the most severe error found at the end of the output, None if there is none."""
+
+        if termination["exit_code"] is None:
+            return None
+        return getattr(self.exit_codes, termination["exit_code"])
 
     def _parse_stdout(self):
         """Basic CP2K output file parser."""
@@ -55,22 +236,85 @@ class Cp2kBaseParser(Parser):
         fname = self.node.get_attribute('output_filename')
 
         if fname not in self.retrieved.list_object_names():
-            return self.exit_codes.ERROR_OUTPUT_STDOUT_MISSING
+            return self.exit_codes.ERROR_OUTPUT_MISSING
 
+        # Stream the output line by line: it can be several GB for long MD runs.
         try:
-            output_string = self.retrieved.get_object_content(fname)
+            termination = self._get_termination()
+            if termination["status"] in ("aborted", "truncated") and termination["exit_code"] is not None:
+                return self._get_exit_code(termination)
+            result_dict = self._parse_file(parse_cp2k_output, fname)
         except IOError:
-            return self.exit_codes.ERROR_OUTPUT_STDOUT_READ
+            return self.exit_codes.ERROR_OUTPUT_READ
+
+        if "aborted" in result_dict:
+            return self.exit_codes.ERROR_OUTPUT_CONTAINS_ABORT
+
+        result_dict["termination"] = termination
+        self.out("output_parameters", Dict(dict=result_dict))
+
+        return None
+
+    def _parse_summary(self):
+        """Parse the summary of the output written on the remote computer and the values printed at every step.
+
+        The summary only has the beginning and the end of the output: it is parsed by the basic parser whatever the
+        parser of the calculation, and the energy is the last one of the steps.
+        """
+
+        import numpy as np
+        from aiida_cp2k.utils import parse_cp2k_output
+
+        fname = self._get_output_filename()
+        steps_fname = self.node.process_class._DEFAULT_SUMMARY_STEPS_FILE_NAME  # pylint: disable=protected-access
 
-        result_dict = parse_cp2k_output(output_string)
+        try:
+            termination = self._get_termination()
+            if termination["status"] in ("aborted", "truncated") and termination["exit_code"] is not None:
+                return self._get_exit_code(termination)
+            result_dict = self._parse_file(parse_cp2k_output, fname)
+            with self.retrieved.open(steps_fname, 'rb') as handle, np.load(handle) as npz:
+                steps = {key: npz[key] for key in npz.files}
+        except (IOError, ValueError):
+            return self.exit_codes.ERROR_OUTPUT_READ
 
         if "aborted" in result_dict:
             return self.exit_codes.ERROR_OUTPUT_CONTAINS_ABORT
 
+        if steps['energy'].size:
+            result_dict["energy"] = float(steps['energy'][-1])
+            result_dict["energy_units"] = "a.u."
+        result_dict["termination"] = termination
+        result_dict["summarized_output"] = {
+            key: int(steps.pop(key)) for key in ('output_lines', 'output_bytes', 'removed_lines')
+        }
         self.out("output_parameters", Dict(dict=result_dict))
 
+        arraydata = ArrayData()
+        for key, array in steps.items():
+            arraydata.set_array(key, array)
+        self.out('output_summary_steps', arraydata)
+
         return None
 
+    def _parse_timing(self):
+        """Parse the timing report printed at the end of the output into an ArrayData, one entry per subroutine."""
+
+        from aiida_cp2k.utils import parse_cp2k_timing
+
+        try:
+            timing = parse_cp2k_timing(self._read_output_tail())
+        except IOError:
+            return self.exit_codes.ERROR_OUTPUT_READ
+
+        if timing is None:
+            raise exceptions.NotExistent("No timing report in the output")
+
+        arraydata = ArrayData()
+        for key, array in timing.items():
+            arraydata.set_array(key, array)
+        return arraydata
+
     def _parse_trajectory(self):
         """CP2K trajectory parser."""
 
@@ -80,16 +324,193 @@ class Cp2kBaseParser(Parser):
         fname = self.node.process_class._DEFAULT_RESTART_FILE_NAME  # pylint: disable=protected-access
 
         # Check if the restart file is present.
-        if fname not in self.retrieved.list_object_names():
+        if fname not in self._list_retrieved():
             raise exceptions.NotExistent("No restart file available, so the output trajectory can't be extracted")
 
         # Read the restart file.
         try:
-            output_string = self.retrieved.get_object_content(fname)
+            trajectory = self._parse_file(parse_cp2k_trajectory, fname)
+        except IOError:
+            return self.exit_codes.ERROR_OUTPUT_READ
+
+        return StructureData(ase=Atoms(**trajectory))
+
+    def _parse_dcd_trajectory(self):
+        """CP2K DCD trajectory parser.
+
+        The file is memory-mapped and only every `trajectory_stride`-th frame (see the parser options) is read. The
+        positions are kept within `trajectory_max_memory` MB, if given, by increasing the stride.
+        """
+
+        import numpy as np
+        from aiida_cp2k.utils import DcdTrajectory
+
+        fname = self.node.process_class._DEFAULT_TRAJECT_FILE_NAME  # pylint: disable=protected-access
+
+        if fname not in self._list_retrieved():
+            raise exceptions.NotExistent("No DCD file available, so the output trajectory can't be extracted")
+
+        symbols = self._get_symbols()
+        options = self._get_parser_options()
+        stride = options.get('trajectory_stride', 1)
+        max_memory = options.get('trajectory_max_memory')
+
+        try:
+            with self._open_retrieved(fname, 'rb') as handle:
+                dcd = DcdTrajectory(handle)
+                if symbols is None or len(symbols) != dcd.natoms or len(dcd) == 0:
+                    raise exceptions.NotExistent("The atoms of the DCD trajectory are not known")
+                # TrajectoryData only accepts positions in double precision: the memory bound accounts for it.
+                if max_memory:
+                    stride = dcd.fit_step(int(max_memory * 1024**2), stride, itemsize=8)
+                trajectory = TrajectoryData()
+                trajectory.set_trajectory(symbols,
+                                          dcd.get_positions(step=stride, dtype=np.float64),
+                                          stepids=dcd.get_stepids(step=stride),
+                                          cells=dcd.get_cells(step=stride))
+        except IOError:
+            return self.exit_codes.ERROR_OUTPUT_READ
+        except ValueError:
+            return self.exit_codes.ERROR_TRAJECTORY_PARSE
+
+        return trajectory
+
+    def _parse_xyz_trajectory(self):
+        """CP2K XYZ trajectory parser.
+
+        The file is streamed frame by frame and only every `trajectory_stride`-th frame is converted. The positions are
+        kept within `trajectory_max_memory` MB, if given (see the parser options), by increasing the stride.
+        """
+
+        import numpy as np
+        from aiida_cp2k.utils import parse_xyz_trajectory
+
+        fname = self.node.process_class._DEFAULT_XYZ_TRAJECT_FILE_NAME  # pylint: disable=protected-access
+
+        if fname not in self._list_retrieved():
+            raise exceptions.NotExistent("No XYZ file available, so the output trajectory can't be extracted")
+
+        options = self._get_parser_options()
+        max_memory = options.get('trajectory_max_memory')
+
+        try:
+            with self._open_retrieved(fname) as handle:
+                xyz = parse_xyz_trajectory(handle,
+                                           step=options.get('trajectory_stride', 1),
+                                           max_memory=int(max_memory * 1024**2) if max_memory else None)
         except IOError:
-            return self.exit_codes.ERROR_OUTPUT_STDOUT_READ
+            return self.exit_codes.ERROR_OUTPUT_READ
+        except ValueError:
+            return self.exit_codes.ERROR_TRAJECTORY_PARSE
+
+        if xyz is None:
+            raise exceptions.NotExistent("The XYZ trajectory is empty")
+
+        # The XYZ file has no cell: the one of the structure is used, if its atoms are the same.
+        symbols, cells = xyz['symbols'], None
+        structure = self._get_structure()
+        if structure is not None and len(structure.sites) == len(symbols):
+            symbols = structure.get_ase().get_chemical_symbols()
+            cells = np.repeat(np.array([structure.cell]), len(xyz['positions']), axis=0)
+
+        trajectory = TrajectoryData()
+        trajectory.set_trajectory(symbols,
+                                  xyz['positions'],
+                                  stepids=xyz['stepids'],
+                                  cells=cells,
+                                  times=None if np.isnan(xyz['times']).all() else xyz['times'])
+        if not np.isnan(xyz['energies']).all():
+            trajectory.set_array('energies', xyz['energies'])
+        return trajectory
+
+    def _read_md_table(self, kind):
+        """Return one of the tables written during MD runs ('ener', 'cell' or 'stress') as a dictionary of arrays, read
+        once per parse. Return None if it was not retrieved or is empty."""
+
+        from aiida_cp2k.utils import parse_cp2k_md_table
+
+        if kind not in self._md_tables:
+            fname = self.node.process_class._DEFAULT_MD_TABLE_FILE_NAMES[kind]  # pylint: disable=protected-access
+            table = None
+            if fname in self._list_retrieved():
+                with self._open_retrieved(fname) as handle:
+                    table = parse_cp2k_md_table(handle, kind)
+            self._md_tables[kind] = table
+        return self._md_tables[kind]
+
+    def _parse_md_table(self, kind):
+        """Load one of the tables written during MD runs ('ener', 'cell' or 'stress') into an ArrayData."""
 
-        return StructureData(ase=Atoms(**parse_cp2k_trajectory(output_string)))
+        try:
+            table = self._read_md_table(kind)
+        except IOError:
+            return self.exit_codes.ERROR_OUTPUT_READ
+        except ValueError:
+            return self.exit_codes.ERROR_OUTPUT_PARSE
+
+        if table is None:
+            raise exceptions.NotExistent(f"No .{kind} file available, or it is empty")
+
+        arraydata = ArrayData()
+        for key, array in table.items():
+            arraydata.set_array(key, array)
+        return arraydata
+
+    def _parse_pdos(self):
+        """Load the PDOS files of all the atomic kinds and spins, read concurrently, into a single ArrayData."""
+
+        from aiida_cp2k.utils import parse_cp2k_pdos
+
+        try:
+            pdos = parse_cp2k_pdos(self._list_retrieved(), open_file=self._open_retrieved)
+        except IOError:
+            return self.exit_codes.ERROR_OUTPUT_READ
+        except ValueError:
+            return self.exit_codes.ERROR_OUTPUT_PARSE
+
+        if pdos is None:
+            raise exceptions.NotExistent("No PDOS file available")
+
+        arraydata = ArrayData()
+        for key, array in pdos.items():
+            arraydata.set_array(key, array)
+        return arraydata
+
+    def _parse_cubes(self):
+        """Convert the grids of the cube files to NumPy binary files, stored in one ArrayData per cube file.
+
+        The cube files are read from the temporary retrieved folder or, if added to the retrieve list, from the
+        retrieved folder. Their grids are converted in chunks and never held in memory as a whole.
+        """
+
+        import re
+        import tempfile
+        import numpy as np
+        from aiida_cp2k.utils import cube_to_npy
+
+        prefix = self.node.process_class._DEFAULT_PROJECT_NAME + '-'  # pylint: disable=protected-access
+
+        cubes = {}
+        for fname in self._list_retrieved():
+            if not (fname.startswith(prefix) and fname.endswith('.cube')):
+                continue
+            # e.g. 'aiida-ELECTRON_DENSITY-1_0.cube' -> 'electron_density_1_0'
+            key = re.sub(r'\W', '_', fname[len(prefix):-len('.cube')]).lower()
+            try:
+                with tempfile.TemporaryDirectory() as tmpdir, self._open_retrieved(fname) as handle:
+                    path = os.path.join(tmpdir, 'grid.npy')
+                    header = cube_to_npy(handle, path)
+                    arraydata = ArrayData()
+                    arraydata.set_array('grid', np.load(path, mmap_mode='r'))
+                    for name in ('origin', 'voxel', 'numbers', 'charges', 'positions'):
+                        arraydata.set_array(name, header[name])
+                    arraydata.set_attribute('comments', header['comments'])
+            except IOError:
+                return self.exit_codes.ERROR_OUTPUT_READ
+            except ValueError:
+                return self.exit_codes.ERROR_OUTPUT_PARSE
+            cubes[key] = arraydata
+        return cubes
 
 
 class Cp2kAdvancedParser(Cp2kBaseParser):
@@ -104,39 +525,31 @@ class Cp2kAdvancedParser(Cp2kBaseParser):
         if fname not in self.retrieved.list_object_names():
             raise OutputParsingError("CP2K output file not retrieved.")
 
+        # Check the end of the file first, so that unfinished runs are not parsed at all.
         try:
-            output_string = self.retrieved.get_object_content(fname)
+            termination = self._get_termination()
         except IOError:
-            return self.exit_codes.ERROR_OUTPUT_STDOUT_READ
+            return self.exit_codes.ERROR_OUTPUT_READ
 
-        result_dict = parse_cp2k_output_advanced(output_string)
+        # Report the errors that stopped CP2K, e.g. running out of memory, rather than the missing end of the output.
+        if termination["status"] in ("aborted", "truncated") and termination["exit_code"] is not None:
+            return self._get_exit_code(termination)
 
         # nwarnings is the last thing to be printed in th eCP2K output file:
         # if it is not there, CP2K didn't finish properly
-        if 'nwarnings' not in result_dict:
+        if 'nwarnings' not in termination:
             raise OutputParsingError("CP2K did not finish properly.")
 
+        try:
+            result_dict = self._parse_file(parse_cp2k_output_advanced, fname)
+        except IOError:
+            return self.exit_codes.ERROR_OUTPUT_READ
+
         if "aborted" in result_dict:
             return self.exit_codes.ERROR_OUTPUT_CONTAINS_ABORT
 
-        # Compute the bandgap for Spin1 and Spin2 if eigen was parsed (works also with smearing!)
-        if 'eigen_spin1_au' in result_dict:
-            if result_dict['dft_type'] == "RKS":
-                result_dict['eigen_spin2_au'] = result_dict['eigen_spin1_au']
-
-            lumo_spin1_idx = result_dict['init_nel_spin1']
-            lumo_spin2_idx = result_dict['init_nel_spin2']
-            if (lumo_spin1_idx > len(result_dict['eigen_spin1_au'])-1) or \
-               (lumo_spin2_idx > len(result_dict['eigen_spin2_au'])-1):
-                #electrons jumped from spin1 to spin2 (or opposite): assume last eigen is lumo
-                lumo_spin1_idx = len(result_dict['eigen_spin1_au']) - 1
-                lumo_spin2_idx = len(result_dict['eigen_spin2_au']) - 1
-            homo_spin1 = result_dict['eigen_spin1_au'][lumo_spin1_idx - 1]
-            homo_spin2 = result_dict['eigen_spin2_au'][lumo_spin2_idx - 1]
-            lumo_spin1 = result_dict['eigen_spin1_au'][lumo_spin1_idx]
-            lumo_spin2 = result_dict['eigen_spin2_au'][lumo_spin2_idx]
-            result_dict['bandgap_spin1_au'] = lumo_spin1 - homo_spin1
-            result_dict['bandgap_spin2_au'] = lumo_spin2 - homo_spin2
+        self._add_bandgaps(result_dict)
+        result_dict["termination"] = termination
 
         if "kpoint_data" in result_dict:
             bnds = BandsData()
@@ -149,9 +562,180 @@ class Cp2kAdvancedParser(Cp2kBaseParser):
             self.out("output_bands", bnds)
             del result_dict["kpoint_data"]
 
+        # The MD tables, written at full precision, are preferred to the values printed in the output.
+        if "motion_step_info" in result_dict and result_dict.get("run_type", "").startswith("MD"):
+            self._md_tables_to_motion_step_info(result_dict["motion_step_info"])
+
+        outputs = [
+            ("atomic_forces", "output_atomic_forces", self._atomic_forces_to_arraydata),
+            ("motion_step_stress", "output_stress", self._motion_step_stress_to_arraydata),
+            ("population_analysis", "output_population_analysis", self._population_analysis_to_arraydata),
+            ("scf_iterations", "output_scf_iterations", self._scf_iterations_to_arraydata),
+            ("memory_usage", "output_memory_usage", self._memory_usage_to_arraydata),
+            ("fragment_energies", "output_fragment_energies", self._fragment_energies_to_arraydata),
+            ("force_eval_energies", "output_force_eval_energies", self._force_eval_energies_to_arraydata),
+        ]
+        # Per-step series can be very long: store them as arrays in the repository, not in the database.
+        if not self._get_parser_options().get("motion_step_info_in_parameters"):
+            outputs.append(("motion_step_info", "output_motion_step_info", self._motion_step_info_to_arraydata))
+        for key, link_label, to_arraydata in outputs:
+            if key in result_dict:
+                self.out(link_label, to_arraydata(result_dict))
+
         self.out("output_parameters", Dict(dict=result_dict))
         return None
 
+    @staticmethod
+    def _add_bandgaps(result_dict):
+        """Compute the bandgap for Spin1 and Spin2 if eigen was parsed (works also with smearing!)."""
+
+        if 'eigen_spin1_au' not in result_dict:
+            return
+        if result_dict['dft_type'] == "RKS":
+            result_dict['eigen_spin2_au'] = result_dict['eigen_spin1_au']
+
+        lumo_spin1_idx = result_dict['init_nel_spin1']
+        lumo_spin2_idx = result_dict['init_nel_spin2']
+        if (lumo_spin1_idx > len(result_dict['eigen_spin1_au'])-1) or \
+           (lumo_spin2_idx > len(result_dict['eigen_spin2_au'])-1):
+            #electrons jumped from spin1 to spin2 (or opposite): assume last eigen is lumo
+            lumo_spin1_idx = len(result_dict['eigen_spin1_au']) - 1
+            lumo_spin2_idx = len(result_dict['eigen_spin2_au']) - 1
+        homo_spin1 = result_dict['eigen_spin1_au'][lumo_spin1_idx - 1]
+        homo_spin2 = result_dict['eigen_spin2_au'][lumo_spin2_idx - 1]
+        lumo_spin1 = result_dict['eigen_spin1_au'][lumo_spin1_idx]
+        lumo_spin2 = result_dict['eigen_spin2_au'][lumo_spin2_idx]
+        result_dict['bandgap_spin1_au'] = lumo_spin1 - homo_spin1
+        result_dict['bandgap_spin2_au'] = lumo_spin2 - homo_spin2
+
+    def _md_tables_to_motion_step_info(self, motion_step_info):
+        """Replace the energy and the cell at every MD step, parsed from the output, by the values of the MD tables.
+
+        The steps themselves are still parsed from the output: they give the motion step of the SCF iterations, forces
+        and population analyses, and the pressure, dispersion energy and SCF convergence are only printed there. The
+        values of the steps that are not in the tables are kept.
+        """
+
+        for kind in ('ener', 'cell'):
+            try:
+                table = self._read_md_table(kind)
+            except (IOError, ValueError):  # Reported when the tables are stored
+                table = None
+            if table is None:
+                continue
+            rows = {step: row for row, step in enumerate(table['step'].tolist())}
+            series = self._md_table_series(kind, table)
+            for i, step in enumerate(motion_step_info['step']):
+                row = rows.get(step)
+                if row is not None:
+                    for key, values in series.items():
+                        motion_step_info[key][i] = values[row]
+
+    @staticmethod
+    def _md_table_series(kind, table):
+        """Return the series of 'motion_step_info' given by an MD table ('ener' or 'cell'), as lists."""
+
+        import numpy as np
+
+        if kind == 'ener':
+            return {'energy_au': table['potential_energy_au'].tolist()}
+
+        cell = table['cell_angs']
+        lengths = np.linalg.norm(cell, axis=2)
+        cosines = np.einsum('sik,sjk->sij', cell, cell) / lengths[:, :, np.newaxis] / lengths[:, np.newaxis, :]
+        angles = np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+        return {
+            'cell_vol_angs3': table['volume_angs3'].tolist(),
+            'cell_a_angs': lengths[:, 0].tolist(),
+            'cell_b_angs': lengths[:, 1].tolist(),
+            'cell_c_angs': lengths[:, 2].tolist(),
+            'cell_alp_deg': angles[:, 1, 2].tolist(),
+            'cell_bet_deg': angles[:, 0, 2].tolist(),
+            'cell_gam_deg': angles[:, 0, 1].tolist(),
+        }
+
+    @staticmethod
+    def _atomic_forces_to_arraydata(result_dict):
+        """Move the atomic forces from the results to an ArrayData."""
+
+        arraydata = ArrayData()
+        arraydata.set_array("forces", result_dict.pop("atomic_forces"))
+        if "atomic_forces_natoms" in result_dict:
+            arraydata.set_array("natoms", result_dict.pop("atomic_forces_natoms"))
+        return arraydata
+
+    @staticmethod
+    def _motion_step_stress_to_arraydata(result_dict):
+        """Move the stress tensor at every motion step from the results to an ArrayData, with the motion steps."""
+
+        import numpy as np
+
+        arraydata = ArrayData()
+        arraydata.set_array("stress", result_dict.pop("motion_step_stress"))
+        arraydata.set_array("step", np.array(result_dict["motion_step_info"]["step"], dtype=np.int64))
+        return arraydata
+
+    @staticmethod
+    def _population_analysis_to_arraydata(result_dict):
+        """Move the charges and spin moments of the population analyses from the results to an ArrayData."""
+
+        arraydata = ArrayData()
+        for key, array in result_dict.pop("population_analysis").items():
+            arraydata.set_array(key, array)
+        return arraydata
+
+    @staticmethod
+    def _scf_iterations_to_arraydata(result_dict):
+        """Move the columns of the SCF iterations from the results to an ArrayData."""
+
+        arraydata = ArrayData()
+        for key, array in result_dict.pop("scf_iterations").items():
+            arraydata.set_array(key, array)
+        return arraydata
+
+    @staticmethod
+    def _memory_usage_to_arraydata(result_dict):
+        """Move the memory of the nodes and the estimates of the peak memory from the results to an ArrayData."""
+
+        arraydata = ArrayData()
+        for key, array in result_dict.pop("memory_usage").items():
+            arraydata.set_array(key, array)
+        return arraydata
+
+    @staticmethod
+    def _fragment_energies_to_arraydata(result_dict):
+        """Move the configurations and energies of the BSSE fragments from the results to an ArrayData."""
+
+        arraydata = ArrayData()
+        for key, array in result_dict.pop("fragment_energies").items():
+            arraydata.set_array(key, array)
+        return arraydata
+
+    @staticmethod
+    def _force_eval_energies_to_arraydata(result_dict):
+        """Move the energies of the FORCE_EVALs of a MIXED run from the results to an ArrayData."""
+
+        arraydata = ArrayData()
+        for key, array in result_dict.pop("force_eval_energies").items():
+            arraydata.set_array(key, array)
+        return arraydata
+
+    @staticmethod
+    def _motion_step_info_to_arraydata(result_dict):
+        """Move 'motion_step_info' from the results to an ArrayData, leaving a summary of the final step."""
+
+        from aiida_cp2k.utils import motion_step_info_to_arrays
+
+        motion_step_info = result_dict.pop("motion_step_info")
+        result_dict["motion_nsteps"] = len(motion_step_info["step"])
+        if motion_step_info["step"]:
+            result_dict["motion_final_step"] = {key: values[-1] for key, values in motion_step_info.items()}
+
+        arraydata = ArrayData()
+        for key, array in motion_step_info_to_arrays(motion_step_info).items():
+            arraydata.set_array(key, array)
+        return arraydata
+
 
 class Cp2kToolsParser(Cp2kBaseParser):
     """AiiDA parser class for the output of CP2K based on the cp2k-output-tools project."""
@@ -165,10 +749,22 @@ class Cp2kToolsParser(Cp2kBaseParser):
         if fname not in self.retrieved.list_object_names():
             raise OutputParsingError("CP2K output file not retrieved.")
 
+        # The aborts are found at the end of the output, whatever the blocks kept by the parser.
+        try:
+            termination = self._get_termination()
+        except IOError:
+            return self.exit_codes.ERROR_OUTPUT_READ
+        if termination["aborted"]:
+            return self._get_exit_code(termination)
+
+        options = self._get_parser_options()
+        if options.get('tools_streaming'):
+            return self._parse_stdout_streaming(fname, options.get('tools_blocks'))
+
         try:
             output_string = self.retrieved.get_object_content(fname)
         except IOError:
-            return self.exit_codes.ERROR_OUTPUT_STDOUT_READ
+            return self.exit_codes.ERROR_OUTPUT_READ
 
         result_dict = {}
 
@@ -193,5 +789,45 @@ class Cp2kToolsParser(Cp2kBaseParser):
         except KeyError:
             pass
 
+        result_dict["termination"] = termination
+
+        self.out("output_parameters", Dict(dict=result_dict))
+        return None
+
+    def _parse_stdout_streaming(self, fname, blocks=None):
+        """Parse the output file one segment at a time, keeping only the given block types.
+
+        The blocks printed at every step are accumulated into columns, stored in the `output_tools_blocks` ArrayData.
+        """
+
+        from aiida_cp2k.utils.output_tools import parse_cp2k_output_tools, split_arrays
+
+        if blocks is not None:
+            blocks = set(blocks) | {'nwarnings'}
+        try:
+            with self.retrieved.open(fname) as handle:
+                result_dict = parse_cp2k_output_tools(handle, blocks)
+        except IOError:
+            return self.exit_codes.ERROR_OUTPUT_READ
+
+        if 'nwarnings' not in result_dict:
+            raise OutputParsingError("CP2K did not finish properly")
+
+        try:
+            energy = result_dict["energies"]["total_force_eval"]
+            result_dict["energy"] = float(energy[-1]) if hasattr(energy, 'shape') else energy
+            result_dict["energy_units"] = "a.u."
+        except KeyError:
+            pass
+
+        result_dict["termination"] = self._get_termination()
+
+        arrays, result_dict = split_arrays(result_dict)
+        if arrays:
+            arraydata = ArrayData()
+            for key, array in arrays.items():
+                arraydata.set_array(key, array)
+            self.out("output_tools_blocks", arraydata)
+
         self.out("output_parameters", Dict(dict=result_dict))
         return None
@@ -8,9 +8,20 @@
 """AiiDA-CP2K utils"""
 
 from .input_generator import Cp2kInput, add_restart_sections
+from .parser import motion_step_info_to_arrays
 from .parser import parse_cp2k_output
+from .parser import parse_cp2k_termination, CP2K_ERROR_SIGNATURES
+from .parser import parse_cp2k_timing
+from .parser import read_output_tail
 from .parser import parse_cp2k_output_advanced
+from .parser import parse_cp2k_restart
 from .parser import parse_cp2k_trajectory
+from .cube import cube_to_npy, memory_map_array, read_cube_header
+from .pdos import parse_cp2k_pdos, parse_cp2k_pdos_file
+from .trajectory import DcdTrajectory, parse_cp2k_md_table, parse_xyz_trajectory
+from .output_summary import summarize_cp2k_output
+from .parse_cache import ParseCache, file_digest
+from .resources import aggregate_resource_usage, resource_usage_report
 from .workchains import merge_dict
 from .workchains import merge_Dict
 from .workchains import get_kinds_section
@@ -19,3 +30,12 @@ from .workchains import ot_has_small_bandgap
 from .workchains import check_resize_unit_cell
 from .workchains import resize_unit_cell
 from .workchains import HARTREE2EV, HARTREE2KJMOL
+
+
+def reparse_calculations(*args, **kwargs):
+    """Re-parse the outputs of CP2K calculations in parallel, see `aiida_cp2k.utils.reparse.reparse_calculations`.
+
+    The module is only imported when called: it needs the AiiDA database.
+    """
+    from .reparse import reparse_calculations as reparse
+    return reparse(*args, **kwargs)
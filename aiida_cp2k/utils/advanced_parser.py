@@ -0,0 +1,912 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K single-pass engine behind `parse_cp2k_output_advanced`."""
+
+import math
+import re
+from array import array
+
+from .bands import _BandStructureParser
+
+BOHR2ANG = 0.529177208590000
+
+# Run types for which the properties at every GEO_OPT/CELL_OPT/MD step are collected in 'motion_step_info'.
+_MOTION_RUN_TYPES = frozenset(['ENERGY', 'ENERGY_FORCE', 'GEO_OPT', 'CELL_OPT', 'MD', 'MD-NVT', 'MD-NPT_F'])
+
+# Keywords that can appear anywhere in a line, as (handler name, literal text). They are compiled into one
+# alternation, so that every line is scanned once no matter how many keywords are registered. Named groups are
+# avoided on purpose: they disable the first-character prefilter of the regex engine, making the scan ~50x slower.
+_KEYWORDS = (
+    ('total_energy', 'Total energy: '),
+    ('bsse_fragment', 'BSSE CALCULATION'),
+    ('bsse_multiplicity', 'MULTIPLICITY ='),
+    ('bsse_cp_corrected', 'CP-corrected Total energy:'),
+    ('bsse_body', '-body contribution:'),
+    ('bsse_interaction', 'BSSE-free interaction energy:'),
+    ('nwarnings', 'The number of warnings for this run is'),
+    ('walltime', 'exceeded requested execution time'),
+    ('abort', 'ABORT'),
+    ('bands', 'KPOINTS| Band Structure Calculation'),
+    ('abs_spin_dens', 'Integrated absolute spin density'),
+    ('spin_square', 'Ideal and single determinant'),
+    ('nelectrons', 'Number of electrons: '),
+    ('natoms', '- Atoms: '),
+    ('smear', 'Smear method'),
+    ('subspace', 'subspace spin'),
+    ('nonsquare', 'Using a non-square number of'),
+    ('scf_header', 'Step     Update method'),
+    ('scf_end', 'SCF run converged'),
+    ('scf_not_converged', 'SCF run NOT converged'),
+    ('lbfgs', 'Specific L-BFGS convergence criteria'),
+    ('atomic_forces', 'ATOMIC FORCES in ['),
+    ('mulliken', 'Mulliken Population Analysis'),
+    ('hirshfeld', 'Hirshfeld Charges'),
+    ('peak_memory', 'Estimated peak process memory'),
+    ('dbcsr_statistics', 'DBCSR STATISTICS'),
+    ('dispersion', 'Dispersion energy'),
+    ('edens', 'Total charge density on r-space grids:'),
+    ('opt_step', 'Informations at step'),
+    ('max_step', 'Max. step size             ='),
+    ('rms_step', 'RMS step size              ='),
+    ('max_grad', 'Max. gradient              ='),
+    ('rms_grad', 'RMS gradient               ='),
+    ('opt_end', '-' * 51),
+    ('opt_converged', 'Reevaluating energy at the minimum'),
+    ('internal_pressure', 'Internal Pressure'),
+    ('md_step', 'STEP NUMBER'),
+    ('md_initial_pressure', 'INITIAL PRESSURE[bar]'),
+    ('md_pressure', 'PRESSURE [bar]'),
+    ('md_volume', 'VOLUME[bohr^3]'),
+    ('md_lengths', 'CELL LNTHS[bohr]'),
+    ('md_angles', 'CELL ANGLS[deg]'),
+)
+_KEYWORD_RE = re.compile('|'.join(re.escape(text) for _, text in _KEYWORDS))
+_KEYWORD_NAMES = {text: name for name, text in _KEYWORDS}
+
+# Rows of the DBCSR statistics printed at the end of the run, as (start of the line, key, index of the value, type).
+_DBCSR_STATISTICS = (
+    (' flops total', 'dbcsr_flops_total', 2, float),
+    (' flops max/rank', 'dbcsr_flops_max_per_rank', 2, float),
+    (' matmuls total', 'dbcsr_matmuls_total', 2, int),
+    (' marketing flops', 'dbcsr_marketing_flops', 2, float),
+    (' max memory usage/rank', 'dbcsr_max_memory_per_rank_bytes', 3, float),
+    (' # MPI messages exchanged', 'dbcsr_mpi_messages', 4, int),
+    ('  total size', 'dbcsr_mpi_messages_size_bytes', 2, float),
+)
+
+
+class _AdvancedOutputParser:  # pylint: disable=too-many-instance-attributes,too-few-public-methods
+    """Single-pass engine behind `parse_cp2k_output_advanced`.
+
+    Lines starting with a CP2K print prefix (e.g. ' ENERGY| ') are routed through a table keyed on that prefix, the
+    remaining keywords are found with one precompiled alternation. Only the handlers owning a match are called, all the
+    other lines are skipped after the lookup.
+    """
+
+    # Print prefix (the text between the leading blank and the '|') -> handler.
+    _PREFIX_HANDLERS = {
+        'CP2K': '_on_cp2k',
+        'ENERGY': '_on_energy',
+        'GLOBAL': '_on_global',
+        'MD': '_on_md',
+        'DFT': '_on_dft',
+        'MEMORY': '_on_memory',
+        'DBCSR': '_on_dbcsr',
+    }
+
+    # Print prefix -> handler, called only while the properties at each motion step are collected.
+    _MOTION_PREFIX_HANDLERS = {
+        'CELL': '_on_cell',
+        'STRESS': '_on_stress',
+    }
+
+    # Keyword -> handler, called on every match of `_KEYWORD_RE`.
+    _KEYWORD_HANDLERS = {
+        'total_energy': '_on_total_energy',
+        'bsse_fragment': '_on_bsse_fragment',
+        'bsse_multiplicity': '_on_bsse_multiplicity',
+        'bsse_cp_corrected': '_on_bsse_cp_corrected',
+        'bsse_body': '_on_bsse_body',
+        'bsse_interaction': '_on_bsse_interaction',
+        'nwarnings': '_on_nwarnings',
+        'walltime': '_on_walltime',
+        'abort': '_on_abort',
+        'bands': '_on_bands',
+        'abs_spin_dens': '_on_abs_spin_dens',
+        'spin_square': '_on_spin_square',
+        'nelectrons': '_on_nelectrons',
+        'natoms': '_on_natoms',
+        'smear': '_on_smear',
+        'subspace': '_on_subspace',
+        'nonsquare': '_on_nonsquare',
+        'scf_header': '_on_scf_header',
+        'scf_end': '_on_scf_end',
+        'scf_not_converged': '_on_scf_not_converged',
+        'lbfgs': '_on_lbfgs',
+        'atomic_forces': '_on_atomic_forces',
+        'mulliken': '_on_population_analysis',
+        'hirshfeld': '_on_population_analysis',
+        'peak_memory': '_on_peak_memory',
+        'dbcsr_statistics': '_on_dbcsr_statistics',
+    }
+
+    # Keyword -> handler, called only while the properties at each motion step are collected.
+    _MOTION_HANDLERS = {
+        'dispersion': '_on_dispersion',
+        'edens': '_on_edens',
+        'scf_not_converged': '_on_step_scf_not_converged',
+        'opt_step': '_on_opt_step',
+        'max_step': '_on_max_step',
+        'rms_step': '_on_rms_step',
+        'max_grad': '_on_max_grad',
+        'rms_grad': '_on_rms_grad',
+        'opt_end': '_on_opt_end',
+        'opt_converged': '_on_opt_converged',
+        'internal_pressure': '_on_internal_pressure',
+        'md_step': '_on_md_step',
+        'md_initial_pressure': '_on_md_initial_pressure',
+        'md_pressure': '_on_md_pressure',
+        'md_volume': '_on_md_volume',
+        'md_lengths': '_on_md_lengths',
+        'md_angles': '_on_md_angles',
+    }
+
+    def __init__(self):
+        self.result_dict = {'exceeded_walltime': False, 'warnings': []}
+        self.prefix_handlers = {key: getattr(self, name) for key, name in self._PREFIX_HANDLERS.items()}
+        self.keyword_handlers = {key: getattr(self, name) for key, name in self._KEYWORD_HANDLERS.items()}
+        self.motion_handlers = {key: getattr(self, name) for key, name in self._MOTION_HANDLERS.items()}
+        self.motion_prefix_handlers = {key: getattr(self, name) for key, name in self._MOTION_PREFIX_HANDLERS.items()}
+        self.prefixes = frozenset(self.prefix_handlers) | frozenset(self.motion_prefix_handlers)
+        self.cp2k_version = None
+        self.bands = None  # Band structure parser, fed with all the lines after "KPOINTS| Band Structure Calculation"
+        self.energy = None
+        self.fragments = None  # Columns of the table of the BSSE fragments, created with the first fragment
+        self.force_evals = None  # Columns of the energies printed by the FORCE_EVALs, created with the first one
+        self.force_eval_methods = {}  # Method of a FORCE_EVAL (e.g. 'QS') -> index in the 'method' column
+        self.eigen_key = None  # Set while reading eigenvalues as 4-columns rows
+        self.forces = []  # Array of the atomic forces of every printed block
+        self.forces_rows = None  # Rows of the block of atomic forces being read
+        self.populations = {}  # 'mulliken'/'hirshfeld' -> charges, spins and motion step of every printed block
+        self.population = None  # Analysis being read
+        self.population_header = None
+        self.population_rows = None  # Rows of the population analysis being read
+        self.resources = {}  # MPI/OpenMP layout, DBCSR settings and statistics, memory summary
+        self.system_memory = {}  # Field of the "MEMORY| system memory details" table -> rank 0, min, max, average
+        self.peak_memory = array('l')  # Every estimate of the peak memory of a process
+        self.peak_memory_step = array('l')  # Index of the motion step of every estimate
+        self.dbcsr_statistics = False  # Set while reading the DBCSR statistics
+        self.scf = None  # Columns of the table of every SCF iteration, created with the first table
+        self.scf_methods = {}  # Update method -> index in the 'method' column
+        self.scf_runs = 0  # Number of SCF tables read
+        self.in_scf = False  # Set while reading the rows of an SCF table
+        self.skip_line = False
+        self.steps = None  # 'motion_step_info', initialized as soon as the run type is known
+        self.step = {}  # Values at the current motion step
+        self.stress = None  # Stress tensor printed during the current motion step
+        self.stress_rows = None  # Rows of the stress tensor being read
+        self.stress_unit = None
+        self.step_stress = []  # Stress tensor at every motion step, None if not printed
+        self.print_now = False
+
+    def parse(self, lines):
+        """Parse the lines of the CP2K output and return the result dictionary."""
+        keyword_search = _KEYWORD_RE.search
+
+        for line in lines:
+            if self.bands is not None:
+                self.bands.feed(line)
+            if self._read_block(line):
+                continue
+            prefix = self._get_prefix(line)
+            if keyword_search(line) is None:
+                if prefix is None and self.eigen_key is None:
+                    continue
+                matches = ()
+            else:
+                matches = [_KEYWORD_NAMES[match.group()] for match in _KEYWORD_RE.finditer(line)]
+            if not self._dispatch(line, prefix, matches):
+                self._parse_motion_step(line, prefix, matches)
+
+        self._store_results()
+        return self.result_dict
+
+    def _read_block(self, line):
+        """Pass the line to the reader of the block being read, if any. Return True if the line was consumed."""
+        if self.forces_rows is not None:
+            self._read_atomic_forces(line)
+            return True
+        if self.population_rows is not None:
+            self._read_population_analysis(line)
+            return True
+        if self.dbcsr_statistics and self._read_dbcsr_statistics(line):
+            return True
+        if self.in_scf and line[:7].strip().isdigit():
+            self._read_scf_iteration(line)
+            return True
+        return False
+
+    def _get_prefix(self, line):
+        """Return the print prefix of the line (e.g. 'ENERGY' for ' ENERGY| ...') if it has a handler, else None."""
+        if line[:1] == ' ':
+            pipe = line.find('|', 1, 16)
+            if pipe > 0 and line[1:pipe] in self.prefixes:
+                return line[1:pipe]
+        return None
+
+    def _dispatch(self, line, prefix, matches):
+        """Call the handlers of the prefix and of the keywords of the line. Return True if the line was consumed."""
+        self.skip_line = False
+        if prefix in self.prefix_handlers:
+            self.prefix_handlers[prefix](line)
+        for name in matches:
+            if name in self.keyword_handlers:
+                self.keyword_handlers[name](line)
+                if self.skip_line:
+                    return True
+        if self.skip_line:
+            return True
+        if self.eigen_key is not None:
+            self._read_eigenvalues(line)
+        return self.skip_line
+
+    def _store_results(self):
+        """Convert the blocks collected while reading the output and store them in the result dictionary."""
+        if self.bands is not None:
+            kpoints, labels, bands = self.bands.result()
+            self.result_dict["kpoint_data"] = {
+                "kpoints": kpoints,
+                "labels": labels,
+                "bands": bands,
+                "bands_unit": "eV",
+            }
+        if self.forces:
+            self._store_atomic_forces()
+        if self.populations:
+            self._store_population_analysis()
+        if any(stress is not None for stress in self.step_stress):
+            self._store_motion_stress()
+        if self.scf is not None:
+            self._store_scf_iterations()
+        if self.resources or self.system_memory or self.peak_memory:
+            self._store_resources()
+        if self.fragments is not None:
+            self._store_fragment_energies()
+        if 'MIXED' in self.force_eval_methods:
+            self._store_force_eval_energies()
+
+    # General info.
+
+    def _on_cp2k(self, line):
+        if line.startswith(' CP2K| version string:'):
+            self.cp2k_version = float(line.split()[5])
+            self.result_dict['cp2k_version'] = self.cp2k_version
+
+    def _on_energy(self, line):
+        """Read the total energy of a FORCE_EVAL, the last one printed is the energy of the run."""
+        if line.startswith(' ENERGY| '):
+            data = line.split()
+            self.energy = float(data[8])
+            self.result_dict['energy'] = self.energy
+            self.result_dict['energy_units'] = "a.u."
+            self._add_force_eval_energy(data[4], self.energy)
+
+    def _on_total_energy(self, line):
+        """Read the electronic SCF energy (with a constrained GEO_OPT, "ENERGY| ..." also has the constraint energy)."""
+        if line.strip().startswith('Total energy: '):
+            self.result_dict['energy_scf'] = float(line.split()[2])
+            if self.fragments is not None:  # The last SCF energy of a BSSE fragment is its energy
+                self.fragments['energy'][-1] = self.result_dict['energy_scf']
+
+    # BSSE runs: every fragment configuration starts with a "BSSE CALCULATION  FRAGMENT CONF: 10  FRAGMENT SUBCONF: 10"
+    # banner, followed by its charge and multiplicity. The counterpoise correction is printed at the end.
+
+    def _on_bsse_fragment(self, line):
+        """Start a new BSSE fragment configuration."""
+        if self.fragments is None:
+            self.fragments = {
+                'conf': [],
+                'subconf': [],
+                'charge': array('l'),
+                'multiplicity': array('l'),
+                'energy': array('d'),
+                'motion_step': array('l'),
+            }
+        data = line.split()
+        self.fragments['conf'].append(data[data.index('CONF:') + 1])
+        self.fragments['subconf'].append(data[data.index('SUBCONF:') + 1])
+        self.fragments['charge'].append(0)
+        self.fragments['multiplicity'].append(1)
+        self.fragments['energy'].append(float('nan'))
+        self.fragments['motion_step'].append(self._motion_step_index())
+
+    def _on_bsse_multiplicity(self, line):
+        data = line.replace('=', ' ').split()
+        if self.fragments is not None and 'CHARGE' in data:
+            self.fragments['charge'][-1] = int(data[data.index('CHARGE') + 1])
+            self.fragments['multiplicity'][-1] = int(data[data.index('MULTIPLICITY') + 1])
+
+    def _on_bsse_cp_corrected(self, line):
+        self.result_dict['bsse_cp_corrected_energy'] = float(line.split()[4])
+
+    def _on_bsse_body(self, line):
+        data = line.split()  # "-  2-body contribution:  -0.010671  -"
+        self.result_dict.setdefault('bsse_body_orders', []).append(int(data[1].split('-')[0]))
+        self.result_dict.setdefault('bsse_body_contributions', []).append(float(data[3]))
+
+    def _on_bsse_interaction(self, line):
+        self.result_dict['bsse_interaction_energy'] = float(line.split()[4])
+
+    def _store_fragment_energies(self):
+        """Store the BSSE fragments as flat arrays, one element per fragment configuration.
+
+        'conf' and 'subconf' are the configurations as strings of 0/1 flags, one per fragment (the atoms of the
+        fragments flagged in 'subconf' are computed in the basis of the fragments flagged in 'conf'), 'energy' is the
+        last SCF energy of the configuration in a.u. and 'motion_step' the index of the motion step.
+        """
+        import numpy as np
+
+        fragment_energies = {
+            key: np.frombuffer(values, dtype=values.typecode)
+            for key, values in self.fragments.items()
+            if isinstance(values, array)
+        }
+        fragment_energies['charge'] = fragment_energies['charge'].astype(np.int32)
+        fragment_energies['multiplicity'] = fragment_energies['multiplicity'].astype(np.int32)
+        fragment_energies['motion_step'] = fragment_energies['motion_step'].astype(np.int32)
+        fragment_energies['conf'] = np.array(self.fragments['conf'])
+        fragment_energies['subconf'] = np.array(self.fragments['subconf'])
+        self.result_dict['fragment_energies'] = fragment_energies
+
+    # Multiple FORCE_EVALs (e.g. MIXED): every FORCE_EVAL prints its "ENERGY| Total FORCE_EVAL ( QS ) energy" line,
+    # the sub FORCE_EVALs first and then the MIXED one.
+
+    def _add_force_eval_energy(self, method, energy):
+        """Append the energy printed by a FORCE_EVAL with the given method."""
+        if self.force_evals is None:
+            self.force_evals = {
+                'force_eval': array('l'),
+                'method': array('l'),
+                'energy': array('d'),
+                'motion_step': array('l'),
+            }
+        force_evals = self.force_evals
+        # The MIXED FORCE_EVAL is the first one, the sub FORCE_EVALs are numbered from 1 in the order they are printed.
+        previous = force_evals['force_eval'][-1] if force_evals['force_eval'] else 0
+        force_evals['force_eval'].append(0 if method == 'MIXED' else previous + 1)
+        force_evals['method'].append(self.force_eval_methods.setdefault(method, len(self.force_eval_methods)))
+        force_evals['energy'].append(energy)
+        force_evals['motion_step'].append(self._motion_step_index())
+
+    def _store_force_eval_energies(self):
+        """Store the energies printed by the FORCE_EVALs as flat arrays, one element per energy.
+
+        'force_eval' is the index of the FORCE_EVAL (0 for the MIXED one, then the sub FORCE_EVALs in order), 'method'
+        the index of its method in 'methods' (e.g. 'QS'), 'energy' is in a.u. and 'motion_step' is the index of the
+        motion step.
+        """
+        import numpy as np
+
+        force_eval_energies = {
+            key: np.frombuffer(values, dtype=values.typecode) for key, values in self.force_evals.items()
+        }
+        for key in ('force_eval', 'method', 'motion_step'):
+            force_eval_energies[key] = force_eval_energies[key].astype(np.int32)
+        force_eval_energies['methods'] = np.array(list(self.force_eval_methods))
+        self.result_dict['force_eval_energies'] = force_eval_energies
+
+    def _on_nwarnings(self, line):
+        self.result_dict['nwarnings'] = int(line.split()[-1])
+
+    def _on_walltime(self, line):  # pylint: disable=unused-argument
+        self.result_dict['exceeded_walltime'] = True
+
+    def _on_abort(self, line):  # pylint: disable=unused-argument
+        self.result_dict['aborted'] = True
+
+    def _on_bands(self, line):  # pylint: disable=unused-argument
+        self.bands = _BandStructureParser(self.cp2k_version)
+
+    def _on_global(self, line):
+        """Read the run type and the MPI/OpenMP layout."""
+        if line.startswith(' GLOBAL| Run type'):
+            self.result_dict['run_type'] = line.split()[-1]
+        elif line.startswith(' GLOBAL| Total number of message passing processes'):
+            self.resources['mpi_processes'] = int(line.split()[-1])
+        elif line.startswith(' GLOBAL| Number of threads for this process'):
+            self.resources['omp_threads'] = int(line.split()[-1])
+
+    # Resource usage: the memory of the nodes, the estimates of the peak memory of a process (HWM), the DBCSR settings
+    # and statistics.
+
+    def _on_memory(self, line):
+        data = line.split()
+        if len(data) == 6 and data[-1].isdigit():  # " MEMORY| MemTotal  <rank 0>  <min>  <max>  <average>"
+            self.system_memory[data[1]] = [int(value) for value in data[2:]]
+
+    def _on_peak_memory(self, line):
+        self.peak_memory.append(int(line.split()[-1]))
+        self.peak_memory_step.append(self._motion_step_index())
+
+    def _on_dbcsr(self, line):
+        data = line.split('|', 1)[1].strip().rsplit(None, 1)
+        if len(data) == 2:
+            self.resources.setdefault('dbcsr_settings', {})[data[0]] = data[1]
+
+    def _on_dbcsr_statistics(self, line):  # pylint: disable=unused-argument
+        self.dbcsr_statistics = True
+        self.skip_line = True
+
+    def _read_dbcsr_statistics(self, line):
+        """Read a row of the DBCSR statistics, return False at the end of the statistics."""
+        if not line.strip() or line.startswith(' MEMORY|'):
+            self.dbcsr_statistics = False
+            return False
+        for start, key, index, convert in _DBCSR_STATISTICS:
+            if line.startswith(start):
+                self.resources[key] = convert(line.split()[index])
+                break
+        return True
+
+    def _store_resources(self):
+        """Store the summary of the resource usage in 'resources' and the memory tables in 'memory_usage'.
+
+        'resources' has the MPI/OpenMP layout ('mpi_processes', 'omp_threads'), the largest 'peak_memory_mib' of a
+        process, the 'memory_total_kb' and 'memory_likely_free_kb' of the smallest node, the DBCSR statistics and the
+        'dbcsr_settings'. 'memory_usage' has the 'system_memory_kb' table, with the rank 0, min, max and average over
+        the nodes of the 'system_memory_fields', and every estimate of the peak memory of a process, in
+        'peak_memory_mib', with the index of its motion step in 'peak_memory_motion_step'.
+        """
+        import numpy as np
+
+        memory_usage = {}
+        if self.system_memory:
+            memory_usage['system_memory_fields'] = np.array(list(self.system_memory))
+            memory_usage['system_memory_kb'] = np.array(list(self.system_memory.values()), dtype=np.int64)
+            for field, key in (('MemTotal', 'memory_total_kb'), ('MemLikelyFree', 'memory_likely_free_kb')):
+                if field in self.system_memory:
+                    self.resources[key] = self.system_memory[field][1]
+        if self.peak_memory:
+            memory_usage['peak_memory_mib'] = np.array(self.peak_memory, dtype=np.int64)
+            memory_usage['peak_memory_motion_step'] = np.array(self.peak_memory_step, dtype=np.int32)
+            self.resources['peak_memory_mib'] = max(self.peak_memory)
+        self.result_dict['resources'] = self.resources
+        if memory_usage:
+            self.result_dict['memory_usage'] = memory_usage
+
+    def _on_md(self, line):
+        if line.startswith(' MD| Ensemble Type'):
+            self.result_dict['run_type'] += '-'
+            self.result_dict['run_type'] += line.split()[-1]  #e.g., 'MD-NPT_F'
+
+    def _on_dft(self, line):
+        if line.startswith(' DFT| ') and 'dft_type' not in self.result_dict:
+            self.result_dict['dft_type'] = line.split()[-1]  # RKS, UKS or ROKS
+
+    def _on_abs_spin_dens(self, line):
+        if line.strip().startswith("Integrated absolute spin density"):
+            self.result_dict.setdefault('integrated_abs_spin_dens', []).append(float(line.split()[-1]))
+
+    def _on_spin_square(self, line):
+        """Read the ideal and the expectation value of S^2."""
+        if line.strip().startswith("Ideal and single determinant"):
+            s2_ideal, s2_expect = line.split()[-2:]
+            if 'spin_square_ideal' not in self.result_dict:
+                self.result_dict['spin_square_ideal'] = float(s2_ideal)
+            self.result_dict.setdefault('spin_square_expectation', []).append(float(s2_expect))
+
+    def _on_nelectrons(self, line):
+        """Read the number of electrons of each spin in the first SCF (NOTE: it may change but it is not updated!)."""
+        result_dict = self.result_dict
+        if 'init_nel_spin1' not in result_dict:
+            result_dict['init_nel_spin1'] = int(line.split()[3])
+            if result_dict['dft_type'] == 'RKS':
+                result_dict['init_nel_spin1'] //= 2  #// returns an integer
+                result_dict['init_nel_spin2'] = result_dict['init_nel_spin1']
+        elif 'init_nel_spin2' not in result_dict:
+            result_dict['init_nel_spin2'] = int(line.split()[3])
+
+    def _on_natoms(self, line):
+        self.result_dict['natoms'] = int(line.split()[-1])
+
+    def _on_smear(self, line):
+        self.result_dict['smear_method'] = line.split()[-1]
+
+    def _on_subspace(self, line):
+        """Start reading the eigenvalues of a spin."""
+        spin = int(line.split()[-1])
+        if spin in (1, 2):
+            self.eigen_key = f'eigen_spin{spin}_au'
+            self.result_dict.setdefault(self.eigen_key, [])
+        self.skip_line = True
+
+    # Warnings.
+
+    def _on_nonsquare(self, line):  # pylint: disable=unused-argument
+        self.result_dict['warnings'].append('Using a non-square number of MPI ranks')
+
+    def _on_scf_not_converged(self, line):  # pylint: disable=unused-argument
+        self.in_scf = False
+        warn = "One or more SCF run did not converge"
+        if warn not in self.result_dict['warnings']:
+            self.result_dict['warnings'].append(warn)
+
+    def _on_lbfgs(self, line):  # pylint: disable=unused-argument
+        self.result_dict["warnings"].append("LBFGS converged with specific criteria")
+
+    def _read_eigenvalues(self, line):
+        """Read eigenvalues as 4-columns rows, then convert to float."""
+        if "-------------" in line or "Reached convergence" in line:
+            self.skip_line = True
+            return
+        data = line.split()
+        if data and len(data) <= 4:
+            self.result_dict[self.eigen_key] += [float(x) for x in data]
+        else:
+            self.eigen_key = None
+
+    # Atomic forces, printed as " # Atom   Kind   Element   X   Y   Z" rows and ended by "SUM OF ATOMIC FORCES".
+
+    def _on_atomic_forces(self, line):  # pylint: disable=unused-argument
+        self.forces_rows = []
+        self.skip_line = True
+
+    def _read_atomic_forces(self, line):
+        """Collect the forces of one atom, or convert the whole block at once when it ends."""
+        import numpy as np
+
+        if line.startswith(' SUM OF ATOMIC FORCES') or (not line.strip() and self.forces_rows):
+            rows = self.forces_rows
+            self.forces.append(np.array(' '.join(rows).split(), dtype=np.float64).reshape(len(rows), 3))
+            self.forces_rows = None
+        elif line.strip() and not line.lstrip().startswith('#'):
+            self.forces_rows.append(line.split(None, 3)[3])
+
+    def _store_atomic_forces(self):
+        """Stack the blocks into an array of shape (nframes, natoms, 3).
+
+        If the number of atoms changes between blocks (e.g. fragments), they are concatenated instead, with the number
+        of atoms of each block in 'atomic_forces_natoms'.
+        """
+        self.result_dict['atomic_forces'], natoms = _stack_blocks(self.forces)
+        if natoms is not None:
+            self.result_dict['atomic_forces_natoms'] = natoms
+        self.result_dict['atomic_forces_unit'] = 'a.u.'
+
+    # Mulliken and Hirshfeld population analyses: a header, then one " atom  element  kind  ..." row per atom. With
+    # spin polarization, the header has a "Spin moment" column, before or after the "Net charge" one.
+
+    def _on_population_analysis(self, line):
+        self.population = 'mulliken' if 'Mulliken' in line else 'hirshfeld'
+        self.population_header = None
+        self.population_rows = []
+        self.skip_line = True
+
+    def _read_population_analysis(self, line):
+        """Collect the row of one atom, or convert the whole table at once when it ends."""
+        import numpy as np
+
+        data = line.split(None, 3)
+        if data and data[0].isdigit():
+            self.population_rows.append(data[3])
+            return
+        if not self.population_rows:
+            if data and data[0].startswith('#'):
+                self.population_header = line
+            return
+
+        rows = self.population_rows
+        values = np.array(' '.join(rows).split(), dtype=np.float64).reshape(len(rows), -1)
+        header = self.population_header or ''
+        charge, spin = -1, None
+        if 'Spin moment' in header:
+            charge, spin = (-2, -1) if header.index('Spin moment') > header.index('Net charge') else (-1, -2)
+
+        population = self.populations.setdefault(self.population, {'charges': [], 'spins': [], 'motion_step': []})
+        population['charges'].append(values[:, charge])
+        if spin is not None:
+            population['spins'].append(values[:, spin])
+        population['motion_step'].append(self._motion_step_index())
+        self.population_rows = None
+
+    def _store_population_analysis(self):
+        """Store the charges and spin moments of every printed population analysis in 'population_analysis'.
+
+        For each analysis, e.g. 'mulliken': the 'mulliken_charges' and, with spin polarization, the 'mulliken_spins'
+        arrays of shape (nblocks, natoms), concatenated if the number of atoms changes (with 'mulliken_natoms'), and the
+        index of the motion step of every block in 'mulliken_motion_step'.
+        """
+        import numpy as np
+
+        arrays = {}
+        for name, population in self.populations.items():
+            arrays[f'{name}_charges'], natoms = _stack_blocks(population['charges'])
+            if natoms is not None:
+                arrays[f'{name}_natoms'] = natoms
+            if len(population['spins']) == len(population['charges']):
+                arrays[f'{name}_spins'] = _stack_blocks(population['spins'])[0]
+            arrays[f'{name}_motion_step'] = np.array(population['motion_step'], dtype=np.int32)
+        self.result_dict['population_analysis'] = arrays
+
+    def _motion_step_index(self):
+        """Return the index in 'motion_step_info' of the motion step being computed."""
+        return len(self.steps['step']) if self.steps is not None else 0
+
+    # SCF iterations, printed as " Step  Update method  Time  Convergence  Total energy  Change" rows. With an outer
+    # SCF loop, the rows of all the inner loops belong to the same SCF run, ended by "*** SCF run (NOT) converged".
+
+    def _on_scf_header(self, line):  # pylint: disable=unused-argument
+        """Start reading the rows of an SCF table, a new SCF run unless it continues the previous one."""
+        if self.scf is None:
+            self.scf = {
+                'motion_step': array('l'),
+                'scf_run': array('l'),
+                'iteration': array('l'),
+                'method': array('b'),
+                'step_size': array('d'),
+                'time': array('d'),
+                'convergence': array('d'),
+                'energy': array('d'),
+                'energy_change': array('d'),
+            }
+        if not self.in_scf:
+            self.in_scf = True
+            self.scf_runs += 1
+        self.skip_line = True
+
+    def _on_scf_end(self, line):  # pylint: disable=unused-argument
+        self.in_scf = False
+
+    def _read_scf_iteration(self, line):
+        """Append one row of the SCF table. The line search steps of OT have no convergence and no change."""
+        data = line.split()
+        nmethod = 1
+        while nmethod < len(data) and not data[nmethod][:1].isdigit():
+            nmethod += 1
+        try:
+            values = [float(value) for value in data[nmethod:]]
+        except ValueError:
+            return
+        if len(values) == 5:
+            step_size, time, convergence, energy, change = values
+        elif len(values) == 4:
+            step_size, time, convergence, energy = values
+            change = math.nan
+        elif len(values) == 3:
+            step_size, time, energy = values
+            convergence = change = math.nan
+        else:
+            return
+
+        method = ' '.join(data[1:nmethod])
+        if method not in self.scf_methods:
+            self.scf_methods[method] = len(self.scf_methods)
+        scf = self.scf
+        scf['motion_step'].append(self._motion_step_index())
+        scf['scf_run'].append(self.scf_runs - 1)
+        scf['iteration'].append(int(data[0]))
+        scf['method'].append(self.scf_methods[method])
+        scf['step_size'].append(step_size)
+        scf['time'].append(time)
+        scf['convergence'].append(convergence)
+        scf['energy'].append(energy)
+        scf['energy_change'].append(change)
+
+    def _store_scf_iterations(self):
+        """Store the SCF iterations as flat arrays, one element per iteration.
+
+        'motion_step' is the index in 'motion_step_info' of the step the iteration belongs to (equal to the number of
+        steps for the final evaluation of an optimization), 'scf_run' counts the SCF runs and 'method' is the index of
+        the update method in 'methods'. The energies are in a.u., the times in s.
+        """
+        import numpy as np
+
+        scf_iterations = {key: np.frombuffer(values, dtype=values.typecode) for key, values in self.scf.items()}
+        scf_iterations['iteration'] = scf_iterations['iteration'].astype(np.int32)
+        scf_iterations['motion_step'] = scf_iterations['motion_step'].astype(np.int32)
+        scf_iterations['scf_run'] = scf_iterations['scf_run'].astype(np.int32)
+        scf_iterations['methods'] = np.array(list(self.scf_methods))
+        self.result_dict['scf_iterations'] = scf_iterations
+
+    ####################################################################
+    #  THIS SECTION PARSES THE PROPERTIES AT GOE_OPT/CELL_OPT/MD STEP  #
+    #  BC: it can be not robust!                                         #
+    ####################################################################
+
+    def _init_motion_steps(self):
+        """Initialize the per-step lists and the values at the current step."""
+        self.result_dict['motion_opt_converged'] = False
+        self.steps = self.result_dict['motion_step_info'] = {
+            'step': [],  # MOTION step
+            'energy_au': [],  # total energy
+            'dispersion_energy_au': [],  # Dispersion energy (if dispersion correction activated)
+            'pressure_bar': [],  # Total pressure on the cell
+            'cell_vol_angs3': [],  # Cell Volume
+            'cell_a_angs': [],  # Cell dimension A
+            'cell_b_angs': [],  # Cell dimension B
+            'cell_c_angs': [],  # Cell dimension C
+            'cell_alp_deg': [],  # Cell angle Alpha
+            'cell_bet_deg': [],  # Cell angle Beta
+            'cell_gam_deg': [],  # Cell angle Gamma
+            'max_step_au': [],  # Max atomic displacement (in optimization)
+            'rms_step_au': [],  # RMS atomic displacement (in optimization)
+            'max_grad_au': [],  # Max atomic force (in optimization)
+            'rms_grad_au': [],  # RMS atomic force (in optimization)
+            'edens_rspace': [],  # Total charge density on r-space grids (should stay small)
+            'scf_converged': [],  # SCF converged in this motions step (bool)
+        }
+        self.step = {key: None for key in self.steps}
+        self.step['step'] = 0
+        self.step['scf_converged'] = True
+        self.energy = None
+
+    def _parse_motion_step(self, line, prefix, matches):
+        """Collect the properties at the current motion step and store them once the step is complete."""
+        run_type = self.result_dict.get('run_type')
+        if run_type not in _MOTION_RUN_TYPES:
+            return
+        if self.steps is None:
+            self._init_motion_steps()
+
+        self.print_now = False
+        if prefix in self.motion_prefix_handlers:
+            self.motion_prefix_handlers[prefix](line, run_type)
+        for name in matches:
+            handler = self.motion_handlers.get(name)
+            if handler is not None:
+                handler(line, run_type)
+        if run_type in ('ENERGY', 'ENERGY_FORCE') and self.energy is not None and not self.steps['step']:
+            self.print_now = True
+
+        if self.print_now and self.energy is not None:
+            self.step['energy_au'] = self.energy
+            for key, values in self.steps.items():
+                values.append(self.step[key])
+            self.step['scf_converged'] = True
+            self.step_stress.append(self.stress)
+            self.stress = None
+
+    def _on_cell(self, line, run_type):  # pylint: disable=unused-argument
+        """Read the volume, the lengths and the angles of the cell."""
+        data = line.split()
+        if "Volume" in line:
+            self.step['cell_vol_angs3'] = float(data[3])
+        if "Vector a" in line:
+            self.step['cell_a_angs'] = float(data[9])
+        if "Vector b" in line:
+            self.step['cell_b_angs'] = float(data[9])
+        if "Vector c" in line:
+            self.step['cell_c_angs'] = float(data[9])
+        if "alpha" in line:
+            self.step['cell_alp_deg'] = float(data[5])
+        if "beta" in line:
+            self.step['cell_bet_deg'] = float(data[5])
+        if "gamma" in line:
+            self.step['cell_gam_deg'] = float(data[5])
+
+    def _on_stress(self, line, run_type):  # pylint: disable=unused-argument
+        """Read the stress tensor: "STRESS| Analytical stress tensor [GPa]", a header and the x, y, z rows."""
+        data = line.split()
+        if 'stress tensor [' in line and 'Eigenvectors' not in line:
+            self.stress_rows = []
+            self.stress_unit = line[line.index('[') + 1:line.index(']')]
+        elif self.stress_rows is not None and len(data) == 5 and data[1] in ('x', 'y', 'z'):
+            self.stress_rows.append(data[2:])
+            if len(self.stress_rows) == 3:
+                self.stress = self.stress_rows
+                self.stress_rows = None
+
+    def _store_motion_stress(self):
+        """Store the stress tensor at every motion step as an array of shape (nsteps, 3, 3), NaN where not printed."""
+        import numpy as np
+
+        stress = np.full((len(self.step_stress), 3, 3), np.nan)
+        for i, tensor in enumerate(self.step_stress):
+            if tensor is not None:
+                stress[i] = np.array(tensor, dtype=np.float64)
+        self.result_dict['motion_step_stress'] = stress
+        self.result_dict['stress_unit'] = self.stress_unit
+
+    def _on_dispersion(self, line, run_type):  # pylint: disable=unused-argument
+        self.step['dispersion_energy_au'] = float(line.split()[2])
+
+    def _on_edens(self, line, run_type):  # pylint: disable=unused-argument
+        # Printed at every outer OT, and needed for understanding if something is going wrong (if !=0)
+        self.step['edens_rspace'] = float(line.split()[-1])
+
+    def _on_step_scf_not_converged(self, line, run_type):  # pylint: disable=unused-argument
+        self.step['scf_converged'] = False
+
+    #Note: with CELL_OPT/LBFGS there is no "STEP 0", while there is with CELL_OPT/BFGS
+    def _on_opt_step(self, line, run_type):
+        if run_type in ('GEO_OPT', 'CELL_OPT'):
+            self.step['step'] = int(line.split()[5])
+
+    def _on_max_step(self, line, run_type):
+        if run_type in ('GEO_OPT', 'CELL_OPT'):
+            self.step['max_step_au'] = float(line.split()[-1])
+
+    def _on_rms_step(self, line, run_type):
+        if run_type in ('GEO_OPT', 'CELL_OPT'):
+            self.step['rms_step_au'] = float(line.split()[-1])
+
+    def _on_max_grad(self, line, run_type):
+        if run_type in ('GEO_OPT', 'CELL_OPT'):
+            self.step['max_grad_au'] = float(line.split()[-1])
+
+    def _on_rms_grad(self, line, run_type):
+        if run_type in ('GEO_OPT', 'CELL_OPT'):
+            self.step['rms_grad_au'] = float(line.split()[-1])
+
+    def _on_opt_end(self, line, run_type):
+        if run_type in ('GEO_OPT', 'CELL_OPT') and line.split() == ['-' * 51]:
+            self.print_now = True
+
+    def _on_opt_converged(self, line, run_type):  # pylint: disable=unused-argument
+        if run_type in ('GEO_OPT', 'CELL_OPT'):  #not clear why it is doing a last one...
+            self.result_dict['motion_opt_converged'] = True
+
+    def _on_internal_pressure(self, line, run_type):
+        if run_type == 'CELL_OPT':
+            self.step['pressure_bar'] = float(line.split()[4])
+
+    def _on_md_step(self, line, run_type):
+        if run_type == 'MD-NVT' or (run_type == 'MD-NPT_F' and line.startswith(' STEP NUMBER')):
+            self.step['step'] = int(line.split()[3])
+
+    def _on_md_initial_pressure(self, line, run_type):
+        if run_type == 'MD-NVT' or (run_type == 'MD-NPT_F' and line.startswith(' INITIAL PRESSURE[bar]')):
+            self.step['pressure_bar'] = float(line.split()[3])
+            self.print_now = True
+
+    def _on_md_pressure(self, line, run_type):
+        """Read the pressure at an MD step, the last value of the step in NVT."""
+        if run_type == 'MD-NVT':
+            self.step['pressure_bar'] = float(line.split()[3])
+            self.print_now = True
+        elif run_type == 'MD-NPT_F' and line.startswith(' PRESSURE [bar]'):
+            self.step['pressure_bar'] = float(line.split()[3])
+
+    def _on_md_volume(self, line, run_type):
+        if run_type == 'MD-NPT_F' and line.startswith(' VOLUME[bohr^3]'):
+            self.step['cell_vol_angs3'] = float(line.split()[3]) * (BOHR2ANG**3)
+
+    def _on_md_lengths(self, line, run_type):
+        """Read the lengths of the cell at an NPT_F step."""
+        if run_type == 'MD-NPT_F' and line.startswith(' CELL LNTHS[bohr]'):
+            data = line.split()
+            self.step['cell_a_angs'] = float(data[3]) * BOHR2ANG
+            self.step['cell_b_angs'] = float(data[4]) * BOHR2ANG
+            self.step['cell_c_angs'] = float(data[5]) * BOHR2ANG
+
+    def _on_md_angles(self, line, run_type):
+        """Read the angles of the cell, the last value of an NPT_F step."""
+        if run_type == 'MD-NPT_F' and line.startswith(' CELL ANGLS[deg]'):
+            data = line.split()
+            self.step['cell_alp_deg'] = float(data[3])
+            self.step['cell_bet_deg'] = float(data[4])
+            self.step['cell_gam_deg'] = float(data[5])
+            self.print_now = True
+
+    ####################################################################
+    #  END PARSING GEO_OPT/CELL_OPT/MD STEP                            #
+    ####################################################################
+
+
+def _stack_blocks(blocks):
+    """Stack per-atom arrays printed several times into an array of shape (nblocks, natoms, ...).
+
+    :return: the array and None or, if the number of atoms changes between blocks (e.g. fragments), the concatenated
+        blocks and the number of atoms of every block.
+    """
+    import numpy as np
+
+    natoms = [len(block) for block in blocks]
+    if len(set(natoms)) == 1:
+        return np.array(blocks), None
+    return np.concatenate(blocks), np.array(natoms)
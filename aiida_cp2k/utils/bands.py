@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K parser of the band structure printed in the CP2K output."""
+
+import math
+import re
+
+_NKPOINTS_RE = re.compile(r"KPOINTS\| Number of k-points in set", re.IGNORECASE)
+
+
+class _BandStructureParser:  # pylint: disable=too-many-instance-attributes
+    """Incremental parser of the band structure printed after "KPOINTS| Band Structure Calculation".
+
+    Lines are fed one by one. The boundaries of the eigenvalue blocks are found from the k-point headers and the
+    number of bands, the rows of a block are only collected as text and then converted with a single NumPy call into
+    arrays preallocated from the number of k-points announced by CP2K.
+    """
+
+    def __init__(self, cp2k_version):
+        self.cp2k_version = cp2k_version
+        self.kpoints = []
+        self.labels = []
+        self.known_kpoints = {}
+        self.nkpoints = 0  # As announced in the output, used to preallocate the bands
+        self.nbands = None
+        self.bands = [None, None]  # One (nkpoints, nbands) array per spin
+        self.filled = [0, 0]  # Number of k-points stored per spin
+        self.block = None  # Spin index of the block being read
+        self.rows = []  # Rows of the block being read
+        self.rows_left = None  # Number of rows left in the block being read, None if not known yet
+        self.title_left = False  # A title line has to be skipped before the rows (CP2K >=8.1)
+
+        if cp2k_version < 8.1:
+            self.pattern = re.compile("Nr.*?Spin.*?K-Point", re.DOTALL)
+            self.unspecified = ["not", "specified"]
+        else:
+            self.pattern = re.compile("Point.*?Spin", re.DOTALL)
+            self.unspecified = ["not", "specifi"]
+
+    def feed(self, line):
+        """Parse one more line of the output."""
+        if self.block is not None and self._read_block(line):
+            return
+
+        if "KPOINTS| Special" in line:
+            splitted = line.split()
+            kpoint = tuple(float(p) for p in splitted[-3:])
+            if splitted[-5:-3] != self.unspecified:
+                label = splitted[-4]
+                self.known_kpoints[kpoint] = label
+
+        elif _NKPOINTS_RE.search(line):
+            self.nkpoints += int(line.split()[-1])
+
+        elif self.pattern.search(line):
+            splitted = line.split()
+            if self.cp2k_version < 8.1:
+                spin = int(splitted[3])
+                kpoint = tuple(float(p) for p in splitted[-3:])
+            else:
+                spin = int(splitted[4][:-1])
+                kpoint = tuple(float(p) for p in splitted[-4:-1])
+
+            if spin == 1:
+                if kpoint in self.known_kpoints:
+                    self.labels.append((len(self.kpoints), self.known_kpoints[kpoint]))
+                self.kpoints.append(kpoint)
+            if spin in (1, 2):
+                self.block = spin - 1
+                self.rows = []
+                if self.cp2k_version < 8.1:
+                    self.rows_left = None  # Given by the next line
+                else:
+                    self.rows_left = self.nbands
+                    self.title_left = True
+
+    def _read_block(self, line):
+        """Collect one line of the current block, return False if the line is not part of it."""
+        if self.cp2k_version < 8.1:
+            # The header of a k-point is followed by the number of bands and the eigenvalues as 4-columns rows.
+            if self.rows_left is None:
+                self.rows_left = int(math.ceil(int(line) / 4))
+            else:
+                self.rows.append(line)
+                self.rows_left -= 1
+        else:
+            # The header of a k-point is followed by a title and one "band energy occupation" row per band.
+            if self.title_left:
+                self.title_left = False
+                return True
+            if self.rows_left is None:  # First block: the number of bands is not known yet, it ends at any other line
+                try:
+                    float(line.split()[1])
+                except (IndexError, ValueError):
+                    self._store_block()
+                    return False
+            self.rows.append(line)
+            if self.rows_left is not None:
+                self.rows_left -= 1
+
+        if self.rows_left == 0:
+            self._store_block()
+        return True
+
+    def _store_block(self):
+        """Convert the rows of the current block at once and store them in the bands of its spin."""
+        import numpy as np
+
+        values = np.array(" ".join(self.rows).split(), dtype=np.float64)
+        if self.cp2k_version >= 8.1:
+            values = values.reshape(len(self.rows), -1)[:, 1]
+
+        if self.nbands is None:
+            self.nbands = len(values)
+        elif len(values) != self.nbands:
+            raise ValueError(f"Inconsistent number of bands: {len(values)} instead of {self.nbands}.")
+
+        bands = self.bands[self.block]
+        i_kpoint = self.filled[self.block]
+        if bands is None:
+            bands = np.empty((max(self.nkpoints, i_kpoint + 1), self.nbands))
+        elif i_kpoint >= len(bands):  # More k-points than announced
+            bands = np.concatenate([bands, np.empty_like(bands)])
+        bands[i_kpoint] = values
+        self.bands[self.block] = bands
+        self.filled[self.block] += 1
+        self.block = None
+
+    def result(self):
+        """Return kpoints, labels and bands as parsed so far."""
+        import numpy as np
+
+        if self.block is not None and self.rows:
+            self._store_block()
+
+        bands = [bands[:filled] for bands, filled in zip(self.bands, self.filled) if bands is not None]
+        if len(bands) == 2:
+            bands = np.array(bands)
+        elif bands:
+            bands = bands[0]
+        else:
+            bands = np.array([])
+
+        return np.array(self.kpoints), self.labels, bands
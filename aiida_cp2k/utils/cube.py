@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K conversion of the cube files written by CP2K (densities, potentials, ...) to NumPy binary files.
+
+A cube file has two comment lines, the number of atoms and the origin, the number of points and the step vector along
+each axis, one line per atom (atomic number, charge, position) and then the values on the grid, with the last axis
+running fastest, all in atomic units. The grid is converted to a ``.npy`` file in chunks through a memory map, so that
+the whole grid is never held in memory, and the ``.npy`` file can later be memory-mapped to read only a part of it.
+"""
+
+import io
+import os
+from itertools import islice
+
+_CHUNK_LINES = 65536
+
+
+def read_cube_header(content):
+    """Read the header of a cube file, leaving the file at the first value of the grid.
+
+    :param content: an open file handle in text mode.
+    :return: dictionary with the 'comments' (the first two lines), the 'origin' of shape (3,), the 'voxel' step
+        vectors of shape (3, 3), the 'shape' of the grid, the atomic 'numbers' and 'charges' and the 'positions' of
+        shape (natoms, 3) of the atoms. All lengths in Bohr.
+    """
+    import numpy as np
+
+    comments = [content.readline().rstrip('\n'), content.readline().rstrip('\n')]
+    try:
+        fields = content.readline().split()
+        natoms, origin = abs(int(fields[0])), np.array(fields[1:4], dtype=np.float64)
+        axes = np.array([content.readline().split()[:4] for _ in range(3)], dtype=np.float64).reshape(3, 4)
+        atoms = np.array([content.readline().split()[:5] for _ in range(natoms)], dtype=np.float64).reshape(natoms, 5)
+    except (IndexError, ValueError) as exc:
+        raise ValueError("The header of the cube file is corrupted.") from exc
+
+    return {
+        'comments': comments,
+        'origin': origin,
+        'voxel': axes[:, 1:],
+        'shape': tuple(int(npoints) for npoints in axes[:, 0]),
+        'numbers': atoms[:, 0].astype(np.int64),
+        'charges': atoms[:, 1],
+        'positions': atoms[:, 2:],
+    }
+
+
+def cube_to_npy(content, fname):
+    """Convert the grid of a cube file to a NumPy binary file, in chunks.
+
+    :param content: the content as a string, or an open file handle in text mode.
+    :param fname: path of the ``.npy`` file to write, with the grid of shape (nx, ny, nz).
+    :return: the header of the cube file, see `read_cube_header`.
+    """
+    import numpy as np
+
+    handle = io.StringIO(content) if isinstance(content, str) else content
+    header = read_cube_header(handle)
+
+    grid = np.lib.format.open_memmap(fname, mode='w+', dtype=np.float64, shape=header['shape'])
+    values = grid.reshape(-1)  # A view, the memory map is C-contiguous
+    size = 0
+    try:
+        for lines in iter(lambda: list(islice(handle, _CHUNK_LINES)), []):
+            chunk = np.fromstring(''.join(lines), dtype=np.float64, sep=' ')
+            if size + len(chunk) > len(values):
+                raise ValueError(f"The cube file has more than the {len(values)} values of its grid.")
+            values[size:size + len(chunk)] = chunk
+            size += len(chunk)
+        if size != len(values):
+            raise ValueError(f"The cube file has {size} of the {len(values)} values of its grid.")
+        grid.flush()
+    finally:
+        del values, grid  # Close the memory map
+    return header
+
+
+def memory_map_array(node, name, mmap_mode='r'):
+    """Return an array of an ArrayData node memory-mapped from the repository, without reading it.
+
+    The array is loaded whole if the node is not stored, or with a warning if its file is not a file on disk.
+
+    :param node: the ArrayData node, e.g. an output of `output_cubes`.
+    :param name: the name of the array, e.g. 'grid'.
+    :param mmap_mode: the mode of the memory map, see `numpy.load`.
+    """
+    import warnings
+    import numpy as np
+
+    if name not in node.get_arraynames():
+        raise KeyError(f"The node has no array '{name}'.")
+    if not node.is_stored:
+        return node.get_array(name)
+
+    with node.open(f'{name}.npy', 'rb') as handle:
+        path = getattr(handle, 'name', None)
+    if isinstance(path, str) and os.path.isfile(path):
+        return np.load(path, mmap_mode=mmap_mode)
+
+    warnings.warn(f"The array '{name}' of node {node.pk} is not a file on disk and cannot be memory-mapped: it is "
+                  "loaded whole.")
+    return node.get_array(name)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K summariser of the CP2K output, run on the remote computer next to CP2K.
+
+The output is reduced to a summary, made of its beginning (the header and the settings of the run) and its end (the
+final results, the timing report and the termination of CP2K), plus a compressed NumPy ``.npz`` file with the values
+printed at every step of the run, so that only these two small files have to be retrieved.
+
+This module is copied to the remote computer and run as a standalone script: it must only use the standard library
+of Python 3 and must not import anything from ``aiida_cp2k``.
+
+    python3 output_summary.py aiida.out --summary aiida-summary.out --steps aiida-summary-steps.npz
+"""
+
+import argparse
+import array
+import io
+import os
+import re
+import sys
+import zipfile
+
+DEFAULT_HEAD_SIZE = 256 * 1024  # bytes
+DEFAULT_TAIL_SIZE = 1024 * 1024  # bytes
+
+_CHUNK_SIZE = 16 * 1024**2
+
+# Values printed at every step: the energy of every force evaluation, the number of steps of every SCF run and the
+# maximum gradient of every optimization step. The regexes start with literal text, which the regex engine searches
+# for much faster than the beginning of lines.
+_ENERGY_RE = re.compile(rb'\n ENERGY\|[^\n]*')
+_GRADIENT_RE = re.compile(rb'Max\. gradient +=[^\n]*')
+_SCF_RE = re.compile(rb'\*\*\* SCF run (?:converged in +(\d+) steps|NOT converged)')
+
+
+def _npy(values, descr, shape):
+    """Return the content of a NumPy ``.npy`` file (format version 1.0) for the given raw values."""
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': {shape}, }}"
+    header += ' ' * (63 - (len(header) + 10) % 64) + '\n'  # The data is aligned on 64 bytes
+    return b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1') + values
+
+
+def _write_npz(fname, arrays):
+    """Write a compressed NumPy ``.npz`` file from a dictionary of `array.array` or integers (0-d arrays)."""
+    order = '<' if sys.byteorder == 'little' else '>'
+    with zipfile.ZipFile(fname, 'w', compression=zipfile.ZIP_DEFLATED) as npz:
+        for key, values in arrays.items():
+            if isinstance(values, int):
+                content = _npy(values.to_bytes(8, sys.byteorder, signed=True), order + 'i8', ())
+            elif values.typecode == 'B':  # booleans
+                content = _npy(values.tobytes(), '|b1', (len(values),))
+            else:
+                descr = order + ('f8' if values.typecode == 'd' else 'i8')
+                content = _npy(values.tobytes(), descr, (len(values),))
+            npz.writestr(key + '.npy', content)
+
+
+def summarize_cp2k_output(fname, summary_fname, steps_fname, head_size=DEFAULT_HEAD_SIZE, tail_size=DEFAULT_TAIL_SIZE):
+    """Write the summary of a CP2K output and the values printed at every step.
+
+    The summary is the output itself if it is smaller than `head_size + tail_size`, else its first and last complete
+    lines up to these sizes, separated by a line giving the number of lines removed.
+
+    The ``.npz`` file contains the arrays 'energy' (energy of every force evaluation, in a.u.), 'scf_steps' (number of
+    steps of every SCF run, -1 if it did not converge), 'scf_converged' and 'max_gradient' (of every step of a geometry
+    or cell optimization), and the integers 'output_lines', 'output_bytes' and 'removed_lines'.
+
+    :param fname: the CP2K output file.
+    :param summary_fname: the summary file to write.
+    :param steps_fname: the ``.npz`` file to write.
+    :param head_size: maximum size of the beginning of the output kept in the summary, in bytes.
+    :param tail_size: maximum size of the end of the output kept in the summary, in bytes.
+    """
+    arrays = {
+        'energy': array.array('d'),
+        'scf_steps': array.array('q'),
+        'scf_converged': array.array('B'),
+        'max_gradient': array.array('d'),
+    }
+    nlines = 0
+
+    with io.open(fname, 'rb') as handle:
+        # The output is scanned in chunks ending at a complete line: it can be several GB.
+        rest = b''
+        for chunk in iter(lambda: handle.read(_CHUNK_SIZE), b''):
+            chunk = rest + chunk
+            end = chunk.rfind(b'\n') + 1
+            chunk, rest = chunk[:end], chunk[end:]
+            nlines += chunk.count(b'\n')
+            for key, regex, text in (('energy', _ENERGY_RE, b'\n' + chunk), ('max_gradient', _GRADIENT_RE, chunk)):
+                for match in regex.finditer(text):
+                    try:
+                        arrays[key].append(float(match.group().split()[-1]))
+                    except (IndexError, ValueError):
+                        pass
+            for match in _SCF_RE.finditer(chunk):
+                arrays['scf_steps'].append(-1 if match.group(1) is None else int(match.group(1)))
+                arrays['scf_converged'].append(0 if match.group(1) is None else 1)
+        if rest:
+            nlines += 1
+
+        size = handle.tell()
+        handle.seek(0)
+        if size <= head_size + tail_size:
+            head, tail = handle.read(), b''
+        else:
+            head = handle.read(head_size)
+            head = head[:head.rfind(b'\n') + 1]
+            handle.seek(size - tail_size)
+            tail = handle.read()
+            tail = tail[tail.find(b'\n') + 1:]
+
+    removed = nlines - head.count(b'\n') - tail.count(b'\n') - (1 if tail and not tail.endswith(b'\n') else 0)
+    with io.open(summary_fname, 'wb') as summary:
+        summary.write(head)
+        if tail:
+            summary.write(f' *** {removed} lines of the output were removed from this summary ***\n'.encode('ascii'))
+            summary.write(tail)
+
+    arrays.update(output_lines=nlines, output_bytes=size, removed_lines=removed if tail else 0)
+    _write_npz(steps_fname, arrays)
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help='The CP2K output file.')
+    parser.add_argument('--summary', help='The summary file (default: the output file name + ".summary").')
+    parser.add_argument('--steps', help='The .npz file of the values at every step (default: the summary + ".npz").')
+    parser.add_argument('--head-size', type=int, default=DEFAULT_HEAD_SIZE, help='Size of the beginning in bytes.')
+    parser.add_argument('--tail-size', type=int, default=DEFAULT_TAIL_SIZE, help='Size of the end in bytes.')
+    args = parser.parse_args(argv)
+
+    summary = args.summary or args.output + '.summary'
+    if not os.path.isfile(args.output):
+        print(f"The output file '{args.output}' does not exist.", file=sys.stderr)
+        return 1
+    summarize_cp2k_output(args.output, summary, args.steps or summary + '.npz', args.head_size, args.tail_size)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K streaming front-end of the block parser of cp2k-output-tools.
+
+The block parser finds the blocks of a whole output string, one block per block type. Here the output is instead cut
+into segments, one per SCF run (each starting with " SCF WAVEFUNCTION OPTIMIZATION", plus the segments before the
+first and after the last run), which are read from the file and parsed one at a time. The blocks printed at every step
+(energies, forces, ...) are accumulated into columns, the other ones are merged as by the non-streaming parser.
+"""
+
+import io
+
+# Start of the segments: every force evaluation starts with an SCF run.
+_SEGMENT_START = ' SCF WAVEFUNCTION OPTIMIZATION'
+
+# Block types printed at every step, accumulated into columns. The other block types are merged.
+REPEATED_BLOCKS = ('energies', 'forces', 'mulliken_population_analysis', 'overlap_matrix_condition_number')
+
+
+def _iter_segments(lines):
+    """Yield the segments of the output, as strings.
+
+    The last segment also gets the "PROGRAM STARTED" banner of the first one, so that the program info block, which
+    spans the banners at the start and at the end of the output, is found whole.
+    """
+    segment, banner = [], None
+    for line in lines:
+        if line.startswith(_SEGMENT_START) and segment:
+            if banner is None:
+                banner = _program_banner(segment)
+            yield ''.join(segment)
+            segment = []
+        segment.append(line)
+    if segment:
+        yield ''.join((banner or []) + segment)
+
+
+def _program_banner(lines):
+    """Return the lines of the "PROGRAM STARTED" banner."""
+    banner = []
+    for line in lines:
+        if ' PROGRAM STARTED AT ' in line or (banner and line.lstrip().startswith('*') and ' PROGRAM ' in line):
+            banner.append(line)
+        elif banner and line.startswith(' ' * 43):  # Continuation of the "PROGRAM STARTED IN" directory
+            banner.append(line)
+        elif banner:
+            break
+    return banner
+
+
+def _columns(values):
+    """Convert the values of a block at every step into columns.
+
+    Dictionaries give dictionaries of columns, numbers give arrays, the lists of every step are converted first and
+    then stacked (e.g. the forces on every atom, of shape (nsteps, natoms)), strings equal at every step are kept once.
+    """
+    import numpy as np
+
+    if all(isinstance(value, dict) for value in values):
+        return {
+            key: _columns([value[key] for value in values
+                          ]) for key in values[0] if all(key in value for value in values)
+        }
+    if all(isinstance(value, list) for value in values):
+        return _columns([_columns(value) if value else np.array([]) for value in values])
+    if all(isinstance(value, np.ndarray) for value in values):
+        # The arrays are kept as lists if their shapes differ, e.g. a different number of atoms at every step
+        return np.stack(values) if len({value.shape for value in values}) == 1 else [value.tolist() for value in values]
+    if all(isinstance(value, (bool, int, float)) for value in values):
+        return np.array(values)
+    if all(isinstance(value, str) for value in values):
+        return values[0] if len(set(values)) == 1 else np.array(values)
+    return list(values)
+
+
+def parse_cp2k_output_tools(content, blocks=None):
+    """Parse a CP2K output with cp2k-output-tools one segment at a time.
+
+    :param content: the content as a string, or an open file handle in text mode, which is read one segment at a time.
+    :param blocks: the block types to keep, e.g. ``['energies', 'program_info']``, all of them by default. The block
+        types of cp2k-output-tools are named by their mangled keys: 'program_info', 'cp2k', 'global', 'dbcsr', 'dft',
+        'qs', 'mulliken_population_analysis', 'energies', 'forces', 'overlap_matrix_condition_number', 'warnings' and
+        'nwarnings'.
+    :return: dictionary of the blocks. The blocks of `REPEATED_BLOCKS` are dictionaries of columns, as NumPy arrays
+        with one row per step (e.g. ``result['energies']['total_force_eval']``), if they are found more than once.
+    """
+    from cp2k_output_tools import parse_iter
+
+    handle = io.StringIO(content) if isinstance(content, str) else content
+    keep = None if blocks is None else frozenset(blocks)
+
+    result = {}
+    repeated = {}  # Block type -> values at every step
+    for segment in _iter_segments(handle):
+        for match in parse_iter(segment, key_mangling=True):
+            for key, value in match.items():
+                if keep is not None and key not in keep:
+                    continue
+                if key in REPEATED_BLOCKS:
+                    repeated.setdefault(key, []).append(value)
+                elif isinstance(value, list):
+                    result.setdefault(key, []).extend(value)
+                elif isinstance(value, dict) and isinstance(result.get(key), dict):
+                    result[key].update(value)
+                else:
+                    result[key] = value
+
+    for key, values in repeated.items():
+        result[key] = values[0] if len(values) == 1 else _columns(values)
+    return result
+
+
+def split_arrays(result, separator='__'):
+    """Split the NumPy arrays from the other values of a parse result.
+
+    :return: the flat dictionary of the arrays, named by their path in `result` joined by `separator` (e.g.
+        'energies__total_force_eval'), and the rest of `result`.
+    """
+    import numpy as np
+
+    arrays, rest = {}, {}
+    for key, value in result.items():
+        if isinstance(value, np.ndarray):
+            arrays[key] = value
+        elif isinstance(value, dict):
+            sub_arrays, sub_rest = split_arrays(value, separator)
+            arrays.update({f'{key}{separator}{name}': array for name, array in sub_arrays.items()})
+            if sub_rest:
+                rest[key] = sub_rest
+        else:
+            rest[key] = value
+    return arrays, rest
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K on-disk cache of the parse results.
+
+The results are stored under a key made of the hash of the parsed file and of the version of the parser (version of the
+plugin and hash of the sources of the module of the parsing function and of the modules of the plugin it imports), so
+that re-parsing unchanged outputs with an unchanged parser only costs hashing the file. The cache is bounded in size:
+the least recently used entries are evicted first.
+
+The parsers use the cache only if the ``AIIDA_CP2K_PARSE_CACHE`` environment variable is set to its directory, its
+size in MB is given by ``AIIDA_CP2K_PARSE_CACHE_SIZE`` (1024 by default). The entries are pickled: only use a directory
+that is not writable by others.
+"""
+
+import ast
+import functools
+import hashlib
+import importlib.util
+import inspect
+import os
+import pickle
+import tempfile
+
+PARSE_CACHE_ENV = 'AIIDA_CP2K_PARSE_CACHE'
+PARSE_CACHE_SIZE_ENV = 'AIIDA_CP2K_PARSE_CACHE_SIZE'
+DEFAULT_PARSE_CACHE_SIZE = 1024 * 1024**2  # bytes
+
+_CHUNK_SIZE = 1024**2
+
+
+def file_digest(content):
+    """Return the SHA-256 hex digest of the content of a file.
+
+    :param content: the content as a string or bytes, or an open file handle, which is read in chunks from its current
+        position and then rewound to it if possible.
+    """
+    sha = hashlib.sha256()
+    if isinstance(content, str):
+        sha.update(content.encode('utf-8'))
+    elif isinstance(content, bytes):
+        sha.update(content)
+    else:
+        start = content.tell() if content.seekable() else None
+        for chunk in iter(functools.partial(content.read, _CHUNK_SIZE), content.read(0)):
+            sha.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if start is not None:
+            content.seek(start)
+    return sha.hexdigest()
+
+
+def _module_sources(name, sources):
+    """Add the source of the module `name`, and of the modules of the same top-level package that it imports, to the
+    dictionary `sources`, recursively.
+
+    The imports are read from the source, so that the imports inside functions are found too. Packages are skipped:
+    their ``__init__`` only gathers the names of their modules.
+    """
+    try:
+        spec = importlib.util.find_spec(name)
+        if spec.submodule_search_locations is not None:
+            return
+        with open(spec.origin, encoding='utf-8') as handle:
+            source = handle.read()
+    except (AttributeError, ImportError, OSError, TypeError, ValueError):  # Not a module, or no source available
+        return
+    sources[name] = source
+
+    package = name.rpartition('.')[0]
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.ImportFrom):
+            base = importlib.util.resolve_name('.' * node.level + (node.module or ''), package) if node.level else \
+                node.module
+            imported = [base] + [f'{base}.{alias.name}' for alias in node.names]
+        elif isinstance(node, ast.Import):
+            imported = [alias.name for alias in node.names]
+        else:
+            continue
+        for module in imported:
+            if module.partition('.')[0] == name.partition('.')[0] and module not in sources:
+                _module_sources(module, sources)
+
+
+@functools.lru_cache(maxsize=None)
+def parser_version(function):
+    """Return the version of a parsing function: version of the plugin and hash of the sources of its module and of
+    the modules of the plugin it imports (e.g. `parse_cp2k_restart` imports `aiida_cp2k.utils.trajectory`)."""
+    from aiida_cp2k import __version__
+
+    sources = {}
+    module = inspect.getmodule(function)
+    if module is not None:
+        _module_sources(module.__name__, sources)
+    sha = hashlib.sha256()
+    for name in sorted(sources):
+        sha.update(f'{name}\n{sources[name]}'.encode('utf-8'))
+    return f"{__version__}-{sha.hexdigest()[:16]}"
+
+
+class ParseCache:
+    """Size-bounded, least-recently-used on-disk cache of parse results.
+
+    :param directory: directory of the cache, created if needed. It can be shared by several processes.
+    :param max_size: maximum size of the cache in bytes.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_PARSE_CACHE_SIZE):
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self._size = None  # Estimated size of the cache, None until the directory is scanned
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_environment(cls):
+        """Return the cache configured by the environment variables, or None if there is none.
+
+        The same instance is returned for the same configuration, so that its size estimate is kept between parsings.
+        """
+        directory = os.environ.get(PARSE_CACHE_ENV)
+        if not directory:
+            return None
+        size = os.environ.get(PARSE_CACHE_SIZE_ENV)
+        return _get_cache(cls, directory, int(float(size) * 1024**2) if size else DEFAULT_PARSE_CACHE_SIZE)
+
+    @staticmethod
+    def key(function, digest):
+        """Return the key of the result of `function` on the file with the given digest."""
+        name = f'{function.__module__}.{function.__qualname__}'
+        return hashlib.sha256(f'{name}:{parser_version(function)}:{digest}'.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.pickle')
+
+    def get(self, key):
+        """Return the result stored under `key`, a new copy at every call. Raise KeyError if there is none."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as handle:
+                result = pickle.load(handle)
+            os.utime(path)  # Mark as recently used
+        except (OSError, EOFError, pickle.UnpicklingError) as exc:
+            raise KeyError(key) from exc
+        return result
+
+    def put(self, key, result):
+        """Store the result under `key`, then evict the least recently used entries if the cache is too large."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first: concurrent readers never see a partial entry.
+        handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as fobj:
+                pickle.dump(result, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        # The directory is only scanned when the estimated size, which ignores the other processes, is exceeded.
+        if self._size is None:
+            self.evict()
+        else:
+            self._size += os.path.getsize(path)
+            if self._size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in 90% of its maximum size."""
+        entries = []
+        for root, _, fnames in os.walk(self.directory):
+            for fname in fnames:
+                if fname.endswith('.pickle'):
+                    try:
+                        stat = os.stat(os.path.join(root, fname))
+                    except OSError:  # Removed by another process
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, os.path.join(root, fname)))
+
+        self._size = sum(entry[1] for entry in entries)
+        if self._size <= self.max_size:
+            return
+        for _, entry_size, path in sorted(entries):
+            if self._size <= 0.9 * self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._size -= entry_size
+
+    def parse(self, function, content, digest=None):
+        """Return `function(content)`, from the cache if the same file was already parsed by the same parser.
+
+        :param function: the parsing function, e.g. `parse_cp2k_output_advanced`.
+        :param content: the content as a string, or an open file handle that is seekable (it is read twice on a miss).
+        :param digest: digest of the content (see `file_digest`), if already known.
+        """
+        key = self.key(function, digest or file_digest(content))
+        try:
+            return self.get(key)
+        except KeyError:
+            pass
+        result = function(content)
+        self.put(key, result)
+        return result
+
+
+@functools.lru_cache(maxsize=None)
+def _get_cache(cls, directory, max_size):
+    return cls(directory, max_size)
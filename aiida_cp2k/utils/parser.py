@@ -7,17 +7,206 @@
 ###############################################################################
 """AiiDA-CP2K input plugin."""
 
+import os
 import re
-import math
+from itertools import islice
+
+from .advanced_parser import BOHR2ANG, _AdvancedOutputParser
+from .bands import _BandStructureParser
+
+# Size of the end of the output read to find out how CP2K terminated: it has to contain the timing report.
+OUTPUT_TAIL_SIZE = 256 * 1024
+
+
+def motion_step_info_to_arrays(motion_step_info):
+    """Convert the per-step lists of 'motion_step_info' to typed NumPy arrays.
+
+    :param motion_step_info: the 'motion_step_info' dictionary returned by `parse_cp2k_output_advanced`.
+    :return: dictionary of arrays: 'step' is integer, 'scf_converged' is boolean, all the other properties are floats,
+        with NaN where a value was not printed.
+    """
+    import numpy as np
+
+    arrays = {}
+    for key, values in motion_step_info.items():
+        if key == 'step':
+            arrays[key] = np.array(values, dtype=np.int64)
+        elif key == 'scf_converged':
+            arrays[key] = np.array(values, dtype=bool)
+        else:
+            arrays[key] = np.array(values, dtype=np.float64)
+    return arrays
+
+
+def _iter_lines(content):
+    """Iterate over the lines of `content` without line endings.
+
+    :param content: the whole file as a string, or an iterable of lines (e.g. an open file handle). The latter is
+        consumed lazily, so only the line being parsed is kept in memory.
+    """
+    if isinstance(content, str):
+        return iter(content.splitlines())
+    return (line.rstrip('\n') for line in content)
+
+
+def read_output_tail(handle, size=OUTPUT_TAIL_SIZE):
+    """Read the end of a CP2K output without reading the rest of the file.
+
+    :param handle: open file handle, preferably in binary mode. If it is not seekable the file is read through, keeping
+        only the last `size` bytes in memory.
+    :param size: number of bytes to read.
+    :return: the tail of the output as a string, starting at the first complete line.
+    """
+    try:
+        handle.seek(0, os.SEEK_END)
+        start = max(handle.tell() - size, 0)
+        handle.seek(start)
+        tail = handle.read()
+    except (AttributeError, OSError):
+        tail = handle.read(size)
+        start = 0
+        for chunk in iter(lambda: handle.read(size), tail[:0]):
+            start += len(chunk)
+            tail = tail[len(chunk):] + chunk
+
+    if isinstance(tail, bytes):
+        tail = tail.decode('utf-8', errors='replace')
+    if start > 0:
+        tail = tail[tail.find('\n') + 1:]
+    return tail
+
+
+# Signatures of the errors of CP2K, as (exit code, literal text, fatal), by decreasing priority. Fatal errors make CP2K
+# abort and are printed at the end of the output: they only count if CP2K did not finish properly.
+CP2K_ERROR_SIGNATURES = (
+    ('ERROR_OUT_OF_MEMORY', 'Out of memory', True),
+    ('ERROR_OUT_OF_MEMORY', 'out of memory', True),
+    ('ERROR_OUT_OF_MEMORY', 'Cannot allocate memory', True),
+    ('ERROR_OUT_OF_MEMORY', 'std::bad_alloc', True),
+    ('ERROR_CHOLESKY_FAILED', 'Cholesky decompose failed', True),
+    ('ERROR_CHOLESKY_FAILED', 'Cholesky decomposition failed', True),
+    ('ERROR_SCF_NOT_CONVERGED', 'IGNORE_CONVERGENCE_FAILURE', True),
+    ('ERROR_MPI_ABORT', 'MPI_ABORT was invoked', True),
+    ('ERROR_MPI_ABORT', 'called MPI_Abort', True),
+    ('ERROR_OUT_OF_WALLTIME', 'exceeded requested execution time', False),
+    ('ERROR_GEOMETRY_CONVERGENCE_NOT_REACHED', 'MAXIMUM NUMBER OF OPTIMIZATION STEPS REACHED', False),
+)
+
+
+def _compile_keywords(keywords):
+    """Compile (name, literal text) keywords into one alternation, scanning a line once however many they are.
+
+    The longest texts come first, so that a text wins over the texts it contains, which are then found through it.
+
+    :return: the regex and a dictionary, matched text -> names of all the keywords contained in the text.
+    """
+    texts = sorted({text for _, text in keywords}, key=len, reverse=True)
+    names = {text: tuple(dict.fromkeys(name for name, other in keywords if other in text)) for text in texts}
+    return re.compile('|'.join(re.escape(text) for text in texts)), names
+
+
+_TERMINATION_RE, _TERMINATION_NAMES = _compile_keywords((
+    ('nwarnings', 'The number of warnings for this run is'),
+    ('walltime', 'exceeded requested execution time'),
+    ('abort', 'ABORT'),
+    ('finished', 'PROGRAM ENDED AT'),
+) + tuple((code, text) for code, text, _ in CP2K_ERROR_SIGNATURES))
+
+_FATAL_ERRORS = frozenset(code for code, _, fatal in CP2K_ERROR_SIGNATURES if fatal)
+
+
+def parse_cp2k_termination(fstring):
+    """Find out how CP2K terminated from the end of its output.
+
+    :param fstring: the tail of the output (see `read_output_tail`) as a string, or an iterable of lines.
+    :return: dictionary with the 'status' of the run, one of 'finished', 'walltime_exceeded', 'aborted' (the output
+        contains "ABORT") or 'truncated' (CP2K was killed before printing "PROGRAM ENDED AT"), the 'exceeded_walltime'
+        and 'aborted' flags, if found, the number of warnings 'nwarnings', the exit codes of the 'errors' found (see
+        `CP2K_ERROR_SIGNATURES`) and the 'exit_code' of the calculation: the most severe error, None if there is none.
+    """
+    result_dict = {}
+    found = set()
+
+    for line in _iter_lines(fstring):
+        for match in _TERMINATION_RE.finditer(line):
+            names = _TERMINATION_NAMES[match.group()]
+            if 'nwarnings' in names:
+                result_dict["nwarnings"] = int(line.split()[-1])
+            if match.group() == 'ABORT':  # The banner of CP2K, not the "MPI_ABORT" of the MPI launcher
+                found.add('cp2k_abort')
+            found.update(names)
+
+    result_dict["exceeded_walltime"] = 'walltime' in found
+    result_dict["aborted"] = 'abort' in found
+    if result_dict["aborted"]:
+        result_dict["status"] = "aborted"
+    elif result_dict["exceeded_walltime"]:
+        result_dict["status"] = "walltime_exceeded"
+    elif 'finished' in found:
+        result_dict["status"] = "finished"
+    else:
+        result_dict["status"] = "truncated"
+
+    result_dict["errors"] = list(dict.fromkeys(code for code, _, _ in CP2K_ERROR_SIGNATURES if code in found))
+    failed = result_dict["status"] in ("aborted", "truncated")
+    # The MPI abort that follows an abort of CP2K is only its consequence: the error is that of CP2K.
+    ignored = {'ERROR_MPI_ABORT'} if 'cp2k_abort' in found else set()
+    result_dict["exit_code"] = next(
+        (code for code in result_dict["errors"] if code not in ignored and (failed or code not in _FATAL_ERRORS)),
+        "ERROR_OUTPUT_CONTAINS_ABORT" if result_dict["aborted"] else None)
+
+    return result_dict
+
+
+# Columns of the timing report, after the name of the routine.
+_TIMING_COLUMNS = ('calls', 'asd', 'self_time_average', 'self_time_maximum', 'total_time_average', 'total_time_maximum')
+
+
+def parse_cp2k_timing(fstring):
+    """Parse the "T I M I N G" report printed by CP2K at the end of the run.
+
+    :param fstring: the output, or its tail (see `read_output_tail`), as a string or an iterable of lines.
+    :return: dictionary of arrays with an entry per subroutine: 'routine' (name), 'calls' (maximum number of calls over
+        the MPI ranks), 'asd' (average stack depth), 'self_time_average', 'self_time_maximum', 'total_time_average' and
+        'total_time_maximum' (in seconds, average and maximum over the MPI ranks). None if there is no timing report.
+    """
+    import numpy as np
+
+    lines = _iter_lines(fstring)
+    for line in lines:
+        if "T I M I N G" in line:
+            break
+    else:
+        return None
+
+    routines = []
+    rows = []
+    for line in lines:
+        if line.startswith(' -'):  # Frame of the title, or end of the table
+            if routines:
+                break
+            continue
+        if line.startswith(' SUBROUTINE') or line.startswith('   ') or not line.strip():
+            continue  # Headers of the columns
+        routine, values = line.split(None, 1)
+        routines.append(routine)
+        rows.append(values)
+
+    values = np.array(' '.join(rows).split(), dtype=np.float64).reshape(len(rows), len(_TIMING_COLUMNS))
+    timing = {'routine': np.array(routines)}
+    timing.update({column: values[:, i] for i, column in enumerate(_TIMING_COLUMNS)})
+    timing['calls'] = timing['calls'].astype(np.int64)
+    return timing
 
 
 def parse_cp2k_output(fstring):
-    """Parse CP2K output into a dictionary."""
-    lines = fstring.splitlines()
+    """Parse CP2K output into a dictionary.
 
+    :param fstring: the output as a string, or an iterable of lines (e.g. an open file handle).
+    """
     result_dict = {"exceeded_walltime": False}
 
-    for line in lines:
+    for line in _iter_lines(fstring):
         if line.startswith(" ENERGY| "):
             result_dict["energy"] = float(line.split()[8])
             result_dict["energy_units"] = "a.u."
@@ -31,371 +220,219 @@ def parse_cp2k_output(fstring):
     return result_dict
 
 
-def parse_cp2k_output_advanced(fstring):  # pylint: disable=too-many-locals, too-many-statements, too-many-branches
-    """Parse CP2K output into a dictionary (ADVANCED: more info parsed @ PRINT_LEVEL MEDIUM)."""
-    lines = fstring.splitlines()
+def parse_cp2k_output_advanced(fstring):
+    """Parse CP2K output into a dictionary (ADVANCED: more info parsed @ PRINT_LEVEL MEDIUM).
 
-    result_dict = {"exceeded_walltime": False}
-    result_dict['warnings'] = []
-    line_is = None
-    energy = None
-    bohr2ang = 0.529177208590000
-
-    for i_line, line in enumerate(lines):
-        if line.startswith(' CP2K| version string:'):
-            cp2k_version = float(line.split()[5])
-            result_dict['cp2k_version'] = cp2k_version
-        if line.startswith(' ENERGY| '):
-            energy = float(line.split()[8])
-            result_dict['energy'] = energy
-            result_dict['energy_units'] = "a.u."
-        if line.strip().startswith('Total energy: '):
-            # In case of constrained geo opt, "ENERGY| ..." also contains the constraint energy
-            # This only contains the electronic SCF energy
-            energy_scf = float(line.split()[2])
-            result_dict['energy_scf'] = energy_scf
-        if 'The number of warnings for this run is' in line:
-            result_dict['nwarnings'] = int(line.split()[-1])
-        if 'exceeded requested execution time' in line:
-            result_dict['exceeded_walltime'] = True
-        if "ABORT" in line:
-            result_dict["aborted"] = True
-        if "KPOINTS| Band Structure Calculation" in line:
-            kpoints, labels, bands = _parse_bands(lines, i_line, cp2k_version)
-            result_dict["kpoint_data"] = {
-                "kpoints": kpoints,
-                "labels": labels,
-                "bands": bands,
-                "bands_unit": "eV",
-            }
-        if line.startswith(' GLOBAL| Run type'):
-            result_dict['run_type'] = line.split()[-1]
-
-        if line.startswith(' MD| Ensemble Type'):
-            result_dict['run_type'] += '-'
-            result_dict['run_type'] += line.split()[-1]  #e.g., 'MD-NPT_F'
-
-        if line.startswith(' DFT| ') and 'dft_type' not in result_dict.keys():
-            result_dict['dft_type'] = line.split()[-1]  # RKS, UKS or ROKS
-
-        if line.strip().startswith("Integrated absolute spin density"):
-            if 'integrated_abs_spin_dens' not in result_dict:
-                result_dict['integrated_abs_spin_dens'] = []
-            result_dict['integrated_abs_spin_dens'].append(float(line.split()[-1]))
-
-        if line.strip().startswith("Ideal and single determinant"):
-            s2_ideal, s2_expect = line.split()[-2:]
-            if 'spin_square_ideal' not in result_dict:
-                result_dict['spin_square_ideal'] = float(s2_ideal)
-            if 'spin_square_expectation' not in result_dict:
-                result_dict['spin_square_expectation'] = []
-            result_dict['spin_square_expectation'].append(float(s2_expect))
-
-        # read the number of electrons in the first scf (NOTE: it may change but it is not updated!)
-        if re.search('Number of electrons: ', line):
-            if 'init_nel_spin1' not in result_dict.keys():
-                result_dict['init_nel_spin1'] = int(line.split()[3])
-                if result_dict['dft_type'] == 'RKS':
-                    result_dict['init_nel_spin1'] //= 2  #// returns an integer
-                    result_dict['init_nel_spin2'] = result_dict['init_nel_spin1']
-            elif 'init_nel_spin2' not in result_dict.keys():
-                result_dict['init_nel_spin2'] = int(line.split()[3])
-
-        if re.search('- Atoms: ', line):
-            result_dict['natoms'] = int(line.split()[-1])
-
-        if re.search('Smear method', line):
-            result_dict['smear_method'] = line.split()[-1]
-
-        if re.search(r"subspace spin", line):
-            if int(line.split()[-1]) == 1:
-                line_is = 'eigen_spin1_au'
-                if 'eigen_spin1_au' not in result_dict.keys():
-                    result_dict['eigen_spin1_au'] = []
-            elif int(line.split()[-1]) == 2:
-                line_is = 'eigen_spin2_au'
-                if 'eigen_spin2_au' not in result_dict.keys():
-                    result_dict['eigen_spin2_au'] = []
-            continue
-
-        # Parse warnings
-        if re.search(r"Using a non-square number of", line):
-            result_dict['warnings'].append('Using a non-square number of MPI ranks')
-        if re.search(r"SCF run NOT converged", line):
-            warn = "One or more SCF run did not converge"
-            if warn not in result_dict['warnings']:
-                result_dict['warnings'].append(warn)
-        if re.search(r"Specific L-BFGS convergence criteria", line):
-            result_dict["warnings"].append("LBFGS converged with specific criteria")
-
-        # If a tag has been detected, now read the following line knowing what they are
-        if line_is is not None:
-            # Read eigenvalues as 4-columns row, then convert to float
-            if line_is in ['eigen_spin1_au', 'eigen_spin2_au']:
-                if re.search(r"-------------", line) or re.search(r"Reached convergence", line):
-                    continue
-                if line.split() and len(line.split()) <= 4:
-                    result_dict[line_is] += [float(x) for x in line.split()]
-                else:
-                    line_is = None
-
-        ####################################################################
-        #  THIS SECTION PARSES THE PROPERTIES AT GOE_OPT/CELL_OPT/MD STEP  #
-        #  BC: it can be not robust!                                         #
-        ####################################################################
-        if 'run_type' in result_dict.keys() and result_dict['run_type'] in [
-                'ENERGY', 'ENERGY_FORCE', 'GEO_OPT', 'CELL_OPT', 'MD', 'MD-NVT', 'MD-NPT_F'
-        ]:
-            # Initialization
-            if 'motion_step_info' not in result_dict:
-                result_dict['motion_opt_converged'] = False
-                result_dict['motion_step_info'] = {
-                    'step': [],  # MOTION step
-                    'energy_au': [],  # total energy
-                    'dispersion_energy_au': [],  # Dispersion energy (if dispersion correction activated)
-                    'pressure_bar': [],  # Total pressure on the cell
-                    'cell_vol_angs3': [],  # Cell Volume
-                    'cell_a_angs': [],  # Cell dimension A
-                    'cell_b_angs': [],  # Cell dimension B
-                    'cell_c_angs': [],  # Cell dimension C
-                    'cell_alp_deg': [],  # Cell angle Alpha
-                    'cell_bet_deg': [],  # Cell angle Beta
-                    'cell_gam_deg': [],  # Cell angle Gamma
-                    'max_step_au': [],  # Max atomic displacement (in optimization)
-                    'rms_step_au': [],  # RMS atomic displacement (in optimization)
-                    'max_grad_au': [],  # Max atomic force (in optimization)
-                    'rms_grad_au': [],  # RMS atomic force (in optimization)
-                    'edens_rspace': [],  # Total charge density on r-space grids (should stay small)
-                    'scf_converged': [],  # SCF converged in this motions step (bool)
-                }
-                step = 0
-                energy = None
-                dispersion = None  #Needed if no dispersions are included
-                pressure = None
-                max_step = None
-                rms_step = None
-                max_grad = None
-                rms_grad = None
-                edens_rspace = None
-                scf_converged = True
-
-            print_now = False
-            data = line.split()
-            # Parse general info
-            if line.startswith(' CELL|'):
-                if re.search(r"Volume", line):
-                    cell_vol = float(data[3])
-                if re.search(r"Vector a", line):
-                    cell_a = float(data[9])
-                if re.search(r"Vector b", line):
-                    cell_b = float(data[9])
-                if re.search(r"Vector c", line):
-                    cell_c = float(data[9])
-                if re.search(r"alpha", line):
-                    cell_alp = float(data[5])
-                if re.search(r"beta", line):
-                    cell_bet = float(data[5])
-                if re.search(r"gamma", line):
-                    cell_gam = float(data[5])
-
-            if re.search(r"Dispersion energy", line):
-                dispersion = float(data[2])
-            if re.search('Total charge density on r-space grids:', line):
-                # Printed at every outer OT, and needed for understanding if something is going wrong (if !=0)
-                edens_rspace = float(line.split()[-1])
-            if re.search(r"SCF run NOT converged", line):
-                scf_converged = False
-
-            # Parse specific info
-            if result_dict['run_type'] in ['ENERGY', 'ENERGY_FORCE']:
-                if energy is not None and not result_dict['motion_step_info']['step']:
-                    print_now = True
-            if result_dict['run_type'] in ['GEO_OPT', 'CELL_OPT']:
-                #Note: with CELL_OPT/LBFGS there is no "STEP 0", while there is with CELL_OPT/BFGS
-                if re.search(r"Informations at step", line):
-                    step = int(data[5])
-                if re.search(r"Max. step size             =", line):
-                    max_step = float(data[-1])
-                if re.search(r"RMS step size              =", line):
-                    rms_step = float(data[-1])
-                if re.search(r"Max. gradient              =", line):
-                    max_grad = float(data[-1])
-                if re.search(r"RMS gradient               =", line):
-                    rms_grad = float(data[-1])
-                if len(data) == 1 and data[0] == '---------------------------------------------------':
-                    print_now = True  # 51('-')
-                if re.search(r"Reevaluating energy at the minimum", line):  #not clear why it is doing a last one...
-                    result_dict['motion_opt_converged'] = True
-
-            if result_dict['run_type'] == 'CELL_OPT':
-                if re.search(r"Internal Pressure", line):
-                    pressure = float(data[4])
-            if result_dict['run_type'] == 'MD-NVT':
-                if re.search(r"STEP NUMBER", line):
-                    step = int(data[3])
-                if re.search(r"INITIAL PRESSURE\[bar\]", line):
-                    pressure = float(data[3])
-                    print_now = True
-                if re.search(r"PRESSURE \[bar\]", line):
-                    pressure = float(data[3])
-                    print_now = True
-            if result_dict['run_type'] == 'MD-NPT_F':
-                if re.search(r"^ STEP NUMBER", line):
-                    step = int(data[3])
-                if re.search(r"^ INITIAL PRESSURE\[bar\]", line):
-                    pressure = float(data[3])
-                    print_now = True
-                if re.search(r"^ PRESSURE \[bar\]", line):
-                    pressure = float(data[3])
-                if re.search(r"^ VOLUME\[bohr\^3\]", line):
-                    cell_vol = float(data[3]) * (bohr2ang**3)
-                if re.search(r"^ CELL LNTHS\[bohr\]", line):
-                    cell_a = float(data[3]) * bohr2ang
-                    cell_b = float(data[4]) * bohr2ang
-                    cell_c = float(data[5]) * bohr2ang
-                if re.search(r"^ CELL ANGLS\[deg\]", line):
-                    cell_alp = float(data[3])
-                    cell_bet = float(data[4])
-                    cell_gam = float(data[5])
-                    print_now = True
-
-            if print_now and energy is not None:
-                result_dict['motion_step_info']['step'].append(step)
-                result_dict['motion_step_info']['energy_au'].append(energy)
-                result_dict['motion_step_info']['dispersion_energy_au'].append(dispersion)
-                result_dict['motion_step_info']['pressure_bar'].append(pressure)
-                result_dict['motion_step_info']['cell_vol_angs3'].append(cell_vol)
-                result_dict['motion_step_info']['cell_a_angs'].append(cell_a)
-                result_dict['motion_step_info']['cell_b_angs'].append(cell_b)
-                result_dict['motion_step_info']['cell_c_angs'].append(cell_c)
-                result_dict['motion_step_info']['cell_alp_deg'].append(cell_alp)
-                result_dict['motion_step_info']['cell_bet_deg'].append(cell_bet)
-                result_dict['motion_step_info']['cell_gam_deg'].append(cell_gam)
-                result_dict['motion_step_info']['max_step_au'].append(max_step)
-                result_dict['motion_step_info']['rms_step_au'].append(rms_step)
-                result_dict['motion_step_info']['max_grad_au'].append(max_grad)
-                result_dict['motion_step_info']['rms_grad_au'].append(rms_grad)
-                result_dict['motion_step_info']['edens_rspace'].append(edens_rspace)
-                result_dict['motion_step_info']['scf_converged'].append(scf_converged)
-                scf_converged = True
-        ####################################################################
-        #  END PARSING GEO_OPT/CELL_OPT/MD STEP                            #
-        ####################################################################
+    :param fstring: the output as a string, or an iterable of lines (e.g. an open file handle).
+    """
+    return _AdvancedOutputParser().parse(_iter_lines(fstring))
 
-    return result_dict
-
-
-def _parse_kpoint_cp2k_lower_81(lines, line_n):
-    """Parse one k-point in the output of CP2K <8.1"""
-
-    splitted = lines[line_n].split()
-    spin = int(splitted[3])
-    kpoint = tuple(float(p) for p in splitted[-3:])
-    nlines = int(math.ceil(int(lines[line_n + 1]) / 4))
-    bands = [float(v) for v in " ".join(lines[line_n + 2:line_n + 2 + nlines]).split()]
-    return spin, kpoint, bands
 
+def _parse_bands(lines, n_start, cp2k_version):
+    """Parse band structure from the CP2K output.
+
+    :param lines: the output as a string, or an iterable of lines.
+    :param n_start: index of the line from which the band structure is searched.
+    :param cp2k_version: CP2K version, which determines the format of the band structure.
+    """
+    parser = _BandStructureParser(cp2k_version)
+    for line in islice(_iter_lines(lines), n_start, None):
+        parser.feed(line)
+    return parser.result()
+
+
+# Sections of a restart file read by `parse_cp2k_restart`.
+_SUBSYS_PATH = ('FORCE_EVAL', 'SUBSYS')
+_NOSE_PATH = ('MOTION', 'MD', 'THERMOSTAT', 'NOSE')
+_RESTART_SECTIONS = frozenset([
+    _SUBSYS_PATH + ('CELL',),
+    _SUBSYS_PATH + ('COORD',),
+    _SUBSYS_PATH + ('VELOCITY',),
+    _SUBSYS_PATH + ('TOPOLOGY',),
+] + [_NOSE_PATH + (name,) for name in ('COORD', 'VELOCITY', 'MASS', 'FORCE')])
+
+
+def _iter_input_sections(lines, paths):
+    """Tokenize a CP2K input (or restart) file into its sections.
+
+    Only the nesting of the sections is followed: the lines of the sections that are not requested are not split.
+
+    :param lines: iterable of lines of the input file.
+    :param paths: set of the requested sections, given as tuples of the names of the enclosing sections
+        (e.g. ``('FORCE_EVAL', 'SUBSYS', 'COORD')``).
+    :return: generator of `(path, parameters, body)`, with `parameters` the text following the name of the section
+        and `body` the stripped lines of the section, without its subsections and comments.
+    """
+    path = []
+    opened = []  # For every open section: its parameters and body, or None if it is not requested.
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] in '#!':
+            continue
+        if line[0] == '&':
+            name, _, parameters = line[1:].partition(' ')
+            name = name.upper()
+            if name == 'END':
+                if path:
+                    section = opened.pop()
+                    if section is not None:
+                        yield tuple(path), section[0], section[1]
+                    path.pop()
+                continue
+            path.append(name)
+            opened.append((parameters.strip(), []) if tuple(path) in paths else None)
+        elif opened and opened[-1] is not None:
+            opened[-1][1].append(line)
+
+
+def _split_kind(kinds):
+    """Split atomic kind names such as 'H1' into the element symbols and the integer tags (0 if there is none)."""
+    symbols = []
+    tags = []
+    known = {}
+    for kind in kinds:
+        if kind not in known:
+            tag = ''.join([s for s in kind if s.isdigit()])
+            known[kind] = (''.join([s for s in kind if not s.isdigit()]), int(tag) if tag else 0)
+        symbols.append(known[kind][0])
+        tags.append(known[kind][1])
+    return symbols, tags
 
-def _parse_bands_cp2k_greater_81(lines, line_n):
-    """Parse one k-point in the output of CP2K >=8.1"""
 
-    splitted = lines[line_n].split()
-    spin = int(splitted[4][:-1])
-    kpoint = tuple(float(p) for p in splitted[-4:-1])
-    bands = []
-    for line in lines[line_n + 2:]:
-        try:
-            bands.append(float(line.split()[1]))
-        except ValueError:
-            break
-    return spin, kpoint, bands
+def _to_bool(value):
+    """Convert a CP2K logical keyword value."""
+    return value.upper() in ('', 'T', 'TRUE', '.TRUE.', 'ON', 'YES')
 
 
-def _parse_bands(lines, n_start, cp2k_version):
-    """Parse band structure from the CP2K output."""
+def _parse_restart_coord(rows):
+    """Parse the rows of a &COORD section: returns kinds, positions and the values of the UNIT and SCALED keywords."""
+    import numpy as np
 
+    unit = 'ANGSTROM'
+    scaled = False
+    kinds = []
+    coordinates = []
+    for row in rows:
+        kind, values = (row.split(None, 1) + [''])[:2]
+        if kind.upper() == 'UNIT':
+            unit = values.upper()
+        elif kind.upper() == 'SCALED':
+            scaled = _to_bool(values)
+        else:
+            kinds.append(kind)
+            coordinates.append(values)
+
+    # Convert the coordinates of all the atoms at once, unless some atoms have more columns than the coordinates
+    # (e.g. molecule names).
+    try:
+        positions = np.array(' '.join(coordinates).split(), dtype=np.float64).reshape(len(kinds), 3)
+    except ValueError:
+        positions = np.array([values.split()[:3] for values in coordinates], dtype=np.float64)
+    if unit == 'BOHR':
+        positions *= BOHR2ANG
+    return kinds, positions, scaled
+
+
+def _parse_restart_cell(rows):
+    """Parse the rows of a &CELL section: returns the cell vectors, the periodicity and the multiple of the cell."""
     import numpy as np
+    from .trajectory import _cellpar_to_cell
 
-    kpoints = []
-    labels = []
-    bands_s1 = []
-    bands_s2 = []
-    known_kpoints = {}
+    keywords = {}
+    for row in rows:
+        keyword = row.split(None, 1)
+        keywords[keyword[0].upper()] = keyword[1] if len(keyword) > 1 else ''
 
-    if cp2k_version < 8.1:
-        parse_one_kpoint = _parse_kpoint_cp2k_lower_81
-        pattern = re.compile(".*?Nr.*?Spin.*?K-Point.*?", re.DOTALL)
-        unspecified = ["not", "specified"]
-    else:
-        parse_one_kpoint = _parse_bands_cp2k_greater_81
-        pattern = re.compile(".*?Point.*?Spin.*?", re.DOTALL)
-        unspecified = ["not", "specifi"]
-
-    selected_lines = lines[n_start:]
-    for line_n, line in enumerate(selected_lines):
-        if "KPOINTS| Special" in line:
-            splitted = line.split()
-            kpoint = tuple(float(p) for p in splitted[-3:])
-            if splitted[-5:-3] != unspecified:
-                label = splitted[-4]
-                known_kpoints[kpoint] = label
-
-        elif pattern.match(line):
-            spin, kpoint, bands = parse_one_kpoint(selected_lines, line_n)
-
-            if spin == 1:
-                if kpoint in known_kpoints:
-                    labels.append((len(kpoints), known_kpoints[kpoint]))
-                kpoints.append(kpoint)
-                bands_s1.append(bands)
-            elif spin == 2:
-                bands_s2.append(bands)
-
-    if bands_s2:
-        bands = [bands_s1, bands_s2]
+    if 'ABC' in keywords:
+        angles = [float(v) for v in keywords.get('ALPHA_BETA_GAMMA', '90 90 90').split()]
+        cell = _cellpar_to_cell(np.array([[float(v) for v in keywords['ABC'].split()] + angles]))[0]
     else:
-        bands = bands_s1
+        cell = np.array(' '.join(keywords[vec] for vec in 'ABC').split(), dtype=np.float64).reshape(3, 3)
+
+    multiple = np.array(keywords.get('MULTIPLE_UNIT_CELL', '1 1 1').split(), dtype=int)
+    pbc = [direction in keywords.get('PERIODIC', 'XYZ').upper() for direction in 'XYZ']
+    return cell * multiple[:, np.newaxis], pbc, multiple
+
+
+def parse_cp2k_restart(content):
+    """Read the system and its dynamical state from a CP2K restart (or input) file.
+
+    The file is tokenized section by section in a single pass, so it can be streamed from an open file handle, and the
+    coordinate blocks are converted at once.
+
+    :param content: the content of the file as a string, or an iterable of its lines (e.g. an open file handle).
+    :return: dictionary with the keys
+        'symbols', 'tags': lists with an entry per atom.
+        'positions': array of shape (natoms, 3) [Angstrom].
+        'cell': array of shape (3, 3) [Angstrom], already multiplied by the MULTIPLE_UNIT_CELL of &CELL.
+        'pbc': list of 3 booleans.
+        'multiple_unit_cell': array with the MULTIPLE_UNIT_CELL of &TOPOLOGY, by which the atoms of &COORD have been
+        replicated.
+        'velocities': array of shape (natoms, 3) [bohr/au_time], or None if there is no &VELOCITY section.
+        'thermostat': dictionary with the flat arrays of the Nose-Hoover thermostat ('coord', 'velocity', 'mass',
+        'force'), only the ones that are present.
+    """
+    import numpy as np
 
-    return np.array(kpoints), labels, np.array(bands)
+    sections = {}
+    for path, _, body in _iter_input_sections(_iter_lines(content), _RESTART_SECTIONS):
+        sections.setdefault(path, body)  # Keep the first FORCE_EVAL only
+
+    try:
+        coord = sections[_SUBSYS_PATH + ('COORD',)]
+        cell = sections[_SUBSYS_PATH + ('CELL',)]
+    except KeyError as exc:
+        raise ValueError(f"No {'&'.join(exc.args[0])} section in the restart file.") from exc
+
+    cell, pbc, _ = _parse_restart_cell(cell)
+    kinds, positions, scaled = _parse_restart_coord(coord)
+
+    multiple = np.ones(3, dtype=int)
+    for row in sections.get(_SUBSYS_PATH + ('TOPOLOGY',), []):
+        keyword = row.split(None, 1)
+        if keyword[0].upper() == 'MULTIPLE_UNIT_CELL':
+            multiple = np.array(keyword[1].split(), dtype=int)
+
+    # The cell of &CELL is the full one, the atoms of &COORD belong to the unit cell.
+    unit_cell = cell / multiple[:, np.newaxis]
+    if scaled:
+        positions = positions @ unit_cell
+    if (multiple != 1).any():
+        shifts = np.array([[i, j, k] for k in range(multiple[2]) for j in range(multiple[1])
+                           for i in range(multiple[0])]) @ unit_cell
+        positions = (shifts[:, np.newaxis, :] + positions[np.newaxis, :, :]).reshape(-1, 3)
+        kinds = kinds * len(shifts)
+
+    velocities = sections.get(_SUBSYS_PATH + ('VELOCITY',))
+    if velocities is not None:
+        velocities = np.array(' '.join(velocities).split(), dtype=np.float64).reshape(-1, 3)
+
+    thermostat = {
+        path[-1].lower(): np.array(' '.join(body).split(), dtype=np.float64)
+        for path, body in sections.items()
+        if path[:-1] == _NOSE_PATH
+    }
+
+    symbols, tags = _split_kind(kinds)
+    return {
+        "symbols": symbols,
+        "tags": tags,
+        "positions": positions,
+        "cell": cell,
+        "pbc": pbc,
+        "multiple_unit_cell": multiple,
+        "velocities": velocities,
+        "thermostat": thermostat,
+    }
 
 
 def parse_cp2k_trajectory(content):
-    """CP2K trajectory parser."""
-
-    import numpy as np
+    """CP2K trajectory parser: read the final structure from the restart file.
 
-    # pylint: disable=protected-access
+    :param content: the content of the restart file as a string, or an iterable of its lines.
+    :return: dictionary with the 'symbols', 'positions', 'cell', 'tags' and 'pbc' of the structure, which can be passed
+        to `ase.Atoms`. See `parse_cp2k_restart` for the velocities and the thermostat.
+    """
 
-    # parse coordinate section
-    match = re.search(r'\n\s*&COORD\n(.*?)\n\s*&END COORD\n', content, re.DOTALL)
-    coord_lines = [line.strip().split() for line in match.group(1).splitlines()]
-
-    # splitting element name and the tag (if present)
-    symbols = []
-    tags = []
-    for atomic_kind in [l[0] for l in coord_lines]:
-        symbols.append(''.join([s for s in atomic_kind if not s.isdigit()]))
-        try:
-            tag = int(''.join([s for s in atomic_kind if s.isdigit()]))
-        except ValueError:
-            tag = 0
-        tags.append(tag)
-
-    # get positions
-    positions_str = [line[1:] for line in coord_lines]
-    positions = np.array(positions_str, np.float64)
-
-    # parse cell section
-    match = re.search(r"\n\s*&CELL\n(.*?)\n\s*&END CELL\n", content, re.DOTALL)
-    cell_lines = [line.strip().split() for line in match.group(1).splitlines()]
-    cell_str = [line[1:] for line in cell_lines if line[0] in "ABC"]
-    cell = np.array(cell_str, np.float64)
-
-    # parse periodic boundary conditions
-    cell_pbc = [True, True, True]  # In case keyword is not set: Default in cp2k is XYZ
-    for line in cell_lines:
-        if line[0] == 'PERIODIC':
-            cell_pbc_str = line[-1]
-            cell_pbc = [(dir in cell_pbc_str) for dir in ['X', 'Y', 'Z']]
-
-    return {"symbols": symbols, "positions": positions, "cell": cell, "tags": tags, "pbc": cell_pbc}
+    restart = parse_cp2k_restart(content)
+    return {key: restart[key] for key in ("symbols", "positions", "cell", "tags", "pbc")}
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K reader of the projected densities of states (PDOS) written by CP2K.
+
+With ``FORCE_EVAL/DFT/PRINT/PDOS``, CP2K writes one file per atomic kind and spin: ``aiida-k1-1.pdos`` or, for
+spin-polarized calculations, ``aiida-ALPHA_k1-1.pdos`` and ``aiida-BETA_k1-1.pdos``. Each file has two header lines
+and one row per molecular orbital: index, eigenvalue [a.u.], occupation and the projection on every orbital channel.
+"""
+
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+_PDOS_FILE_RE = re.compile(r'(?:(ALPHA|BETA)_)?k(\d+)-1\.pdos$')
+_PDOS_HEADER_RE = re.compile(r'atomic kind\s+(\S+).*E\(Fermi\)\s*=\s*([-+.\dEe]+)')
+
+
+def parse_cp2k_pdos_file(content):
+    """Load one PDOS file, converting all the rows with a single NumPy call.
+
+    :param content: the content as a string, or an open file handle in text mode.
+    :return: dictionary with the 'kind' name, the 'fermi_energy' [a.u.], the orbital 'channels' (e.g. 's', 'py', ...),
+        the 'eigenvalues' [a.u.] and 'occupations' of the molecular orbitals and the 'pdos', of shape (norbitals,
+        nchannels).
+    """
+    import numpy as np
+
+    handle = io.StringIO(content) if isinstance(content, str) else content
+    match = _PDOS_HEADER_RE.search(handle.readline())
+    if match is None:
+        raise ValueError("Not a PDOS file: the first line does not give the atomic kind and the Fermi energy.")
+    # "#     MO Eigenvalue [a.u.]      Occupation                 s                 py   ..."
+    channels = handle.readline().split()[5:]
+
+    table = np.loadtxt(handle, comments='#', ndmin=2, dtype=np.float64)
+    if table.shape[1] != 3 + len(channels):
+        raise ValueError(f"The PDOS of kind {match.group(1)} has {table.shape[1] - 3} channels instead of "
+                         f"{len(channels)}.")
+    return {
+        'kind': match.group(1),
+        'fermi_energy': float(match.group(2)),
+        'channels': channels,
+        'eigenvalues': table[:, 1],
+        'occupations': table[:, 2],
+        'pdos': table[:, 3:],
+    }
+
+
+def parse_cp2k_pdos(fnames, open_file=open, max_workers=None):
+    """Load the PDOS files of all the atomic kinds and spins concurrently, and combine them in a single array.
+
+    :param fnames: the names of the files, e.g. ``aiida-ALPHA_k1-1.pdos``: the kind index and the spin are taken from
+        the names, the other files are ignored.
+    :param open_file: callable opening a file in text mode from its name, e.g. ``FolderData.open``.
+    :param max_workers: number of threads reading the files.
+    :return: dictionary of arrays: the 'kinds' names, the orbital 'channels' (all the channels of all the kinds, the
+        projections of the kinds lacking a channel are zero), the 'fermi_energy' of shape (nspins,), the 'eigenvalues'
+        [a.u.] and 'occupations' of shape (nspins, norbitals) and the 'pdos' of shape (nkinds, nspins, norbitals,
+        nchannels). If the spins have a different number of orbitals, the missing ones are NaN. None if there are no
+        PDOS files.
+    """
+    import numpy as np
+
+    files = {}
+    for fname in fnames:
+        match = _PDOS_FILE_RE.search(fname)
+        if match is not None:
+            files[fname] = (int(match.group(2)), 1 if match.group(1) == 'BETA' else 0)
+    if not files:
+        return None
+
+    def load(fname):
+        with open_file(fname) as handle:
+            return parse_cp2k_pdos_file(handle)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        parsed = dict(zip(files, executor.map(load, files)))
+
+    kind_indices = sorted({kind for kind, _ in files.values()})
+    nspins = max(spin for _, spin in files.values()) + 1
+    norbitals = max(len(pdos['eigenvalues']) for pdos in parsed.values())
+    channels = []
+    for pdos in sorted(parsed.values(), key=lambda pdos: -len(pdos['channels'])):
+        channels += [channel for channel in pdos['channels'] if channel not in channels]
+
+    kinds = [None] * len(kind_indices)
+    fermi_energy = np.full(nspins, np.nan)
+    eigenvalues = np.full((nspins, norbitals), np.nan)
+    occupations = np.full((nspins, norbitals), np.nan)
+    result = np.zeros((len(kind_indices), nspins, norbitals, len(channels)))
+    for fname, (kind, spin) in files.items():
+        pdos = parsed[fname]
+        ikind = kind_indices.index(kind)
+        size = len(pdos['eigenvalues'])
+        kinds[ikind] = pdos['kind']
+        fermi_energy[spin] = pdos['fermi_energy']
+        eigenvalues[spin, :size] = pdos['eigenvalues']
+        occupations[spin, :size] = pdos['occupations']
+        result[ikind, spin, :size, [channels.index(channel) for channel in pdos['channels']]] = pdos['pdos'].T
+        result[ikind, spin, size:] = np.nan
+
+    return {
+        'kinds': np.array(kinds),
+        'channels': np.array(channels),
+        'fermi_energy': fermi_energy,
+        'eigenvalues': eigenvalues,
+        'occupations': occupations,
+        'pdos': result,
+    }
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K bulk re-parsing of the outputs of finished calculations.
+
+The calculations are queried in batches and their retrieved outputs are parsed in parallel by a pool of processes,
+which run the plain parsing functions on copies of the retrieved files and never touch the database. The scalar
+results are stored back in bulk, one transaction per batch, as extras of the calculations, together with the version
+of the parser: calculations already re-parsed by the same version are skipped, so that an interrupted re-parse can
+simply be resumed.
+
+From the command line, with the default AiiDA profile:
+
+    python -m aiida_cp2k.utils.reparse --workers 16 --parser advanced
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from aiida.manage.manager import get_manager
+from aiida.orm import CalcJobNode, FolderData, QueryBuilder
+
+from .parse_cache import ParseCache, parser_version
+from .parser import parse_cp2k_output, parse_cp2k_output_advanced
+
+# Extras in which the results of the re-parsing and the version of the parser are stored.
+REPARSE_RESULT_EXTRA = 'reparsed_output_parameters'
+REPARSE_VERSION_EXTRA = 'reparsed_parser_version'
+
+PARSE_FUNCTIONS = {
+    'base': parse_cp2k_output,
+    'advanced': parse_cp2k_output_advanced,
+}
+
+
+def _summarize(value):
+    """Return the scalars of a parse result, for storage as extras: the arrays and the lists of numbers (e.g. the
+    values at every motion step) are left out, as they do not belong in the database. Dictionaries are summarized
+    recursively and the lists of strings, e.g. the warnings, are kept."""
+    if isinstance(value, dict):
+        summary = {key: _summarize(item) for key, item in value.items()}
+        return {key: item for key, item in summary.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return list(value) if all(isinstance(item, str) for item in value) else None
+    if hasattr(value, 'ndim'):  # NumPy arrays and scalars
+        return value.item() if value.ndim == 0 else None
+    return value
+
+
+def _parse_path(function, path):
+    """Parse one output file, in a worker process. Return the result, or the exception raised by the parser."""
+    cache = ParseCache.from_environment()
+    try:
+        with open(path) as handle:
+            if cache is None:
+                return function(handle)
+            return cache.parse(function, handle)
+    except Exception as exc:  # pylint: disable=broad-except
+        return exc
+
+
+def _copy_output(retrieved, fname, tmpdir):
+    """Copy a retrieved file out of the repository to `tmpdir`, where the worker processes can open it. Return its
+    path."""
+    path = os.path.join(tmpdir, f'{retrieved.pk}-{fname}')
+    with retrieved.open(fname, 'rb') as source, open(path, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    return path
+
+
+def query_calculations(version, filters=None):
+    """Return the list of `(pk, output filename)` of the CP2K calculations that have retrieved files and were not
+    re-parsed yet by the parser `version`.
+
+    :param filters: additional QueryBuilder filters on the calculations, e.g. ``{'id': {'in': pks}}``.
+    """
+    query = QueryBuilder()
+    query.append(CalcJobNode,
+                 tag='calculation',
+                 filters=dict(filters or {}, process_type='aiida.calculations:cp2k'),
+                 project=['id', 'attributes.output_filename', f'extras.{REPARSE_VERSION_EXTRA}'])
+    query.append(FolderData, with_incoming='calculation', edge_filters={'label': 'retrieved'})
+    query.order_by({'calculation': {'id': 'asc'}})
+    return [(pk, fname or 'aiida.out') for pk, fname, done in query.all() if done != version]
+
+
+def _get_retrieved(pks):
+    """Return the retrieved folders of the given calculations, by pk."""
+    query = QueryBuilder()
+    query.append(CalcJobNode, tag='calculation', filters={'id': {'in': pks}}, project=['id'])
+    query.append(FolderData, with_incoming='calculation', edge_filters={'label': 'retrieved'}, project=['*'])
+    return dict(query.all())
+
+
+def _submit(executor, function, batch, failures, tmpdir):
+    """Submit the parsing of a batch of calculations, return the list of `(pk, future)`."""
+    retrieved = _get_retrieved([pk for pk, _ in batch])
+    submitted = []
+    for pk, fname in batch:
+        try:
+            path = _copy_output(retrieved[pk], fname, tmpdir)
+        except (OSError, IOError) as exc:
+            failures[pk] = exc
+            continue
+        try:
+            submitted.append((pk, executor.submit(_parse_path, function, path)))
+        except BrokenProcessPool as exc:  # A worker crashed: the calculations left are tried again at the next call
+            failures[pk] = exc
+    return submitted
+
+
+def _collect(submitted, version, failures):
+    """Wait for the results of a batch and store them in a single transaction, return the number of results."""
+    results = {}
+    for pk, future in submitted:
+        try:
+            result = future.result()
+        except BrokenProcessPool as exc:  # The worker crashed, e.g. killed for using too much memory
+            result = exc
+        if isinstance(result, Exception):
+            failures[pk] = result
+        else:
+            results[pk] = _summarize(result)
+
+    if not results:
+        return 0
+    query = QueryBuilder()
+    query.append(CalcJobNode, filters={'id': {'in': list(results)}})
+    with get_manager().get_backend().transaction():
+        for calculation, in query.iterall():
+            calculation.set_extra_many({REPARSE_RESULT_EXTRA: results[calculation.pk], REPARSE_VERSION_EXTRA: version})
+    return len(results)
+
+
+def reparse_calculations(parser='advanced', filters=None, workers=None, batch_size=100, progress=None):
+    """Re-parse the outputs of CP2K calculations in parallel, storing the scalar results as extras.
+
+    The next batch is parsed while the results of the previous one are stored.
+
+    :param parser: 'base', 'advanced' or a parsing function defined at the top level of a module (so that it can be
+        sent to the worker processes), called with the open output file.
+    :param filters: additional QueryBuilder filters on the calculations to re-parse.
+    :param workers: number of worker processes, the number of CPUs by default.
+    :param batch_size: number of calculations that are parsed and stored together.
+    :param progress: callable called after every batch with the number of calculations re-parsed so far, the number
+        of calculations to re-parse and the dictionary of the failures so far (calculation pk -> exception).
+    :return: dictionary of the failures, calculation pk -> exception. Failed calculations are not marked as
+        re-parsed: they are tried again at the next call.
+    """
+    function = PARSE_FUNCTIONS.get(parser, parser)
+    version = parser_version(function)
+    calculations = query_calculations(version, filters)
+    failures = {}
+    done = 0
+
+    context = get_context('spawn')  # The workers must not inherit the connections to the database
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor, \
+            tempfile.TemporaryDirectory() as tmpdir:
+        pending, pending_dir = None, None  # Batch being parsed while the next one is submitted
+        for start in range(0, len(calculations), batch_size):
+            # Files copied out of the repository are kept until the results of their batch are stored.
+            batch_dir = os.path.join(tmpdir, str(start))
+            os.mkdir(batch_dir)
+            submitted = _submit(executor, function, calculations[start:start + batch_size], failures, batch_dir)
+            if pending is not None:
+                done += _collect(pending, version, failures)
+                shutil.rmtree(pending_dir)
+                if progress is not None:
+                    progress(done, len(calculations), failures)
+            pending, pending_dir = submitted, batch_dir
+
+        if pending is not None:
+            done += _collect(pending, version, failures)
+            if progress is not None:
+                progress(done, len(calculations), failures)
+
+    return failures
+
+
+def main(argv=None):
+    """Command line entry point."""
+    import argparse
+    from aiida import load_profile
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parser', choices=sorted(PARSE_FUNCTIONS), default='advanced', help='Parser to use.')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (default: number of CPUs).')
+    parser.add_argument('--batch-size', type=int, default=100, help='Number of calculations per batch.')
+    parser.add_argument('--pk', type=int, nargs='*', help='Only re-parse these calculations.')
+    parser.add_argument('--profile', help='AiiDA profile (default: the default profile).')
+    args = parser.parse_args(argv)
+
+    load_profile(args.profile)
+
+    def progress(done, total, failures):
+        print(f"Re-parsed {done}/{total} calculations, {len(failures)} failures", file=sys.stderr, flush=True)
+
+    failures = reparse_calculations(parser=args.parser,
+                                    filters={'id': {
+                                        'in': args.pk
+                                    }} if args.pk else None,
+                                    workers=args.workers,
+                                    batch_size=args.batch_size,
+                                    progress=progress)
+    for pk, exc in sorted(failures.items()):
+        print(f"Calculation {pk} failed: {exc!r}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
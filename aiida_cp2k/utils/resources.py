@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K report of the resources used by many calculations, to right-size the resources they request.
+
+The resources used (MPI processes, OpenMP threads, peak memory of a process) are the 'resources' of the
+``output_parameters`` of the advanced parser, the resources requested are the ``metadata.options`` of the calculations.
+"""
+
+
+def _requested_cores(resources):
+    """Return the number of cores requested by the `resources` option of a calculation, None if unknown."""
+    machines = resources.get('num_machines', 1)
+    if resources.get('num_cores_per_machine'):
+        return machines * resources['num_cores_per_machine']
+    mpiprocs = resources.get('tot_num_mpiprocs') or machines * resources.get('num_mpiprocs_per_machine', 0)
+    if not mpiprocs:
+        return None
+    return mpiprocs * (resources.get('num_cores_per_mpiproc') or 1)
+
+
+def aggregate_resource_usage(records, memory_threshold=0.5, cores_threshold=1.0):
+    """Compare the resources used by calculations with the resources they requested.
+
+    :param records: iterable of `(pk, used, options)`, with `used` the 'resources' parsed from the output of a
+        calculation and `options` its 'resources' and 'max_memory_kb' options.
+    :param memory_threshold: a calculation using less than this fraction of the memory it requested is over-provisioned.
+        Without 'max_memory_kb', the whole memory of the nodes is taken as requested.
+    :param cores_threshold: a calculation using less than this fraction of the cores it requested (MPI processes times
+        OpenMP threads) is over-provisioned.
+    :return: dictionary of arrays with one element per calculation: 'pk', 'cores_requested', 'cores_used',
+        'cores_usage', 'memory_requested_mib' and 'memory_used_mib' per node, 'memory_usage' and 'over_provisioned'.
+        The values that are not known are NaN.
+    """
+    import numpy as np
+
+    columns = {'pk': [], 'cores_requested': [], 'cores_used': [], 'memory_requested_mib': [], 'memory_used_mib': []}
+    for pk, used, options in records:
+        used = used or {}
+        machines = options.get('resources', {}).get('num_machines', 1)
+        cores = _requested_cores(options.get('resources', {}))
+        memory = options.get('max_memory_kb') or used.get('memory_total_kb')
+
+        columns['pk'].append(pk)
+        columns['cores_requested'].append(np.nan if cores is None else cores)
+        columns['cores_used'].append(used.get('mpi_processes', np.nan) * used.get('omp_threads', 1))
+        columns['memory_requested_mib'].append(np.nan if memory is None else memory / 1024)
+        columns['memory_used_mib'].append(
+            used.get('peak_memory_mib', np.nan) * used.get('mpi_processes', np.nan) / machines)
+
+    report = {key: np.array(values, dtype=np.int64 if key == 'pk' else np.float64) for key, values in columns.items()}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        report['cores_usage'] = report['cores_used'] / report['cores_requested']
+        report['memory_usage'] = report['memory_used_mib'] / report['memory_requested_mib']
+    report['over_provisioned'] = (report['cores_usage'] < cores_threshold) | (report['memory_usage'] < memory_threshold)
+    return report
+
+
+def query_resource_usage(filters=None):
+    """Return the `(pk, used, options)` records of the CP2K calculations parsed by the advanced parser.
+
+    :param filters: additional QueryBuilder filters on the calculations, e.g. ``{'id': {'in': pks}}``.
+    """
+    from aiida.orm import CalcJobNode, Dict, QueryBuilder
+
+    query = QueryBuilder()
+    query.append(CalcJobNode,
+                 tag='calculation',
+                 filters=dict(filters or {}, process_type='aiida.calculations:cp2k'),
+                 project=['id', 'attributes.resources', 'attributes.max_memory_kb'])
+    query.append(Dict,
+                 with_incoming='calculation',
+                 edge_filters={'label': 'output_parameters'},
+                 filters={'attributes': {
+                     'has_key': 'resources'
+                 }},
+                 project=['attributes.resources'])
+    query.order_by({'calculation': {'id': 'asc'}})
+    return [(pk, used, {
+        'resources': resources or {},
+        'max_memory_kb': max_memory_kb
+    }) for pk, resources, max_memory_kb, used in query.iterall()]
+
+
+def resource_usage_report(filters=None, memory_threshold=0.5, cores_threshold=1.0):
+    """Compare the resources used by the CP2K calculations with the resources they requested.
+
+    See `aggregate_resource_usage` for the thresholds and the report, e.g. the over-provisioned calculations are
+    ``report['pk'][report['over_provisioned']]``.
+
+    :param filters: additional QueryBuilder filters on the calculations.
+    """
+    return aggregate_resource_usage(query_resource_usage(filters), memory_threshold, cores_threshold)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""AiiDA-CP2K readers of the trajectory files written by CP2K."""
+
+import math
+import os
+import re
+from itertools import islice
+
+
+def _dcd_record(raw, offset, marker):
+    """Return the payload of the Fortran record starting at `offset` and the offset of the next record.
+
+    :param raw: the whole file as an array of bytes.
+    :param marker: dtype of the record markers, which hold the size of the record before and after it.
+    """
+    size = int(raw[offset:offset + marker.itemsize].view(marker)[0])
+    end = offset + marker.itemsize + size
+    if end + marker.itemsize > len(raw) or int(raw[end:end + marker.itemsize].view(marker)[0]) != size:
+        raise ValueError(f"Corrupted DCD file: record markers at byte {offset} do not match.")
+    return raw[offset + marker.itemsize:end], end + marker.itemsize
+
+
+def _cellpar_to_cell(cellpar):
+    """Convert cell parameters (a, b, c, alpha, beta, gamma) of shape (nframes, 6) to cell vectors (nframes, 3, 3)."""
+    import numpy as np
+
+    lengths = cellpar[:, :3]
+    cos_alpha, cos_beta, cos_gamma = np.cos(np.radians(cellpar[:, 3:])).T
+    sin_gamma = np.sin(np.radians(cellpar[:, 5]))
+    cell = np.zeros((len(cellpar), 3, 3))
+    cell[:, 0, 0] = 1.0
+    cell[:, 1, 0] = cos_gamma
+    cell[:, 1, 1] = sin_gamma
+    cell[:, 2, 0] = cos_beta
+    cell[:, 2, 1] = (cos_alpha - cos_beta * cos_gamma) / sin_gamma
+    cell[:, 2, 2] = np.sqrt(np.clip(1.0 - cell[:, 2, 0]**2 - cell[:, 2, 1]**2, 0.0, None))
+    return cell * lengths[:, :, np.newaxis]
+
+
+class DcdTrajectory:
+    """Memory-mapped reader of the DCD trajectories written by CP2K (FORMAT DCD or DCD_ALIGNED_CELL).
+
+    The file is mapped, not read: only the frames that are requested are copied to memory, so that slices of
+    trajectories much larger than the available memory can be extracted. Byte order and size of the record markers
+    are detected from the header, the markers of every frame are checked and an incomplete last frame is ignored.
+
+    :param fobj: path of the DCD file, or a file object opened in binary mode that is backed by a real file.
+    """
+
+    def __init__(self, fobj):
+        import numpy as np
+
+        raw = np.memmap(fobj, dtype=np.uint8, mode='r')
+
+        for marker in (np.dtype('<i4'), np.dtype('>i4'), np.dtype('<i8'), np.dtype('>i8')):
+            if len(raw) >= marker.itemsize + 4 and int(raw[:marker.itemsize].view(marker)[0]) == 84 and \
+                    bytes(raw[marker.itemsize:marker.itemsize + 4]) == b'CORD':
+                break
+        else:
+            raise ValueError("Not a DCD file: the header does not start with a CORD record.")
+        endian = marker.byteorder
+
+        header, offset = _dcd_record(raw, 0, marker)
+        icntrl = header[4:84].view(f'{endian}i4')
+        charmm = icntrl[19] != 0
+        if icntrl[8] != 0:
+            raise ValueError("DCD files with fixed atoms are not supported.")
+        if charmm and icntrl[11] != 0:
+            raise ValueError("DCD files with a fourth dimension are not supported.")
+        self.has_cell = bool(charmm and icntrl[10] != 0)
+        self.istart = int(icntrl[1])
+        self.nsavc = int(icntrl[2])
+
+        _, offset = _dcd_record(raw, offset, marker)  # Title
+        natoms, offset = _dcd_record(raw, offset, marker)
+        self.natoms = int(natoms.view(f'{endian}i4')[0])
+
+        fields = []
+        if self.has_cell:
+            fields += [('cell_head', marker), ('cell', f'{endian}f8', (6,)), ('cell_tail', marker)]
+        for axis in 'xyz':
+            fields += [(f'{axis}_head', marker), (axis, f'{endian}f4', (self.natoms,)), (f'{axis}_tail', marker)]
+        frame = np.dtype(fields)
+
+        self.nframes = (len(raw) - offset) // frame.itemsize
+        self._frames = np.ndarray((self.nframes,), dtype=frame, buffer=raw, offset=offset)
+
+        for name, size in [('cell', 48), ('x', 4 * self.natoms), ('y', 4 * self.natoms), ('z', 4 * self.natoms)]:
+            if name in frame.names and not ((self._frames[f'{name}_head'] == size).all() and
+                                            (self._frames[f'{name}_tail'] == size).all()):
+                raise ValueError(f"Corrupted DCD file: wrong record markers around the '{name}' blocks.")
+
+    def __len__(self):
+        return self.nframes
+
+    def get_positions(self, start=None, stop=None, step=None, dtype=None):
+        """Return the positions [Angstrom] of the selected frames as an array of shape (nframes, natoms, 3).
+
+        The positions are kept in the single precision of the file, unless another `dtype` is given.
+        """
+        import numpy as np
+
+        frames = self._frames[start:stop:step]
+        positions = np.empty((len(frames), self.natoms, 3), dtype=dtype or np.float32)
+        for i_axis, axis in enumerate('xyz'):
+            positions[:, :, i_axis] = frames[axis]
+        return positions
+
+    def get_cells(self, start=None, stop=None, step=None):
+        """Return the cell vectors [Angstrom] of the selected frames as an array of shape (nframes, 3, 3).
+
+        CP2K writes the cell as (a, gamma, b, beta, alpha, c), with the angles in degrees: the cell is oriented
+        with the first vector along x and the second one in the xy plane. Returns None if there are no cells.
+        """
+        import numpy as np
+
+        if not self.has_cell:
+            return None
+        raw = self._frames['cell'][start:stop:step].astype(np.float64)
+        angles = raw[:, [4, 3, 1]]
+        if (np.abs(angles) <= 1.0).all():  # Cosines of the angles, as written by recent CHARMM versions
+            angles = np.degrees(np.arccos(angles))
+        return _cellpar_to_cell(np.column_stack([raw[:, [0, 2, 5]], angles]))
+
+    def fit_step(self, max_memory, step=1, itemsize=4):
+        """Return the smallest stride, not less than `step`, for which the positions and cells of the selected frames
+        take at most `max_memory` bytes. At least one frame is always selected.
+
+        :param itemsize: size in bytes of a coordinate of the positions, e.g. 8 if they are converted to float64.
+        """
+        frame_bytes = self.natoms * 3 * itemsize + (9 * 8 if self.has_cell else 0)
+        max_frames = max(max_memory // frame_bytes, 1)
+        return max(step, math.ceil(self.nframes / max_frames))
+
+    def get_stepids(self, start=None, stop=None, step=None):
+        """Return the MD step of the selected frames, as recorded in the header of the file."""
+        import numpy as np
+
+        return self.istart + self.nsavc * np.arange(self.nframes)[start:stop:step]
+
+
+# Columns of the tables written during MD runs, after the step and the time [fs], by file extension. The 3x3 tensors
+# are stored as a single array of shape (nsteps, 3, 3).
+MD_TABLE_COLUMNS = {
+    'ener': ('kinetic_energy_au', 'temperature_k', 'potential_energy_au', 'conserved_quantity_au', 'used_time_s'),
+    'cell': ('cell_angs', 'volume_angs3'),
+    'stress': ('stress_bar',),
+}
+_MD_TABLE_WIDTHS = {'ener': 7, 'cell': 12, 'stress': 11}
+
+
+def parse_cp2k_md_table(content, kind):
+    """Load one of the tables written by CP2K during MD runs: energies (.ener), cell (.cell) or stress (.stress).
+
+    The whole table is converted by NumPy at once, the comment lines (headers, repeated after every restart) are
+    skipped and a last line that is incomplete (CP2K was killed while writing it) is ignored.
+
+    :param content: the content of the file as a string, or an open file handle in text mode.
+    :param kind: 'ener', 'cell' or 'stress', the extension of the file.
+    :return: dictionary of arrays: 'step' (integer), 'time_fs' and the columns of `MD_TABLE_COLUMNS`, the cell vectors
+        [Angstrom] and the stress tensor [bar] with shape (nsteps, 3, 3). None if the table is empty.
+    """
+    import io
+    import warnings
+    import numpy as np
+
+    if not isinstance(content, str):
+        content = content.read()
+    content = content[:content.rfind('\n') + 1]
+
+    ncolumns = _MD_TABLE_WIDTHS[kind]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)  # Empty table
+        table = np.loadtxt(io.StringIO(content), comments='#', ndmin=2, dtype=np.float64)
+    if table.size == 0:
+        return None
+    if table.shape[1] != ncolumns:
+        raise ValueError(f"The .{kind} file has {table.shape[1]} columns instead of {ncolumns}.")
+
+    result = {'step': table[:, 0].astype(np.int64), 'time_fs': table[:, 1]}
+    if kind == 'cell':
+        result['cell_angs'] = table[:, 2:11].reshape(-1, 3, 3)
+        result['volume_angs3'] = table[:, 11]
+    elif kind == 'stress':
+        result['stress_bar'] = table[:, 2:11].reshape(-1, 3, 3)
+    else:
+        for i, name in enumerate(MD_TABLE_COLUMNS[kind]):
+            result[name] = table[:, 2 + i]
+    return result
+
+
+# Properties written by CP2K in the comment line of every XYZ frame, e.g. " i =  10, time =  5.000, E =  -34.23".
+_XYZ_COMMENT_RE = re.compile(r'\b(i|time|E)\s*=\s*([-+.\dEe]+)')
+
+
+def _content_size(content):
+    """Return the size of the content, a string or a file handle, None if it is not known."""
+    if isinstance(content, str):
+        return len(content)
+    try:
+        return os.fstat(content.fileno()).st_size - content.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def parse_xyz_trajectory(content, step=1, max_memory=None):
+    """Read an XYZ trajectory written by CP2K (e.g. aiida-pos-1.xyz) frame by frame.
+
+    Only the frames that are kept are converted, each one straight into an array of positions preallocated from the
+    number of atoms in the first header and, if known, the size of the file. An incomplete last frame is ignored.
+
+    :param content: the content as a string, or an open file handle in text mode, which is read lazily.
+    :param step: keep one frame every `step` frames.
+    :param max_memory: maximum size of the positions in bytes. If the file is too large, the stride is increased to
+        fit; if the size is not known in advance, the frames that do not fit are not read.
+    :return: dictionary with the 'symbols', the 'positions' [Angstrom] of shape (nframes, natoms, 3), the 'stepids',
+        'times' [fs] and 'energies' [a.u.] written in the comment lines (NaN if missing) and the 'stride' used. None
+        if there are no frames.
+    """
+    # pylint: disable=too-many-branches,too-many-statements
+    import numpy as np
+
+    size = _content_size(content)
+    lines = iter(content.splitlines(True)) if isinstance(content, str) else iter(content)
+
+    header = next(lines, '')
+    if not header.strip():
+        return None
+    natoms = int(header)
+    frame_bytes = natoms * 3 * 8
+    max_frames = max(max_memory // frame_bytes, 1) if max_memory else None
+
+    symbols = None
+    positions = stepids = times = energies = None
+    nframes = 0  # Number of frames kept
+    iframe = 0  # Number of frames read
+    while header.strip():
+        if int(header) != natoms:
+            raise ValueError(f"The number of atoms changes from {natoms} to {int(header)} at frame {iframe}.")
+        comment = next(lines, None)
+        frame = list(islice(lines, natoms))
+        if comment is None or len(frame) < natoms or not frame[-1].endswith('\n'):
+            break  # Incomplete frame, CP2K was stopped while writing it
+
+        if symbols is None:
+            symbols = [line.split(None, 1)[0] for line in frame]
+            # Estimate the number of frames from the size of the first one, and fit them in the memory bound.
+            if size is not None:
+                total = size // (len(header) + len(comment) + sum(len(line) for line in frame)) + 1
+                if max_frames is not None:
+                    step = max(step, math.ceil(total / max_frames))
+                capacity = math.ceil(total / step) + 1
+            else:
+                capacity = 1024
+            if max_frames is not None:
+                capacity = min(capacity, max_frames)
+            positions = np.empty((capacity, natoms, 3))
+            stepids = np.empty(capacity, dtype=np.int64)
+            times = np.full(capacity, np.nan)
+            energies = np.full(capacity, np.nan)
+
+        if iframe % step == 0:
+            if nframes == len(positions):
+                if max_frames is not None and nframes >= max_frames:
+                    break
+                capacity = 2 * nframes if max_frames is None else min(2 * nframes, max_frames)
+                positions = np.resize(positions, (capacity, natoms, 3))
+                stepids = np.resize(stepids, capacity)
+                times = np.concatenate([times[:nframes], np.full(capacity - nframes, np.nan)])
+                energies = np.concatenate([energies[:nframes], np.full(capacity - nframes, np.nan)])
+
+            positions[nframes] = np.loadtxt(frame, usecols=(1, 2, 3), ndmin=2)
+            properties = dict(_XYZ_COMMENT_RE.findall(comment))
+            stepids[nframes] = int(properties['i']) if 'i' in properties else iframe
+            if 'time' in properties:
+                times[nframes] = float(properties['time'])
+            if 'E' in properties:
+                energies[nframes] = float(properties['E'])
+            nframes += 1
+
+        iframe += 1
+        header = next(lines, '')
+
+    if not nframes:
+        return None
+    return {
+        'symbols': symbols,
+        'positions': positions[:nframes],
+        'stepids': stepids[:nframes],
+        'times': times[:nframes],
+        'energies': energies[:nframes],
+        'stride': step,
+    }
@@ -6,7 +6,7 @@ from aiida.engine import BaseRestartWorkChain, ExitCode, ProcessHandlerReport, p
 from aiida.orm import Dict
 from aiida.plugins import CalculationFactory
 
-from ..utils import add_restart_sections
+from ..utils import add_restart_sections, parse_cp2k_termination, read_output_tail
 
 Cp2kCalculation = CalculationFactory('cp2k')  # pylint: disable=invalid-name
 
@@ -52,39 +52,47 @@ class Cp2kBaseWorkChain(BaseRestartWorkChain):
 
 
 
+    @process_handler(priority=410,
+                     exit_codes=[
+                         Cp2kCalculation.exit_codes.ERROR_OUT_OF_WALLTIME,
+                         Cp2kCalculation.exit_codes.ERROR_GEOMETRY_CONVERGENCE_NOT_REACHED,
+                     ])
+    def restart_incomplete_calculation(self, calc):
+        """Restart a calculation that ran out of walltime or of optimization steps from its restart file."""
+
+        params = self._add_restart_sections(self.ctx.inputs.parameters)
+
+        # The step counters are reset, else the restarted optimization would stop at MAX_ITER straight away.
+        if calc.exit_status == Cp2kCalculation.exit_codes.ERROR_GEOMETRY_CONVERGENCE_NOT_REACHED.status:
+            params = params.get_dict()
+            params['EXT_RESTART']['RESTART_COUNTERS'] = False
+            params = Dict(dict=params)
+
+        self.ctx.inputs.parent_calc_folder = calc.outputs.remote_folder
+        self.ctx.inputs.parameters = params
+        self.report(f"The CP2K calculation stopped before the end of the run ({calc.exit_message}), restarting it "
+                    "from its restart file.")
+        return ProcessHandlerReport(True)
+
     @process_handler(priority=400, enabled=False)
     def resubmit_unconverged_geometry(self, calc):
         """Resubmit a calculation it is not converged, but can be recovered."""
 
         self.report("Checking the geometry convergence.")
 
-        content_string = calc.outputs.retrieved.get_object_content(calc.get_attribute('output_filename'))
+        termination = self._get_termination(calc)
+        if termination is not None and termination["status"] == "finished":
+            self.report("The geometry seem to be converged.")
+            return None
+
+        one_step_done = self._one_step_done(calc)
 
-        time_not_exceeded = "PROGRAM ENDED AT"
-        time_exceeded = "exceeded requested execution time"
-        one_step_done = "Max. gradient              ="
         self.ctx.inputs.parent_calc_folder = calc.outputs.remote_folder
         params = self.ctx.inputs.parameters
 
         # If the problem is recoverable then do restart
-        if (time_not_exceeded not in content_string or time_exceeded in content_string) and one_step_done in content_string:  # pylint: disable=line-too-long
-            try:
-                # Firts check if all the restart keys are present in the input dictionary
-                wf_rest_fname_pointer = params['FORCE_EVAL']['DFT']['RESTART_FILE_NAME']
-                scf_guess_pointer = params['FORCE_EVAL']['DFT']['SCF']['SCF_GUESS']
-                restart_fname_pointer = params['EXT_RESTART']['RESTART_FILE_NAME']
-
-                # Also check if they all have the right value
-                if not (wf_rest_fname_pointer == './parent_calc/aiida-RESTART.wfn' and
-                        scf_guess_pointer == 'RESTART' and
-                        restart_fname_pointer == './parent_calc/aiida-1.restart'):
-
-                    # If some values are incorrect add them to the input dictionary
-                    params = add_restart_sections(params)
-
-            # If not all the restart keys are present, adding them to the input dictionary
-            except (AttributeError, KeyError):
-                params = add_restart_sections(params)
+        if one_step_done:
+            params = self._add_restart_sections(params)
 
             # Might be able to solve the problem
             self.ctx.inputs.parameters = params  # params (new or old ones) that for sure
@@ -95,16 +103,79 @@ class Cp2kBaseWorkChain(BaseRestartWorkChain):
             return ProcessHandlerReport(False)
 
         # If the problem is not recoverable
-        if (time_not_exceeded not in content_string or
-                time_exceeded in content_string) and one_step_done not in content_string:
+        self.report("It seems that the restart of CP2K calculation wouldn't be able to fix the problem as the "
+                    "geometry optimization couldn't complete a single step. Sending a signal to stop the Base "
+                    "work chain.")
+
+        # Signaling to the base work chain that the problem could not be recovered.
+        return ProcessHandlerReport(True, ExitCode(1))
+
+    @staticmethod
+    def _add_restart_sections(params):
+        """Return the input parameters with the sections restarting from the parent calculation, added if needed."""
+
+        try:
+            # Firts check if all the restart keys are present in the input dictionary
+            wf_rest_fname_pointer = params['FORCE_EVAL']['DFT']['RESTART_FILE_NAME']
+            scf_guess_pointer = params['FORCE_EVAL']['DFT']['SCF']['SCF_GUESS']
+            restart_fname_pointer = params['EXT_RESTART']['RESTART_FILE_NAME']
 
-            self.report("It seems that the restart of CP2K calculation wouldn't be able to fix the problem as the "
-                        "geometry optimization couldn't complete a single step. Sending a signal to stop the Base "
-                        "work chain.")
+            # Also check if they all have the right value
+            if not (wf_rest_fname_pointer == './parent_calc/aiida-RESTART.wfn' and
+                    scf_guess_pointer == 'RESTART' and
+                    restart_fname_pointer == './parent_calc/aiida-1.restart'):
 
-            # Signaling to the base work chain that the problem could not be recovered.
-            return ProcessHandlerReport(True, ExitCode(1))
+                # If some values are incorrect add them to the input dictionary
+                params = add_restart_sections(params)
+
+        # If not all the restart keys are present, adding them to the input dictionary
+        except (AttributeError, KeyError):
+            params = add_restart_sections(params)
+
+        return params
+
+    @staticmethod
+    def _get_output_filename(calc):
+        """Return the name of the retrieved output: the output of CP2K or, if it was summarised on the remote computer
+        (see the 'summarize_output' setting), its summary. None if neither was retrieved."""
+
+        try:
+            names = calc.outputs.retrieved.list_object_names()
+        except AttributeError:
+            return None
+        summary = Cp2kCalculation._DEFAULT_SUMMARY_FILE_NAME  # pylint: disable=protected-access
+        return next((fname for fname in (calc.get_attribute('output_filename'), summary) if fname in names), None)
 
-        self.report("The geometry seem to be converged.")
-        # If everything is alright
-        return None
+    @classmethod
+    def _get_termination(cls, calc):
+        """Return how CP2K terminated, as stored by the parser in the output parameters or else read from the end of
+        the retrieved output. None if there is no output."""
+
+        try:
+            return calc.outputs.output_parameters['termination']
+        except (AttributeError, KeyError):
+            pass
+
+        fname = cls._get_output_filename(calc)
+        if fname is None:
+            return None
+        with calc.outputs.retrieved.open(fname, 'rb') as handle:
+            return parse_cp2k_termination(read_output_tail(handle))
+
+    @classmethod
+    def _one_step_done(cls, calc):
+        """Return whether the optimization completed at least one step."""
+
+        # The maximum gradient of every step is in the steps of the summary, if only the summary was retrieved.
+        if 'output_summary_steps' in calc.outputs:
+            steps = calc.outputs.output_summary_steps
+            return 'max_gradient' in steps.get_arraynames() and steps.get_array('max_gradient').size > 0
+
+        fname = cls._get_output_filename(calc)
+        if fname is None:
+            return False
+
+        # The first optimization step is printed early: stop reading as soon as it is found.
+        one_step_marker = "Max. gradient              ="
+        with calc.outputs.retrieved.open(fname) as handle:
+            return any(one_step_marker in line for line in handle)
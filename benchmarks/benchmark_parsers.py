@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Benchmark of the CP2K output parsers on large synthetic files.
+
+Every parser is timed (best of `--repeat` runs) and its peak memory is measured with `tracemalloc`, both from the
+content as a string and streamed from the file. The results are written as JSON, and compared with the results of a
+previous run if given:
+
+    python benchmarks/benchmark_parsers.py --output results.json
+    python benchmarks/benchmark_parsers.py --compare results.json --scale 0.1
+
+The command exits with status 1 if any case is slower, or uses more memory, than `--threshold` times the reference.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+
+import numpy as np
+
+from aiida_cp2k.utils.parser import (_parse_bands, parse_cp2k_output, parse_cp2k_output_advanced, parse_cp2k_trajectory)
+from synthetic_outputs import bands_output, geo_opt_output, md_output, restart_file
+
+# Default size of the synthetic files, multiplied by `--scale`.
+SIZES = {
+    'geo_opt_nsteps': 2000,
+    'md_nsteps': 5000,
+    'bands_nkpoints': 2000,
+    'bands_nbands': 100,
+    'restart_natoms': 100000,
+}
+
+
+def _parse_bands_from(content):
+    """Call `_parse_bands` as the advanced parser did: on the lines following the band structure header."""
+    lines = content.splitlines()
+    n_start = next(i for i, line in enumerate(lines) if 'KPOINTS| Band Structure Calculation' in line)
+    return _parse_bands(lines, n_start, 8.1)
+
+
+def get_cases(scale):
+    """Return the benchmark cases as tuples (name, parser, generator of the file content, accepts file handles)."""
+    sizes = {key: max(1, int(value * scale)) for key, value in SIZES.items()}
+    geo_opt = partial(geo_opt_output, sizes['geo_opt_nsteps'])
+    npt = partial(md_output, sizes['md_nsteps'], 'NPT_F')
+    bands = partial(bands_output, sizes['bands_nkpoints'], sizes['bands_nbands'])
+    restart = partial(restart_file, sizes['restart_natoms'])
+
+    return sizes, [
+        ('parse_cp2k_output/geo_opt', parse_cp2k_output, geo_opt, True),
+        ('parse_cp2k_output/md_npt', parse_cp2k_output, npt, True),
+        ('parse_cp2k_output_advanced/geo_opt', parse_cp2k_output_advanced, geo_opt, True),
+        ('parse_cp2k_output_advanced/md_npt', parse_cp2k_output_advanced, npt, True),
+        ('parse_cp2k_output_advanced/bands', parse_cp2k_output_advanced, bands, True),
+        ('_parse_bands/bands', _parse_bands_from, bands, False),
+        ('parse_cp2k_trajectory/restart', parse_cp2k_trajectory, restart, True),
+    ]
+
+
+def _close(argument):
+    if hasattr(argument, 'close'):
+        argument.close()
+
+
+def measure(function, argument_factory, repeat):
+    """Return the best wall time [s] out of `repeat` calls, and the peak memory [bytes] allocated by one call."""
+    timings = []
+    for _ in range(repeat):
+        argument = argument_factory()
+        gc.collect()
+        start = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - start)
+        _close(argument)
+
+    argument = argument_factory()
+    gc.collect()
+    tracemalloc.start()
+    function(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    _close(argument)
+    return min(timings), peak
+
+
+def run(scale, repeat, workdir):
+    """Run all the benchmarks and return the results as a dictionary."""
+    sizes, cases = get_cases(scale)
+    results = []
+    for name, function, generate, streams in cases:
+        content = generate()
+        fname = os.path.join(workdir, 'content.txt')
+        with open(fname, 'w') as fobj:
+            fobj.write(content)
+
+        sources = [('string', lambda content=content: content)]
+        if streams:
+            sources.append(('file', lambda fname=fname: open(fname)))
+
+        for source, factory in sources:
+            seconds, peak = measure(function, factory, repeat)
+            results.append({
+                'name': f'{name}[{source}]',
+                'file_size_bytes': len(content),
+                'time_s': seconds,
+                'peak_memory_bytes': peak,
+            })
+            print(
+                f"{results[-1]['name']:50s} {len(content) / 2**20:8.1f} MB {seconds:8.3f} s "
+                f"{peak / 2**20:9.2f} MB peak",
+                flush=True)
+
+    return {
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'scale': scale,
+            'repeat': repeat,
+            'sizes': sizes,
+        },
+        'results': results,
+    }
+
+
+def compare(results, reference, threshold):
+    """Return the list of the cases that are slower or use more memory than `threshold` times the reference."""
+    reference = {case['name']: case for case in reference['results']}
+    regressions = []
+    for case in results['results']:
+        if case['name'] not in reference:
+            continue
+        for key in ('time_s', 'peak_memory_bytes'):
+            ratio = case[key] / max(reference[case['name']][key], 1e-12)
+            if ratio > threshold:
+                regressions.append(f"{case['name']}: {key} {ratio:.2f}x the reference")
+    return regressions
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply the default size of the files.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs of each case.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='JSON file with the results of a previous run to compare with.')
+    parser.add_argument('--threshold', type=float, default=1.5, help='Ratio to the reference that is a regression.')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.scale, args.repeat, workdir)
+
+    if args.output:
+        with open(args.output, 'w') as fobj:
+            json.dump(results, fobj, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fobj:
+            regressions = compare(results, json.load(fobj), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
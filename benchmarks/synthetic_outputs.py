@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Generators of synthetic CP2K files of controllable size, shaped like the real ones.
+
+The numbers are random but reproducible (fixed seed): the files are only meant to exercise the parsers.
+"""
+import random
+
+_HEADER = """ DBCSR| Multiplication driver                                               XSMM
+ CP2K| version string:                                          CP2K version {version}
+ CP2K| source code revision number:                                  git:4dc6b9d
+ GLOBAL| Force Environment number                                              1
+ GLOBAL| Run type                                                   {run_type}
+{md_section}
+ CELL| Volume [angstrom^3]:                                              1000.000
+ CELL| Vector a [angstrom]:      10.000     0.000     0.000   |a| =    10.000
+ CELL| Vector b [angstrom]:       0.000    10.000     0.000   |b| =    10.000
+ CELL| Vector c [angstrom]:       0.000     0.000    10.000   |c| =    10.000
+ CELL| Angle (b,c), alpha [degree]:                                     90.000
+ CELL| Angle (a,c), beta  [degree]:                                     90.000
+ CELL| Angle (a,b), gamma [degree]:                                     90.000
+ DFT| Spin unrestricted (spin-polarized) Kohn-Sham calculation            UKS
+ DFT| Multiplicity                                                             3
+                             - Atoms:                                        {natoms}
+  Smear method:                                                  FERMI_DIRAC
+ Number of electrons:                                                        8
+ Number of electrons:                                                        6
+ *** WARNING in fm/cp_fm_struct.F:2 :: Using a non-square number of MPI ranks ***
+"""
+
+_FOOTER = """
+ The number of warnings for this run is : 1
+
+ -------------------------------------------------------------------------------
+ -                                                                             -
+ -                                T I M I N G                                  -
+ -                                                                             -
+ -------------------------------------------------------------------------------
+ SUBROUTINE                       CALLS  ASD         SELF TIME        TOTAL TIME
+                                MAXIMUM       AVERAGE  MAXIMUM  AVERAGE  MAXIMUM
+ CP2K                                 1  1.0    0.012    0.014   12.345   12.346
+ -------------------------------------------------------------------------------
+
+  **** **** ******  **  PROGRAM ENDED AT                 2021-01-15 16:17:25.880
+"""
+
+
+def _header(run_type, natoms, md_section='', version='7.1'):
+    return _HEADER.format(version=version, run_type=run_type, md_section=md_section, natoms=natoms).splitlines()
+
+
+def _scf(rng, niter=8):
+    """Lines of one SCF cycle, followed by the energies and the eigenvalues."""
+    lines = [
+        "  Step     Update method      Time    Convergence         Total energy    Change",
+        "  ------------------------------------------------------------------------------",
+    ]
+    for i in range(1, niter + 1):
+        lines.append(f"  {i:5d} OT DIIS     0.15E+00    0.5     {rng.random() * 1e-3:.8f}      "
+                     f"{-17 - rng.random():.10f} -1.71E-03")
+    if rng.random() < 0.1:
+        lines.append("  *** SCF run NOT converged ***")
+    else:
+        lines.append(f"  *** SCF run converged in {niter:5d} steps ***")
+    lines += [
+        "",
+        f"  Total charge density on r-space grids:        {rng.random() * 1e-6:.10f}",
+        f"  Dispersion energy:                                           {-rng.random():.14f}",
+        "",
+        f"  Total energy:                                              {-17 - rng.random():.14f}",
+        "",
+        "  Integrated absolute spin density  :                               2.0012345678",
+        "  Ideal and single determinant S**2 :                    2.000000      2.012345",
+        "  Eigenvalues of the occupied subspace spin            1",
+        " ---------------------------------------------",
+        "      -0.93219840     -0.49107604     -0.33055434     -0.25902698",
+        "      -0.23219840",
+        " Fermi Energy [eV] :   -7.048618",
+        "  Eigenvalues of the occupied subspace spin            2",
+        " ---------------------------------------------",
+        "      -0.93219840     -0.49107604     -0.33055434",
+        "",
+        "  Lowest Eigenvalues of the unoccupied subspace spin            1",
+        " -----------------------------------------------------",
+        "  Reached convergence in          363  iterations ",
+        "       0.00609616      0.1",
+        "",
+        f" ENERGY| Total FORCE_EVAL ( QS ) energy (a.u.):              {-17 - rng.random():.12f}",
+        "",
+    ]
+    return lines
+
+
+def geo_opt_output(nsteps, cell_opt=False, seed=0):
+    """Output of a GEO_OPT (or CELL_OPT) run with `nsteps` optimization steps."""
+    rng = random.Random(seed)
+    lines = _header('CELL_OPT' if cell_opt else 'GEO_OPT', 3)
+    lines += _scf(rng)
+    for step in range(1, nsteps + 1):
+        if cell_opt:
+            lines += [
+                f" CELL| Volume [angstrom^3]:                                              {1000 + rng.random():.3f}",
+                f" CELL| Vector a [angstrom]:      {10 + rng.random():.3f}     0.000     0.000   |a| =    10.000",
+            ]
+        lines += _scf(rng)
+        if cell_opt:
+            lines += [
+                " STRESS| Analytical stress tensor [GPa]",
+                " STRESS|                        x                   y                   z",
+            ] + [
+                f" STRESS|      {axis}    {rng.gauss(0, 1):18.8E}  {rng.gauss(0, 1):18.8E}  {rng.gauss(0, 1):18.8E}"
+                for axis in 'xyz'
+            ]
+        lines += [
+            f" --------  Informations at step = {step:5d} ------------",
+            "  Optimization Method        =                 BFGS",
+            f"  Total Energy               =       {-17 - rng.random():.10f}",
+        ]
+        if cell_opt:
+            lines.append(f"  Internal Pressure [bar]    =       {rng.random() * 1000:.10f}")
+        lines += [
+            "  Convergence check :",
+            f"  Max. step size             =         {rng.random() * 1e-2:.10f}",
+            f"  RMS step size              =         {rng.random() * 1e-2:.10f}",
+            f"  Max. gradient              =         {rng.random() * 1e-3:.10f}",
+            f"  RMS gradient               =         {rng.random() * 1e-3:.10f}",
+            " ---------------------------------------------------",
+            "",
+        ]
+    lines.append(" ***                    Reevaluating energy at the minimum                   ***")
+    lines += _scf(rng)
+    return "\n".join(lines) + "\n" + _FOOTER
+
+
+def md_output(nsteps, ensemble='NPT_F', seed=0):
+    """Output of a MD run with `nsteps` steps in the given ensemble."""
+    rng = random.Random(seed)
+    lines = _header('MD',
+                    3,
+                    md_section=f" MD| Ensemble Type                                                   {ensemble}")
+    lines += _scf(rng)
+    lines += [
+        f" INITIAL PRESSURE[bar]        =                                  {rng.random() * 1e3:.8E}",
+        f" INITIAL VOLUME[bohr^3]       =                                  {6748.33:.8E}",
+        f" INITIAL CELL LNTHS[bohr]     =   {18.89:.7E}   {18.89:.7E}   {18.89:.7E}",
+        f" INITIAL CELL ANGLS[deg]      =   {90:.7E}   {90:.7E}   {90:.7E}",
+    ]
+    for step in range(1, nsteps + 1):
+        lines += _scf(rng, 4)
+        lines += [
+            " ******************************************************************************",
+            f" ENSEMBLE TYPE                =                                     {ensemble}",
+            f" STEP NUMBER                  =                                     {step:10d}",
+            f" TIME [fs]                    =                                  {step * 0.5:.6f}",
+            f" PRESSURE [bar]               =        {rng.random() * 1e3:.8E}   {rng.random() * 1e3:.8E}",
+        ]
+        if ensemble.startswith('NPT'):
+            lines += [
+                f" VOLUME[bohr^3]               =        {6748 + rng.random():.8E}   {6748.0:.8E}",
+                f" CELL LNTHS[bohr]             =   {18.8 + rng.random():.7E}   {18.89:.7E}   {18.89:.7E}",
+                f" AVE. CELL LNTHS[bohr]        =   {18.89:.7E}   {18.89:.7E}   {18.89:.7E}",
+                f" CELL ANGLS[deg]              =   {90:.7E}   {90 + rng.random():.7E}   {90:.7E}",
+            ]
+        lines.append(" ******************************************************************************")
+    return "\n".join(lines) + "\n" + _FOOTER
+
+
+def bands_output(nkpoints, nbands, version='8.1', nspins=1, seed=0):
+    """Output of a band structure calculation along a path of `nkpoints` k-points, with `nbands` bands.
+
+    The format of the eigenvalue blocks changed with CP2K 8.1, pass the `version` to choose it.
+    """
+    rng = random.Random(seed)
+    lines = _header('ENERGY', 2, version=version)
+    lines += _scf(rng)
+    lines += [
+        " KPOINTS| Band Structure Calculation",
+        " KPOINTS| Number of k-point sets                                               1",
+        f" KPOINTS| Number of k-points in set    1                              {nkpoints:10d}",
+        " KPOINTS| In units of b-vector [2pi/Bohr]",
+        " KPOINTS| Special point     1       GAMMA     0.000000     0.000000     0.000000",
+        " KPOINTS| Special point     2           X     0.500000     0.000000     0.500000",
+    ]
+    if float(version) < 8.1:
+        lines[-2:] = [
+            " KPOINTS| Special K-Point    1          GAMMA    0.0000    0.0000    0.0000",
+            " KPOINTS| Special K-Point    2              X    0.5000    0.0000    0.5000",
+        ]
+    for i_kpoint in range(nkpoints):
+        kpoint = 0.5 * i_kpoint / max(nkpoints - 1, 1)
+        for spin in range(1, nspins + 1):
+            energies = sorted(rng.uniform(-10, 10) for _ in range(nbands))
+            if float(version) < 8.1:
+                lines.append(f"       Nr. {i_kpoint + 1:4d}    Spin {spin}        K-Point  {kpoint:.8f}  0.00000000  "
+                             f"{kpoint:.8f}")
+                lines.append(f"             {nbands:4d}")
+                for i_row in range(0, nbands, 4):
+                    lines.append("      " + "".join(f"{energy:16.8f}" for energy in energies[i_row:i_row + 4]))
+            else:
+                lines.append(f"#  Point {i_kpoint + 1:<5d}  Spin {spin}:     {kpoint:.8f}     0.00000000     "
+                             f"{kpoint:.8f}       {1 / nkpoints:.8f}")
+                lines.append("#   Band    Energy [eV]     Occupation")
+                lines += [
+                    f"  {i_band + 1:6d} {energy:14.8f} {2.0 if energy < 0 else 0.0:14.8f}"
+                    for i_band, energy in enumerate(energies)
+                ]
+    lines.append("")
+    return "\n".join(lines) + "\n" + _FOOTER
+
+
+def restart_file(natoms, seed=0):
+    """Restart file of a MD run of `natoms` atoms, with velocities and a Nose-Hoover thermostat."""
+    rng = random.Random(seed)
+    length = round((natoms * 10.0)**(1 / 3), 4)
+    lines = [
+        " &GLOBAL",
+        "   PROJECT_NAME aiida",
+        "   RUN_TYPE  MD",
+        " &END GLOBAL",
+        " &MOTION",
+        "   &MD",
+        "     ENSEMBLE  NVT",
+        "     &THERMOSTAT",
+        "       &NOSE",
+        "         LENGTH  3",
+        "         &COORD",
+    ]
+    lines += [f"             {rng.gauss(0, 1):.16E}  {rng.gauss(0, 1):.16E}  {rng.gauss(0, 1):.16E}"]
+    lines += [
+        "         &END COORD",
+        "       &END NOSE",
+        "     &END THERMOSTAT",
+        "   &END MD",
+        " &END MOTION",
+        " &FORCE_EVAL",
+        "   METHOD  QS",
+        "   &SUBSYS",
+        "     &CELL",
+        f"       A     {length:.16E}    0.0000000000000000E+00    0.0000000000000000E+00",
+        f"       B     0.0000000000000000E+00    {length:.16E}    0.0000000000000000E+00",
+        f"       C     0.0000000000000000E+00    0.0000000000000000E+00    {length:.16E}",
+        "       PERIODIC  XYZ",
+        "       MULTIPLE_UNIT_CELL  1 1 1",
+        "     &END CELL",
+        "     &COORD",
+    ]
+    kinds = ('O', 'H1', 'H2')
+    lines += [
+        f"{kinds[i % 3]:<3s}  {rng.uniform(0, length):.16E}  {rng.uniform(0, length):.16E}  "
+        f"{rng.uniform(0, length):.16E}" for i in range(natoms)
+    ]
+    lines += ["     &END COORD", "     &VELOCITY"]
+    lines += [
+        f"        {rng.gauss(0, 1e-4):.16E}  {rng.gauss(0, 1e-4):.16E}  {rng.gauss(0, 1e-4):.16E}"
+        for _ in range(natoms)
+    ]
+    lines += [
+        "     &END VELOCITY",
+        "     &TOPOLOGY",
+        "       MULTIPLE_UNIT_CELL  1 1 1",
+        "     &END TOPOLOGY",
+        "   &END SUBSYS",
+        " &END FORCE_EVAL",
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=invalid-name
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Run DFT geometry optimization, retrieving the parsed files temporarily."""
+
+import os
+import sys
+
+import ase.io
+import click
+
+from aiida.common import NotExistent
+from aiida.engine import run_get_node
+from aiida.orm import (Code, Dict, SinglefileData)
+from aiida.plugins import DataFactory
+
+StructureData = DataFactory('structure')  # pylint: disable=invalid-name
+
+
+def example_retrieve_temporary(cp2k_code):
+    """Run DFT geometry optimization, retrieving the parsed files temporarily."""
+
+    print("Testing CP2K GEO_OPT on H2O (DFT) with the compact retrieval profile...")
+
+    thisdir = os.path.dirname(os.path.realpath(__file__))
+
+    # Structure.
+    structure = StructureData(ase=ase.io.read(os.path.join(thisdir, '..', "files", 'h2.xyz')))
+
+    # Basis set.
+    basis_file = SinglefileData(file=os.path.join(thisdir, "..", "files", "BASIS_MOLOPT"))
+
+    # Pseudopotentials.
+    pseudo_file = SinglefileData(file=os.path.join(thisdir, "..", "files", "GTH_POTENTIALS"))
+
+    # Parameters.
+    parameters = Dict(
+        dict={
+            'GLOBAL': {
+                'RUN_TYPE': 'GEO_OPT',
+            },
+            'FORCE_EVAL': {
+                'METHOD': 'Quickstep',
+                'DFT': {
+                    'BASIS_SET_FILE_NAME': 'BASIS_MOLOPT',
+                    'POTENTIAL_FILE_NAME': 'GTH_POTENTIALS',
+                    'QS': {
+                        'EPS_DEFAULT': 1.0e-12,
+                        'WF_INTERPOLATION': 'ps',
+                        'EXTRAPOLATION_ORDER': 3,
+                    },
+                    'MGRID': {
+                        'NGRIDS': 4,
+                        'CUTOFF': 280,
+                        'REL_CUTOFF': 30,
+                    },
+                    'XC': {
+                        'XC_FUNCTIONAL': {
+                            '_': 'PBE',
+                        },
+                    },
+                    'POISSON': {
+                        'PERIODIC': 'none',
+                        'PSOLVER': 'MT',
+                    },
+                },
+                'SUBSYS': {
+                    'KIND': [
+                        {
+                            '_': 'O',
+                            'BASIS_SET': 'DZVP-MOLOPT-SR-GTH',
+                            'POTENTIAL': 'GTH-PBE-q6'
+                        },
+                        {
+                            '_': 'H',
+                            'BASIS_SET': 'DZVP-MOLOPT-SR-GTH',
+                            'POTENTIAL': 'GTH-PBE-q1'
+                        },
+                    ],
+                },
+            }
+        })
+
+    # Construct process builder.
+    builder = cp2k_code.get_builder()
+    builder.structure = structure
+    builder.parameters = parameters
+    builder.code = cp2k_code
+    builder.file = {
+        'basis': basis_file,
+        'pseudo': pseudo_file,
+    }
+    builder.metadata.options.resources = {
+        "num_machines": 1,
+        "num_mpiprocs_per_machine": 1,
+    }
+    builder.metadata.options.max_wallclock_seconds = 1 * 3 * 60
+
+    # The restart file is parsed and discarded, the XYZ trajectory is too large and stays on the remote computer.
+    builder.settings = Dict(
+        dict={
+            'retrieve_profile': 'compact',
+            'additional_retrieve_temporary_list': ['aiida-pos-1.xyz'],
+            'retrieve_max_size': {
+                'aiida-pos-1.xyz': 0
+            },
+        })
+
+    print("Submitted calculation...")
+    calc, calc_node = run_get_node(builder)
+
+    # Check that the restart file was parsed but not stored.
+    if 'aiida-1.restart' in calc['retrieved'].list_object_names():
+        print("ERROR: the restart file was stored in the repository.")
+        sys.exit(3)
+    expected_dist = 0.732594809575
+    dist = calc['output_structure'].get_ase().get_distance(0, 1)
+    if abs(dist - expected_dist) < 1e-7:
+        print("OK, H-H distance has the expected value.")
+    else:
+        print("ERROR!")
+        print(f"Expected dist value: {expected_dist}")
+        print(f"Actual dist value: {dist}")
+        sys.exit(3)
+
+    # Check that the trajectory was kept on the remote computer.
+    if 'output_trajectory' in calc or calc_node.outputs.remote_folder.listdir('oversized') != ['aiida-pos-1.xyz']:
+        print("ERROR: the trajectory was retrieved.")
+        sys.exit(3)
+    print("OK, the trajectory was kept on the remote computer.")
+
+
+@click.command('cli')
+@click.argument('codelabel')
+def cli(codelabel):
+    """Click interface."""
+    try:
+        code = Code.get_from_string(codelabel)
+    except NotExistent:
+        print(f"The code '{codelabel}' does not exist.")
+        sys.exit(1)
+    example_retrieve_temporary(code)
+
+
+if __name__ == '__main__':
+    cli()  # pylint: disable=no-value-for-parameter
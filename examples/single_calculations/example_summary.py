@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=invalid-name
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Run DFT calculation, summarising the output on the remote computer."""
+
+import os
+import sys
+import click
+
+import ase.io
+
+from aiida.common import NotExistent
+from aiida.engine import run_get_node
+from aiida.orm import (Code, Dict, SinglefileData)
+from aiida.plugins import DataFactory
+
+StructureData = DataFactory('structure')  # pylint: disable=invalid-name
+
+
+def example_summary(cp2k_code):
+    """Run DFT calculation, summarising the output on the remote computer."""
+
+    print("Testing CP2K ENERGY on H2O (DFT) with the output summarised on the remote...")
+
+    thisdir = os.path.dirname(os.path.realpath(__file__))
+
+    # Structure.
+    structure = StructureData(ase=ase.io.read(os.path.join(thisdir, '..', "files", 'h2o.xyz')))
+
+    # Basis set.
+    basis_file = SinglefileData(file=os.path.join(thisdir, "..", "files", "BASIS_MOLOPT"))
+
+    # Pseudopotentials.
+    pseudo_file = SinglefileData(file=os.path.join(thisdir, "..", "files", "GTH_POTENTIALS"))
+
+    # Parameters.
+    parameters = Dict(
+        dict={
+            'FORCE_EVAL': {
+                'METHOD': 'Quickstep',
+                'DFT': {
+                    'BASIS_SET_FILE_NAME': 'BASIS_MOLOPT',
+                    'POTENTIAL_FILE_NAME': 'GTH_POTENTIALS',
+                    'QS': {
+                        'EPS_DEFAULT': 1.0e-12,
+                        'WF_INTERPOLATION': 'ps',
+                        'EXTRAPOLATION_ORDER': 3,
+                    },
+                    'MGRID': {
+                        'NGRIDS': 4,
+                        'CUTOFF': 280,
+                        'REL_CUTOFF': 30,
+                    },
+                    'XC': {
+                        'XC_FUNCTIONAL': {
+                            '_': 'LDA',
+                        },
+                    },
+                    'POISSON': {
+                        'PERIODIC': 'none',
+                        'PSOLVER': 'MT',
+                    },
+                },
+                'SUBSYS': {
+                    'KIND': [
+                        {
+                            '_': 'O',
+                            'BASIS_SET': 'DZVP-MOLOPT-SR-GTH',
+                            'POTENTIAL': 'GTH-LDA-q6'
+                        },
+                        {
+                            '_': 'H',
+                            'BASIS_SET': 'DZVP-MOLOPT-SR-GTH',
+                            'POTENTIAL': 'GTH-LDA-q1'
+                        },
+                    ],
+                },
+            }
+        })
+
+    # Construct process builder.
+    builder = cp2k_code.get_builder()
+    builder.structure = structure
+    builder.parameters = parameters
+    builder.code = cp2k_code
+    builder.file = {
+        'basis': basis_file,
+        'pseudo': pseudo_file,
+    }
+    builder.metadata.options.resources = {
+        "num_machines": 1,
+        "num_mpiprocs_per_machine": 1,
+    }
+    builder.metadata.options.max_wallclock_seconds = 1 * 3 * 60
+
+    # Only keep the last 64 kB of the output, the energies are taken from the steps.
+    builder.settings = Dict(dict={'summarize_output': {'tail_size': 64 * 1024}})
+
+    print("Submitted calculation...")
+    outputs, calc_node = run_get_node(builder)
+
+    if 'aiida.out' in calc_node.outputs.retrieved.list_object_names():
+        print("ERROR: the output was retrieved instead of its summary.")
+        sys.exit(3)
+
+    energy = outputs['output_parameters']['energy']
+    if energy != outputs['output_summary_steps'].get_array('energy')[-1]:
+        print("ERROR: the energy is not the last one of the steps.")
+        sys.exit(3)
+    print(f"OK, energy {energy} a.u. from the summary of "
+          f"{outputs['output_parameters']['summarized_output']['output_lines']} lines of output.")
+
+
+@click.command('cli')
+@click.argument('codelabel')
+def cli(codelabel):
+    """Click interface."""
+    try:
+        code = Code.get_from_string(codelabel)
+    except NotExistent:
+        print(f"The code '{codelabel}' does not exist.")
+        sys.exit(1)
+    example_summary(code)
+
+
+if __name__ == '__main__':
+    cli()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test the preparation of the CP2K calculations."""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from aiida.common.exceptions import InputValidationError
+from aiida.common.folders import Folder
+from aiida.engine.utils import instantiate_process
+from aiida.manage.manager import get_manager
+from aiida.orm import Code, Dict
+
+from aiida_cp2k.calculations import Cp2kCalculation
+
+
+@pytest.fixture
+def prepare_calculation(aiida_localhost, tmpdir):
+    """Return a function that prepares a CP2K calculation with the given settings and returns its CalcInfo."""
+
+    code = Code(input_plugin_name='cp2k', remote_computer_exec=[aiida_localhost, '/bin/true']).store()
+    runner = get_manager().get_runner()
+
+    def prepare(settings=None):
+        inputs = {
+            'code': code,
+            'parameters': Dict(dict={'GLOBAL': {
+                'RUN_TYPE': 'MD'
+            }}),
+            'metadata': {
+                'options': {
+                    'resources': {
+                        'num_machines': 1,
+                        'num_mpiprocs_per_machine': 1
+                    }
+                }
+            },
+        }
+        if settings is not None:
+            inputs['settings'] = Dict(dict=settings)
+        process = instantiate_process(runner, Cp2kCalculation, **inputs)
+        return process.prepare_for_submission(Folder(str(tmpdir)))
+
+    return prepare
+
+
+def test_prepare(prepare_calculation, tmpdir):  # pylint: disable=redefined-outer-name
+    """Test the files written and retrieved by default"""
+
+    calcinfo = prepare_calculation()
+    assert tmpdir.join('aiida.inp').check()
+    assert calcinfo.retrieve_list == ['aiida.out', 'aiida-1.restart', 'aiida-pos-1.dcd']
+    assert calcinfo.retrieve_temporary_list == []
+
+    # The cube files, the MD tables, the PDOS files and the XYZ trajectory are optional, and only retrieved
+    # temporarily: their content is stored as arrays
+    calcinfo = prepare_calculation({
+        'retrieve_cubes': True,
+        'retrieve_md_tables': True,
+        'retrieve_pdos': True,
+        'retrieve_xyz': True
+    })
+    assert calcinfo.retrieve_list == ['aiida.out', 'aiida-1.restart', 'aiida-pos-1.dcd']
+    assert calcinfo.retrieve_temporary_list == [
+        'aiida-*.cube', 'aiida-1.ener', 'aiida-1.cell', 'aiida-1.stress', 'aiida-*k*-1.pdos', 'aiida-pos-1.xyz'
+    ]
+
+
+def test_compact_profile(prepare_calculation):  # pylint: disable=redefined-outer-name
+    """Test that the 'compact' profile only retrieves temporarily the files that are parsed into outputs"""
+
+    calcinfo = prepare_calculation({
+        'retrieve_profile': 'compact',
+        'additional_retrieve_list': ['aiida-1.xyz'],
+        'additional_retrieve_temporary_list': ['aiida-forces-1.xyz'],
+    })
+    assert calcinfo.retrieve_list == ['aiida.out', 'aiida-1.xyz']
+    assert calcinfo.retrieve_temporary_list == ['aiida-1.restart', 'aiida-pos-1.dcd', 'aiida-forces-1.xyz']
+
+    with pytest.raises(InputValidationError):
+        prepare_calculation({'retrieve_profile': 'smallest'})
+
+
+def test_retrieve_max_size(prepare_calculation, tmpdir):  # pylint: disable=redefined-outer-name
+    """Test that the files larger than their limit are moved to the oversized folder by the job script"""
+
+    for pattern in ('aiida.*', '*.out', 'aiida-summary*'):
+        with pytest.raises(InputValidationError):
+            prepare_calculation({'retrieve_max_size': {pattern: 100}})
+
+    calcinfo = prepare_calculation({'retrieve_max_size': {'aiida-*.cube': 100, 'sub/*.dat': 10}})
+    files = {'aiida.out': 1000, 'aiida-big.cube': 101, 'aiida-small.cube': 100, 'sub/big.dat': 11, 'big.dat': 11}
+    for fname, size in files.items():
+        tmpdir.join(fname).write('x' * size, ensure=True)
+    for _ in range(2):  # The files already moved are not found again
+        subprocess.run(['sh', '-c', calcinfo.append_text], cwd=str(tmpdir), check=True)
+
+    assert sorted(os.listdir(str(tmpdir.join('oversized')))) == ['aiida-big.cube', 'big.dat']
+    assert tmpdir.join('sub', 'big.dat').check() is False
+    assert all(tmpdir.join(fname).check() for fname in ('aiida.out', 'aiida-small.cube', 'big.dat'))
+
+
+def test_summary_on_sigterm(prepare_calculation, tmpdir):  # pylint: disable=redefined-outer-name
+    """Test that the summary is written and the output moved aside when the job is stopped by a SIGTERM"""
+
+    calcinfo = prepare_calculation({'summarize_output': {'python': sys.executable}})
+    assert calcinfo.retrieve_list[:3] == ['aiida.out', 'aiida-summary.out', 'aiida-summary-steps.npz']
+
+    tmpdir.join('aiida.out').write(' ENERGY| Total FORCE_EVAL ( QS ) energy [a.u.]:              -34.233017\n')
+    job = subprocess.Popen(['sh', '-c', calcinfo.prepend_text + '\nsleep 60'], cwd=str(tmpdir), start_new_session=True)
+    time.sleep(1)
+    os.killpg(job.pid, signal.SIGTERM)  # As the scheduler does at the end of the walltime
+    assert job.wait(timeout=30) != 0
+
+    assert tmpdir.join('aiida-summary.out').check()
+    assert tmpdir.join('aiida-summary-steps.npz').check()
+    assert not tmpdir.join('aiida.out').check()
+    assert tmpdir.join('oversized', 'aiida.out').check()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test the conversion of the cube files."""
+import io
+
+import numpy as np
+import pytest
+
+from aiida.orm import ArrayData
+
+from aiida_cp2k.utils import cube
+from aiida_cp2k.utils.cube import cube_to_npy, memory_map_array
+
+
+def write_cube(grid):
+    """Write a cube file as CP2K does: six values per line, every line of the last axis starting a new line."""
+    lines = [
+        "-Quickstep-", " ELECTRON DENSITY", "    2    0.000000    0.000000    0.000000",
+        f"{grid.shape[0]:5d}    0.500000    0.000000    0.000000",
+        f"{grid.shape[1]:5d}    0.000000    0.400000    0.000000",
+        f"{grid.shape[2]:5d}    0.000000    0.000000    0.300000",
+        "    8    0.000000    1.000000    1.000000    1.000000", "    1    0.000000    2.000000    1.000000    1.000000"
+    ]
+    for row in grid.reshape(-1, grid.shape[2]):
+        lines += ["".join(f"{value:13.5E}" for value in row[start:start + 6]) for start in range(0, len(row), 6)]
+    return "\n".join(lines) + "\n"
+
+
+def test_cube_to_npy(tmpdir, monkeypatch):
+    """Test converting a cube file in chunks"""
+
+    monkeypatch.setattr(cube, "_CHUNK_LINES", 7)
+    grid = np.random.default_rng(0).random((4, 5, 7))
+    fname = str(tmpdir.join("grid.npy"))
+
+    header = cube_to_npy(write_cube(grid), fname)
+    assert header["shape"] == (4, 5, 7)
+    assert header["numbers"].tolist() == [8, 1]
+    assert header["positions"][1].tolist() == [2.0, 1.0, 1.0]
+    assert (header["voxel"] == np.diag([0.5, 0.4, 0.3])).all()
+    np.testing.assert_allclose(np.load(fname, mmap_mode="r"), grid, rtol=1e-5)
+
+    with pytest.raises(ValueError):
+        cube_to_npy(write_cube(grid).rsplit("\n", 2)[0] + "\n", fname)
+    with pytest.raises(ValueError):
+        cube_to_npy("-Quickstep-\n ELECTRON DENSITY\n    2    0.0\n", fname)
+
+
+def test_memory_map_array(monkeypatch, clear_database):  # pylint: disable=unused-argument
+    """Test memory-mapping an array from the repository"""
+
+    grid = np.random.default_rng(0).random((4, 5, 7))
+    node = ArrayData()
+    node.set_array("grid", grid)
+    assert not isinstance(memory_map_array(node, "grid"), np.memmap)  # Not stored: loaded whole
+
+    node.store()
+    mapped = memory_map_array(node, "grid")
+    assert isinstance(mapped, np.memmap)
+    assert (mapped[:, :, 2] == grid[:, :, 2]).all()
+    with pytest.raises(KeyError):
+        memory_map_array(node, "density")
+
+    # A repository that does not keep the arrays as files on disk
+    content = io.BytesIO()
+    np.save(content, grid)
+    monkeypatch.setattr(node, "open", lambda *args, **kwargs: io.BytesIO(content.getvalue()))
+    with pytest.warns(UserWarning, match="cannot be memory-mapped"):
+        assert (memory_map_array(node, "grid") == grid).all()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test the summariser of the output run on the remote computer."""
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from aiida_cp2k.utils import output_summary
+from aiida_cp2k.utils.parser import parse_cp2k_output, parse_cp2k_termination, parse_cp2k_timing
+
+THISDIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_output_summary(tmpdir):
+    """Test running the summariser as a standalone script, in isolated mode"""
+
+    output = f"{THISDIR}/outputs/BSSE_output_v5.1_.out"
+    script = output_summary.__file__
+    subprocess.run([
+        sys.executable, "-I", script, output, "--summary", "summary.out", "--head-size", "20000", "--tail-size",
+        "100000"
+    ],
+                   cwd=str(tmpdir),
+                   check=True)
+
+    with open(output) as fobj:
+        lines = fobj.readlines()
+    with open(str(tmpdir.join("summary.out"))) as fobj:
+        summary = fobj.readlines()
+
+    # The beginning and the end of the output, separated by the number of lines removed
+    removed = len(lines) - len(summary) + 1
+    marker = summary.index(f" *** {removed} lines of the output were removed from this summary ***\n")
+    assert summary[:marker] == lines[:marker]
+    assert summary[marker + 1:] == lines[marker + removed:]
+    assert os.path.getsize(tmpdir.join("summary.out")) <= 120000 + 100
+
+    # The end of the output is kept
+    content, summary = "".join(lines), "".join(summary)
+    assert parse_cp2k_termination(summary) == parse_cp2k_termination(content)
+    for key, array in parse_cp2k_timing(summary).items():
+        assert (array == parse_cp2k_timing(content)[key]).all()
+
+    with np.load(str(tmpdir.join("summary.out.npz"))) as npz:
+        assert npz["scf_steps"].tolist() == [40, 13, 28, 12, 29]
+        assert npz["scf_converged"].all()
+        assert npz["energy"].size == 0
+        assert npz["max_gradient"].size == 0
+        assert int(npz["output_lines"]) == len(lines)
+        assert int(npz["output_bytes"]) == os.path.getsize(output)
+        assert int(npz["removed_lines"]) == removed
+
+
+def test_output_summary_small(tmpdir):
+    """Test that outputs smaller than the summary are kept whole"""
+
+    output = f"{THISDIR}/outputs/BANDS_output_v8.1.out"
+    output_summary.summarize_cp2k_output(output, str(tmpdir.join("summary.out")), str(tmpdir.join("steps.npz")))
+
+    with open(output) as fobj, open(str(tmpdir.join("summary.out"))) as summary:
+        content = fobj.read()
+        assert summary.read() == content
+
+    with np.load(str(tmpdir.join("steps.npz"))) as npz:
+        assert npz["energy"].tolist() == [parse_cp2k_output(content)["energy"]]
+        assert npz["scf_steps"].tolist() == [8]
+        assert int(npz["removed_lines"]) == 0
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test the streaming front-end of cp2k-output-tools."""
+import os
+
+from cp2k_output_tools import parse_iter
+
+from aiida_cp2k.utils.output_tools import parse_cp2k_output_tools, split_arrays
+
+THISDIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_output_tools_streaming():
+    """Test that the streamed blocks are the merged ones, with the repeated blocks accumulated into columns"""
+
+    fname = f"{THISDIR}/outputs/BANDS_output_v8.1.out"
+    with open(fname) as fobj:
+        content = fobj.read()
+    merged = {}
+    for match in parse_iter(content, key_mangling=True):
+        merged.update(match)
+    with open(fname) as fobj:
+        assert parse_cp2k_output_tools(fobj) == merged
+
+    # A second SCF run, e.g. the next step of a geometry optimization
+    start = content.index(" SCF WAVEFUNCTION OPTIMIZATION")
+    end = content.index(" SUM OF ATOMIC FORCES")
+    end = content.index("\n", end) + 1
+    step = content[start:end].replace("-7.944253454478329", "-7.950000000000000")
+    result = parse_cp2k_output_tools(content[:end] + step + content[end:])
+    assert result["program_info"] == merged["program_info"]
+    assert result["nwarnings"] == merged["nwarnings"]
+    assert result["energies"]["total_force_eval"].tolist() == [-7.944253454478329, -7.95]
+    assert result["forces"]["atomic"]["unit"] == "a.u."
+    assert result["forces"]["atomic"]["per_atom"]["x"].shape == (2, 2)
+
+    arrays, rest = split_arrays(result)
+    assert arrays["energies__total_force_eval"].shape == (2,)
+    assert rest["forces"]["atomic"]["unit"] == "a.u."
+    assert "energies" not in rest
+
+    assert sorted(parse_cp2k_output_tools(content, blocks=["energies", "nwarnings"])) == ["energies", "nwarnings"]
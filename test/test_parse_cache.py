@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test the cache of the parse results."""
+import os
+
+import numpy as np
+import pytest
+
+from aiida_cp2k.utils.parse_cache import ParseCache, _module_sources, file_digest, parser_version
+from aiida_cp2k.utils.parser import parse_cp2k_output_advanced
+
+THISDIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_parse_cache(tmpdir):
+    """Test that results are returned from the cache for the same file and parser only"""
+    calls = []
+
+    def count_lines(content):
+        calls.append(content)
+        return {"nlines": len(content.splitlines())}
+
+    cache = ParseCache(str(tmpdir))
+    assert cache.parse(count_lines, "a\nb\n") == {"nlines": 2}
+    assert cache.parse(count_lines, "a\nb\n") == {"nlines": 2}
+    assert len(calls) == 1
+
+    # Results are copies: modifying one does not change the cache
+    cache.parse(count_lines, "a\nb\n")["nlines"] = 0
+    assert cache.parse(count_lines, "a\nb\n") == {"nlines": 2}
+
+    assert cache.parse(count_lines, "a\nb\nc\n") == {"nlines": 3}
+    assert len(calls) == 2
+    assert cache.key(count_lines, "digest") != cache.key(parse_cp2k_output_advanced, "digest")
+
+
+def test_parse_cache_files(tmpdir):
+    """Test caching the result of a parser that reads a file handle"""
+
+    cache = ParseCache(str(tmpdir))
+    with open(f"{THISDIR}/outputs/BSSE_output_v5.1_.out", "rb") as fobj:
+        digest = file_digest(fobj)
+        assert fobj.tell() == 0
+    with open(f"{THISDIR}/outputs/BSSE_output_v5.1_.out") as fobj:
+        assert file_digest(fobj) == digest
+        parsed = cache.parse(parse_cp2k_output_advanced, fobj, digest=digest)
+    np.testing.assert_equal(cache.get(cache.key(parse_cp2k_output_advanced, digest)), parsed)
+    assert parsed["energy_scf"] == -829.920698393915
+
+
+def test_parse_cache_eviction(tmpdir):
+    """Test that the least recently used results are evicted first"""
+
+    cache = ParseCache(str(tmpdir), max_size=3500)
+    keys = [cache.key(len, str(i)) for i in range(4)]
+    for i, key in enumerate(keys[:3]):
+        cache.put(key, "x" * 1000)
+        os.utime(cache._path(key), (i, i))  # pylint: disable=protected-access
+    cache.get(keys[0])  # Now the most recently used
+    cache.put(keys[3], "x" * 1000)  # Over the maximum size
+
+    with pytest.raises(KeyError):
+        cache.get(keys[1])
+    for key in keys[0], keys[2], keys[3]:
+        assert cache.get(key) == "x" * 1000
+
+
+def test_parser_version():
+    """Test that the version of a parser covers the modules of the plugin it imports, also inside functions"""
+
+    sources = {}
+    _module_sources(parse_cp2k_output_advanced.__module__, sources)
+    assert set(sources) == {
+        "aiida_cp2k.utils.parser", "aiida_cp2k.utils.advanced_parser", "aiida_cp2k.utils.bands",
+        "aiida_cp2k.utils.trajectory"
+    }
+    assert parser_version(parse_cp2k_output_advanced) != parser_version(len)
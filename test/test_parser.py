@@ -7,7 +7,11 @@
 ###############################################################################
 """Test output parser."""
 import os
-from aiida_cp2k.utils.parser import _parse_bands, parse_cp2k_trajectory
+import numpy as np
+from aiida_cp2k.utils.parser import (_parse_bands, motion_step_info_to_arrays, parse_cp2k_output,
+                                     parse_cp2k_output_advanced, parse_cp2k_restart, parse_cp2k_termination,
+                                     parse_cp2k_timing, parse_cp2k_trajectory, read_output_tail)
+from aiida_cp2k.utils.resources import aggregate_resource_usage
 
 THISDIR = os.path.dirname(os.path.realpath(__file__))
 
@@ -40,6 +44,45 @@ def test_bands_parser_81():
         assert (bands[0] == [-6.84282475, 5.23143741, 5.23143741, 5.23143741, 7.89232311]).all()
 
 
+def _bands_output_81(kpoints, bands, blank_line=False):
+    """Return the band structure printed by CP2K 8.1 for the given k-points and bands of shape (nspins, nkpts, nbands).
+
+    :param blank_line: add a blank line after every block of eigenvalues.
+    """
+    lines = [" KPOINTS| Band Structure Calculation\n", f" KPOINTS| Number of k-points in set    1    {len(kpoints)}\n"]
+    for i_kpoint, kpoint in enumerate(kpoints):
+        for spin, spin_bands in enumerate(bands, 1):
+            coords = "".join(f"{coord:15.8f}" for coord in kpoint)
+            lines.append(f"#  Point {i_kpoint + 1}      Spin {spin}:{coords}       0.09090909\n")
+            lines.append("#   Band    Energy [eV]     Occupation\n")
+            for i_band, energy in enumerate(spin_bands[i_kpoint], 1):
+                lines.append(f"       {i_band}    {energy:11.8f}     1.00000000\n")
+            if blank_line:
+                lines.append("\n")
+    lines.append(" KPOINTS| Time for k-point line                                            0.027\n")
+    return lines
+
+
+def test_bands_parser_81_blocks():
+    """Test parsing several k-points, spin-polarised bands and blocks followed by a blank line (CP2K 8.1)"""
+
+    kpoints = [(0.0, 0.0, 0.0), (0.25, 0.0, 0.25), (0.5, 0.0, 0.5)]
+    bands = np.arange(2 * 3 * 4, dtype=np.float64).reshape(2, 3, 4) - 10.0
+    for blank_line in (False, True):
+        # A single k-point, not spin-polarised
+        result_kpoints, labels, result_bands = _parse_bands(_bands_output_81(kpoints[:1], bands[:1, :1], blank_line), 0,
+                                                            8.1)
+        assert result_kpoints.tolist() == [list(kpoints[0])]
+        assert labels == []
+        assert result_bands.tolist() == bands[0, :1].tolist()
+
+        # Several k-points, spin-polarised
+        result_kpoints, _, result_bands = _parse_bands(_bands_output_81(kpoints, bands, blank_line), 0, 8.1)
+        assert result_kpoints.tolist() == [list(kpoint) for kpoint in kpoints]
+        assert result_bands.shape == (2, 3, 4)
+        assert (result_bands == bands).all()
+
+
 def test_trajectory_parser_pbc():
     """Test parsing of boundary conditions from the restart-file"""
     files = ["PBC_output_xyz.restart", "PBC_output_xz.restart", "PBC_output_none.restart"]
@@ -51,3 +94,412 @@ def test_trajectory_parser_pbc():
             structure_data = parse_cp2k_trajectory(content)
 
             assert structure_data["pbc"] == boundary_cond
+
+
+def test_restart_parser():
+    """Test reading velocities, thermostat and replicated cells from a restart-file"""
+    content = """ &MOTION
+   &MD
+     &THERMOSTAT
+       &NOSE
+         LENGTH  2
+         &COORD
+              1.0E-01   2.0E-01
+         &END COORD
+         &VELOCITY
+              3.0E-01   4.0E-01
+         &END VELOCITY
+       &END NOSE
+     &END THERMOSTAT
+   &END MD
+ &END MOTION
+ &FORCE_EVAL
+   &SUBSYS
+     &CELL
+       A     2.0 0.0 0.0
+       B     0.0 2.0 0.0
+       C     0.0 0.0 3.0
+       PERIODIC  XY
+       MULTIPLE_UNIT_CELL  2 1 1
+       &CELL_REF
+         A     1.0 0.0 0.0
+       &END CELL_REF
+     &END CELL
+     &COORD
+       SCALED  T
+       O     0.0 0.0 0.0
+       H1    0.5 0.5 0.5
+     &END COORD
+     &VELOCITY
+       1.0E-04 0.0 0.0
+       0.0 2.0E-04 0.0
+       0.0 0.0 3.0E-04
+       0.0 0.0 4.0E-04
+     &END VELOCITY
+     &TOPOLOGY
+       MULTIPLE_UNIT_CELL  2 1 1
+     &END TOPOLOGY
+   &END SUBSYS
+ &END FORCE_EVAL
+"""
+    for source in (content, content.splitlines(True)):
+        restart = parse_cp2k_restart(source)
+
+        assert restart["symbols"] == ["O", "H", "O", "H"]
+        assert restart["tags"] == [0, 1, 0, 1]
+        assert restart["pbc"] == [True, True, False]
+        assert (restart["cell"] == np.diag([4.0, 2.0, 3.0])).all()
+        assert (restart["multiple_unit_cell"] == [2, 1, 1]).all()
+        assert np.allclose(restart["positions"], [[0, 0, 0], [1, 1, 1.5], [2, 0, 0], [3, 1, 1.5]])
+        assert restart["velocities"].shape == (4, 3)
+        assert restart["velocities"][3, 2] == 4.0E-04
+        assert (restart["thermostat"]["coord"] == [0.1, 0.2]).all()
+        assert (restart["thermostat"]["velocity"] == [0.3, 0.4]).all()
+
+        # The coordinates of the thermostat are not mistaken for the ones of the atoms
+        assert parse_cp2k_trajectory(source)["symbols"] == ["O", "H", "O", "H"]
+
+
+def test_advanced_parser_bsse():
+    """Test the advanced parser on the output of a BSSE run"""
+
+    with open(f"{THISDIR}/outputs/BSSE_output_v5.1_.out") as fobj:
+        result_dict = parse_cp2k_output_advanced(fobj.read())
+
+    assert result_dict["run_type"] == "BSSE"
+    assert result_dict["dft_type"] == "RKS"
+    assert result_dict["natoms"] == 57
+    assert result_dict["init_nel_spin1"] == result_dict["init_nel_spin2"] == 141
+    assert result_dict["energy_scf"] == -829.920698393915
+    assert len(result_dict["eigen_spin1_au"]) == 452
+    assert result_dict["nwarnings"] == 0
+    assert "motion_step_info" not in result_dict
+
+
+def test_advanced_parser_bands():
+    """Test the advanced parser on the output of a band structure calculation"""
+
+    with open(f"{THISDIR}/outputs/BANDS_output_v8.1.out") as fobj:
+        result_dict = parse_cp2k_output_advanced(fobj.read())
+
+    assert result_dict["run_type"] == "ENERGY_FORCE"
+    assert result_dict["smear_method"] == "FERMI_DIRAC"
+    assert result_dict["motion_step_info"]["step"] == [0]
+    assert result_dict["motion_step_info"]["energy_au"] == [result_dict["energy"]]
+    assert result_dict["kpoint_data"]["bands"].shape == (66, 5)
+    assert result_dict["nwarnings"] == 3
+
+
+def test_parsers_accept_file_handles():
+    """Test that parsing from an open file handle gives the same result as parsing the whole content"""
+
+    for fname in ["BANDS_output_v5.1.out", "BANDS_output_v8.1.out", "BSSE_output_v5.1_.out"]:
+        with open(f"{THISDIR}/outputs/{fname}") as fobj:
+            content = fobj.read()
+
+        with open(f"{THISDIR}/outputs/{fname}") as fobj:
+            assert parse_cp2k_output(fobj) == parse_cp2k_output(content)
+
+        with open(f"{THISDIR}/outputs/{fname}") as fobj:
+            streamed = parse_cp2k_output_advanced(fobj)
+        result_dict = parse_cp2k_output_advanced(content)
+        if "kpoint_data" in result_dict:
+            assert (streamed.pop("kpoint_data")["bands"] == result_dict.pop("kpoint_data")["bands"]).all()
+        if "atomic_forces" in result_dict:
+            assert (streamed.pop("atomic_forces") == result_dict.pop("atomic_forces")).all()
+        for name in ["scf_iterations", "population_analysis", "memory_usage", "fragment_energies"]:
+            for key, array in result_dict.pop(name, {}).items():
+                assert (streamed[name][key] == array).all()
+            streamed.pop(name, None)
+        assert streamed == result_dict
+
+
+def test_termination_parser():
+    """Test that the termination of CP2K is found from the end of the output only"""
+
+    for fname in ["BANDS_output_v5.1.out", "BANDS_output_v8.1.out", "BSSE_output_v5.1_.out"]:
+        with open(f"{THISDIR}/outputs/{fname}") as fobj:
+            content = fobj.read()
+        with open(f"{THISDIR}/outputs/{fname}", "rb") as fobj:
+            tail = read_output_tail(fobj, size=16 * 1024)
+        assert len(tail) <= 16 * 1024
+        assert content.endswith("\n" + tail)  # starts at a complete line
+        assert parse_cp2k_termination(tail)["status"] == "finished"
+        assert parse_cp2k_termination(tail)["nwarnings"] == parse_cp2k_output_advanced(tail)["nwarnings"]
+
+    with open(f"{THISDIR}/outputs/BSSE_output_v5.1_.out") as fobj:
+        lines = fobj.readlines()
+
+    truncated = "".join(lines[:-200])
+    assert parse_cp2k_termination(truncated)["status"] == "truncated"
+    aborted = truncated + " *** ERROR in cp_fm_cholesky_decompose ***\n ABORT\n"
+    assert parse_cp2k_termination(aborted)["status"] == "aborted"
+    assert parse_cp2k_termination(aborted)["aborted"]
+    exceeded = "".join(lines[:-60] + [" *** GEO run terminated - exceeded requested execution time ***\n"] +
+                       lines[-60:])
+    assert parse_cp2k_termination(exceeded)["status"] == "walltime_exceeded"
+
+    # Exit codes
+    assert parse_cp2k_termination(exceeded)["exit_code"] == "ERROR_OUT_OF_WALLTIME"
+    assert parse_cp2k_termination(aborted)["exit_code"] == "ERROR_OUTPUT_CONTAINS_ABORT"
+    assert parse_cp2k_termination(truncated)["exit_code"] is None
+    cholesky = truncated + "\n".join([
+        " * [ABORT]                                                                     *",
+        " *  \\___/     Cholesky decompose failed: the matrix is not positive definite or  *",
+        "MPI_ABORT was invoked on rank 0 in communicator MPI_COMM_WORLD",
+    ])
+    termination = parse_cp2k_termination(cholesky)
+    assert termination["errors"] == ["ERROR_CHOLESKY_FAILED", "ERROR_MPI_ABORT"]
+    assert termination["exit_code"] == "ERROR_CHOLESKY_FAILED"
+    assert termination["aborted"]
+    assert parse_cp2k_termination(truncated + "slurmstepd: error: Out of memory")["exit_code"] == "ERROR_OUT_OF_MEMORY"
+    # The MPI abort is only reported if CP2K itself did not abort
+    mpi_abort = "MPI_ABORT was invoked on rank 0 in communicator MPI_COMM_WORLD\n"
+    termination = parse_cp2k_termination(aborted + mpi_abort)
+    assert termination["errors"] == ["ERROR_MPI_ABORT"]
+    assert termination["exit_code"] == "ERROR_OUTPUT_CONTAINS_ABORT"
+    assert parse_cp2k_termination(truncated + mpi_abort)["exit_code"] == "ERROR_MPI_ABORT"
+    # Fatal errors only count if CP2K did not finish
+    finished = "".join(lines[:-60] + ["  Out of memory? Not really.\n"] + lines[-60:])
+    assert parse_cp2k_termination(finished)["errors"] == ["ERROR_OUT_OF_MEMORY"]
+    assert parse_cp2k_termination(finished)["exit_code"] is None
+
+
+def test_motion_step_info_to_arrays():
+    """Test the conversion of the per-step lists to typed arrays"""
+
+    with open(f"{THISDIR}/outputs/BANDS_output_v8.1.out") as fobj:
+        motion_step_info = parse_cp2k_output_advanced(fobj.read())["motion_step_info"]
+
+    arrays = motion_step_info_to_arrays(motion_step_info)
+    assert arrays.keys() == motion_step_info.keys()
+    assert arrays["step"].dtype.kind == "i"
+    assert arrays["scf_converged"].dtype == bool
+    assert arrays["energy_au"][0] == motion_step_info["energy_au"][0]
+    assert motion_step_info["dispersion_energy_au"] == [None]
+    assert np.isnan(arrays["dispersion_energy_au"]).all()
+
+
+def test_timing_parser():
+    """Test parsing the timing report from the end of the output"""
+
+    with open(f"{THISDIR}/outputs/BSSE_output_v5.1_.out", "rb") as fobj:
+        timing = parse_cp2k_timing(read_output_tail(fobj))
+
+    assert len(timing["routine"]) == 47
+    assert timing["routine"][0] == "CP2K"
+    assert timing["routine"][-1] == "pw_derive"
+    assert timing["calls"].dtype == np.int64
+    assert timing["calls"][timing["routine"] == "mp_waitall_1"] == 1163883
+    row = timing["routine"] == "dbcsr_multiply_generic"
+    assert timing["asd"][row] == 8.1
+    assert timing["self_time_average"][row] == 0.753
+    assert timing["self_time_maximum"][row] == 0.772
+    assert timing["total_time_average"][row] == 44.912
+    assert timing["total_time_maximum"][row] == 52.245
+
+    assert parse_cp2k_timing("No timing report here\n") is None
+
+
+def test_advanced_parser_atomic_forces():
+    """Test parsing the blocks of atomic forces into an array"""
+
+    block = """ ATOMIC FORCES in [a.u.]
+
+ # Atom   Kind   Element          X              Y              Z
+      1      1      O           0.00000000    -0.00000000    -0.0058334{0}
+      2      2      H           0.00000000    -0.00292312     0.0029167{0}
+      3      2      H          -0.00000000     0.00292312     0.0029167{0}
+ SUM OF ATOMIC FORCES           0.00000000    -0.00000000     0.00000000     0.00000000
+"""
+    result_dict = parse_cp2k_output_advanced("\n".join(block.format(i) for i in range(4)))
+
+    forces = result_dict["atomic_forces"]
+    assert forces.shape == (4, 3, 3)
+    assert forces[3, 0, 2] == -0.00583343
+    assert forces[1, 2, 1] == 0.00292312
+    assert result_dict["atomic_forces_unit"] == "a.u."
+    assert "atomic_forces_natoms" not in result_dict
+
+    # Blocks with different numbers of atoms are concatenated
+    ragged = block.format(0) + "\n".join(block.format(0).splitlines()[:4] + block.format(0).splitlines()[-1:])
+    result_dict = parse_cp2k_output_advanced(ragged)
+    assert result_dict["atomic_forces"].shape == (4, 3)
+    assert (result_dict["atomic_forces_natoms"] == [3, 1]).all()
+
+
+def test_advanced_parser_stress():
+    """Test parsing the stress tensor at every motion step"""
+
+    lines = [" GLOBAL| Run type                                                      CELL_OPT"]
+    for step in range(3):
+        lines += [" ENERGY| Total FORCE_EVAL ( QS ) energy [a.u.]:             -17.1{}".format(step)]
+        if step != 1:
+            lines += [
+                " STRESS| Analytical stress tensor [GPa]",
+                " STRESS|                        x                   y                   z",
+                " STRESS|      x        1.0{0}E+00       2.00000000E-01       3.00000000E-01".format(step),
+                " STRESS|      y        2.00000000E-01       4.0{0}E+00       5.00000000E-01".format(step),
+                " STRESS|      z        3.00000000E-01       5.00000000E-01       6.0{0}E+00".format(step),
+                " STRESS| 1/3 Trace                                               3.66666667E+00",
+                " STRESS| Eigenvectors and eigenvalues of the analytical stress tensor [GPa]",
+                " STRESS|                        1                   2                   3",
+                " STRESS|      x        0.10000000           0.20000000           0.30000000",
+            ]
+        lines += [" --------  Informations at step = {:5d} ------------".format(step), " " + "-" * 51]
+    result_dict = parse_cp2k_output_advanced("\n".join(lines))
+
+    stress = result_dict["motion_step_stress"]
+    assert result_dict["motion_step_info"]["step"] == [0, 1, 2]
+    assert result_dict["stress_unit"] == "GPa"
+    assert stress.shape == (3, 3, 3)
+    assert (stress[2] == [[1.02, 0.2, 0.3], [0.2, 4.02, 0.5], [0.3, 0.5, 6.02]]).all()
+    assert np.isnan(stress[1]).all()
+
+
+def test_advanced_parser_scf_iterations():
+    """Test parsing the table of every SCF iteration"""
+
+    with open(f"{THISDIR}/outputs/BANDS_output_v5.1.out") as fobj:
+        scf_iterations = parse_cp2k_output_advanced(fobj)["scf_iterations"]
+    assert list(scf_iterations["iteration"]) == list(range(1, 9))
+    assert list(scf_iterations["methods"][scf_iterations["method"][:2]]) == ["NoMix/Diag.", "Broy./Diag."]
+    assert scf_iterations["energy"][-1] == -7.9431998341
+    assert scf_iterations["convergence"][-1] == 0.00000832
+
+    lines = [
+        "  Step     Update method      Time    Convergence         Total energy    Change",
+        "  ------------------------------------------------------------------------------",
+        "     1 OT CG       0.15E+00    0.5     0.01147843     -1031.7880339373 -1.03E+03",
+        "     2 OT LS       0.23E+00    0.1                    -1032.2160296946",
+        "     3 OT CG       0.23E+00    0.3     0.00755069     -1032.2548376911 -4.67E-01",
+        "",
+        "  *** SCF run NOT converged ***",
+        "",
+        "  Step     Update method      Time    Convergence         Total energy    Change",
+        "  ------------------------------------------------------------------------------",
+        "     1 OT CG       0.15E+00    0.5     0.00147843     -1032.2548376911 -1.03E+03",
+        "",
+        "  *** SCF run converged in     1 steps ***",
+        "",
+        "     1 Not an SCF row  1.0  2.0  3.0  4.0  5.0",
+    ]
+    result_dict = parse_cp2k_output_advanced("\n".join(lines))
+    scf_iterations = result_dict["scf_iterations"]
+    assert list(scf_iterations["scf_run"]) == [0, 0, 0, 1]
+    assert list(scf_iterations["methods"]) == ["OT CG", "OT LS"]
+    assert np.isnan(scf_iterations["convergence"][1]) and np.isnan(scf_iterations["energy_change"][1])
+    assert scf_iterations["energy"][1] == -1032.2160296946
+    assert "One or more SCF run did not converge" in result_dict["warnings"]
+
+
+def test_advanced_parser_population_analysis():
+    """Test parsing the Mulliken and Hirshfeld charges and spin moments"""
+
+    with open(f"{THISDIR}/outputs/BSSE_output_v5.1_.out") as fobj:
+        population_analysis = parse_cp2k_output_advanced(fobj)["population_analysis"]
+    assert population_analysis["mulliken_natoms"].tolist() == [54, 3, 57, 57, 57]
+    assert population_analysis["mulliken_charges"].shape == (228,)
+    assert population_analysis["mulliken_charges"][54:57].tolist() == [0.480295, -0.241065, -0.239230]
+
+    lines = [
+        "                     Mulliken Population Analysis",
+        "",
+        " #  Atom  Element  Kind  Atomic population (alpha,beta) Net charge  Spin moment",
+        "       1     O        1          3.500000  3.100000      -0.600000     0.400000",
+        "       2     H        2          0.350000  0.350000       0.300000     0.000000",
+        " # Total charge and spin        3.850000  3.450000       0.000000     0.400000",
+        "",
+        "                           Hirshfeld Charges",
+        "",
+        "  #Atom  Element  Kind  Ref Charge     Population       Spin moment  Net charge",
+        "      1       O      1       6.000      3.300   3.000        0.300      -0.300",
+        "      2       H      2       1.000      0.420   0.420        0.000       0.160",
+        "",
+        "  Total Charge                                                          -0.000",
+    ]
+    population_analysis = parse_cp2k_output_advanced("\n".join(lines * 2))["population_analysis"]
+    assert population_analysis["mulliken_charges"].tolist() == [[-0.6, 0.3], [-0.6, 0.3]]
+    assert population_analysis["mulliken_spins"].tolist() == [[0.4, 0.0], [0.4, 0.0]]
+    assert population_analysis["hirshfeld_charges"][1].tolist() == [-0.3, 0.16]
+    assert population_analysis["hirshfeld_spins"][1].tolist() == [0.3, 0.0]
+    assert "mulliken_natoms" not in population_analysis
+
+
+def test_advanced_parser_resources():
+    """Test parsing the MPI/OpenMP layout, the memory and the DBCSR statistics"""
+
+    with open(f"{THISDIR}/outputs/BSSE_output_v5.1_.out") as fobj:
+        result_dict = parse_cp2k_output_advanced(fobj)
+    resources = result_dict["resources"]
+    assert resources["mpi_processes"] == 4
+    assert resources["omp_threads"] == 1
+    assert resources["peak_memory_mib"] == 302
+    assert resources["memory_total_kb"] == 32843632
+    assert resources["memory_likely_free_kb"] == 24993052
+    assert resources["dbcsr_max_memory_per_rank_bytes"] == 316.1088e06
+    assert resources["dbcsr_matmuls_total"] == 21520949
+    assert resources["dbcsr_mpi_messages"] == 289920
+    assert resources["dbcsr_settings"]["Multiplication driver"] == "BLAS"
+
+    memory_usage = result_dict["memory_usage"]
+    assert memory_usage["system_memory_fields"][0] == "MemTotal"
+    assert memory_usage["system_memory_kb"].shape == (7, 4)
+    assert memory_usage["peak_memory_mib"].tolist() == [302]
+
+    report = aggregate_resource_usage([
+        (1, resources, {
+            "resources": {
+                "num_machines": 1,
+                "num_mpiprocs_per_machine": 4
+            },
+            "max_memory_kb": 2 * 1024**2
+        }),
+        (2, resources, {
+            "resources": {
+                "num_machines": 1,
+                "num_mpiprocs_per_machine": 8
+            }
+        }),
+        (3, None, {
+            "resources": {}
+        }),
+    ])
+    assert report["pk"].tolist() == [1, 2, 3]
+    assert report["cores_usage"][:2].tolist() == [1.0, 0.5]
+    assert report["memory_used_mib"][0] == 4 * 302
+    assert report["memory_usage"][0] == 4 * 302 / 2048
+    assert report["over_provisioned"].tolist() == [False, True, False]
+
+
+def test_advanced_parser_fragment_energies():
+    """Test parsing the energies of the BSSE fragments and of the FORCE_EVALs of a MIXED run"""
+
+    with open(f"{THISDIR}/outputs/BSSE_output_v5.1_.out") as fobj:
+        result_dict = parse_cp2k_output_advanced(fobj)
+    fragment_energies = result_dict["fragment_energies"]
+    assert fragment_energies["conf"].tolist() == ["10", "01", "11", "11", "11"]
+    assert fragment_energies["subconf"].tolist() == ["10", "01", "10", "01", "11"]
+    assert fragment_energies["charge"].tolist() == [0] * 5
+    assert fragment_energies["multiplicity"].tolist() == [1] * 5
+    # The energy of a fragment is the one at the end of its outer SCF loop
+    assert fragment_energies["energy"].tolist() == [
+        -792.14621702534703, -37.76185844385889, -792.14743669572727, -37.76259020339316, -829.92069839391502
+    ]
+    assert result_dict["bsse_cp_corrected_energy"] == -829.918747
+    assert result_dict["bsse_interaction_energy"] == -0.010671
+    assert result_dict["bsse_body_orders"] == [1, 1, 2]
+    assert result_dict["bsse_body_contributions"] == [-792.146217, -37.761858, -0.010671]
+    assert "force_eval_energies" not in result_dict
+
+    lines = [
+        " ENERGY| Total FORCE_EVAL ( QS ) energy (a.u.):                          -17.100000000000000",
+        " ENERGY| Total FORCE_EVAL ( FIST ) energy (a.u.):                        -17.300000000000000",
+        " ENERGY| Total FORCE_EVAL ( MIXED ) energy (a.u.):                       -17.200000000000000",
+    ]
+    result_dict = parse_cp2k_output_advanced("\n".join(lines * 2))
+    force_eval_energies = result_dict["force_eval_energies"]
+    assert force_eval_energies["force_eval"].tolist() == [1, 2, 0, 1, 2, 0]
+    assert force_eval_energies["methods"][force_eval_energies["method"]].tolist() == ["QS", "FIST", "MIXED"] * 2
+    assert force_eval_energies["energy"].tolist() == [-17.1, -17.3, -17.2] * 2
+    assert result_dict["energy"] == -17.2
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test the parsers on the files retrieved by a calculation."""
+import io
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from aiida.common.links import LinkType
+from aiida.orm import CalcJobNode, Dict, FolderData
+
+from aiida_cp2k.parsers import Cp2kAdvancedParser, Cp2kBaseParser, Cp2kToolsParser
+
+from test_pdos import PDOS_O
+from test_trajectory import write_dcd
+
+THISDIR = os.path.dirname(os.path.realpath(__file__))
+
+MD_OUTPUT = """ CP2K| version string:                                          CP2K version 7.1
+ GLOBAL| Run type                                                             MD
+ MD| Ensemble Type                                                           NVT
+ ENERGY| Total FORCE_EVAL ( QS ) energy [a.u.]:              -34.233017
+ INITIAL PRESSURE[bar]        =                                  1.00000000E+02
+ ENERGY| Total FORCE_EVAL ( QS ) energy [a.u.]:              -34.232604
+ STEP NUMBER                  =                                              1
+ PRESSURE [bar]               =        2.00000000E+02   1.50000000E+02
+ ENERGY| Total FORCE_EVAL ( QS ) energy [a.u.]:              -34.231573
+ STEP NUMBER                  =                                              2
+ PRESSURE [bar]               =        3.00000000E+02   2.00000000E+02
+
+ The number of warnings for this run is : 0
+
+  **** **** ******  **  PROGRAM ENDED AT                 2021-01-15 16:17:25.880
+"""
+
+MD_ENER = """#     Step Nr.          Time[fs]        Kin.[a.u.]          Temp[K]            Pot.[a.u.]
+         0            0.000000         0.008316370       350.000000000       -34.233017234       -34.224700864         0.0
+         1            0.500000         0.007906484       332.749713186       -34.232604148       -34.224697663         1.1
+         2            1.000000         0.006875123       289.345678901       -34.231573109       -34.224697986         1.0
+"""
+
+MD_CELL = """#   Step   Time [fs]       Ax [Angstrom]       Ay [Angstrom] ...
+       0       0.000   10.0 0.0 0.0   0.0 11.0 0.0   0.0 0.0 12.0   1320.0
+       2       1.000   10.1 0.0 0.0   0.0 11.0 0.0   0.0 0.0 12.0   1333.2
+"""
+
+
+@pytest.fixture
+def retrieved_calculation(aiida_localhost, clear_database):  # pylint: disable=unused-argument
+    """Return a function that creates a finished CP2K calculation, with the given settings, that retrieved the given
+    files."""
+
+    def create(files, settings=None):
+        calculation = CalcJobNode(computer=aiida_localhost, process_type='aiida.calculations:cp2k')
+        calculation.set_attribute('output_filename', 'aiida.out')
+        if settings is not None:
+            calculation.add_incoming(Dict(dict=settings).store(), link_type=LinkType.INPUT_CALC, link_label='settings')
+        calculation.store()
+        retrieved = FolderData()
+        for fname, content in files.items():
+            retrieved.put_object_from_filelike(io.StringIO(content), fname)
+        retrieved.add_incoming(calculation, link_type=LinkType.CREATE, link_label='retrieved')
+        retrieved.store()
+        return calculation
+
+    return create
+
+
+def test_md_tables_preferred(retrieved_calculation):  # pylint: disable=redefined-outer-name
+    """Test that the energy and the cell at every MD step are taken from the MD tables, when they were retrieved"""
+
+    calculation = retrieved_calculation({'aiida.out': MD_OUTPUT, 'aiida-1.ener': MD_ENER, 'aiida-1.cell': MD_CELL})
+    parser = Cp2kAdvancedParser(calculation)
+    assert parser.parse().status == 0
+
+    steps = parser.outputs.output_motion_step_info
+    assert steps.get_array('step').tolist() == [0, 1, 2]
+    assert steps.get_array('energy_au').tolist() == [-34.233017234, -34.232604148, -34.231573109]
+    assert steps.get_array('pressure_bar').tolist() == [100.0, 200.0, 300.0]  # Only printed in the output
+    assert np.isnan(steps.get_array('cell_a_angs')[1])  # Not in the .cell table
+    assert steps.get_array('cell_a_angs')[[0, 2]].tolist() == [10.0, 10.1]
+    assert steps.get_array('cell_vol_angs3')[2] == 1333.2
+    assert np.allclose(steps.get_array('cell_gam_deg')[[0, 2]], 90.0)
+    assert parser.outputs.output_md_ener.get_array('step').tolist() == [0, 1, 2]
+    assert parser.outputs.output_parameters['termination']['status'] == 'finished'
+
+    # Without the tables, the values printed in the output are used
+    parser = Cp2kAdvancedParser(retrieved_calculation({'aiida.out': MD_OUTPUT}))
+    assert parser.parse().status == 0
+    assert parser.outputs.output_motion_step_info.get_array('energy_au').tolist() == [
+        -34.233017, -34.232604, -34.231573
+    ]
+
+
+def test_temporary_files(retrieved_calculation, tmpdir):  # pylint: disable=redefined-outer-name
+    """Test that the files retrieved only temporarily, e.g. with the 'compact' profile, are parsed"""
+
+    shutil.copy(os.path.join(THISDIR, "outputs", "PBC_output_xyz.restart"), str(tmpdir.join("aiida-1.restart")))
+    positions = np.zeros((3, 2, 3), dtype=np.float32)
+    write_dcd(str(tmpdir.join("aiida-pos-1.dcd")), positions, [(4.0, 4.0, 4.737166, 90.0, 90.0, 90.0)] * 3)
+    tmpdir.join("aiida-1.ener").write(MD_ENER)
+    tmpdir.join("aiida-1.cell").write(MD_CELL)
+    tmpdir.join("aiida-ALPHA_k1-1.pdos").write(PDOS_O)
+
+    calculation = retrieved_calculation({'aiida.out': MD_OUTPUT})
+    parser = Cp2kAdvancedParser(calculation)
+    assert parser.parse(retrieved_temporary_folder=str(tmpdir)).status == 0
+
+    assert parser.outputs.output_structure.get_ase().get_chemical_symbols() == ['H', 'H']
+    assert parser.outputs.output_trajectory.numsteps == 3
+    assert parser.outputs.output_md_ener.get_array('step').tolist() == [0, 1, 2]
+    assert parser.outputs.output_md_cell.get_array('step').tolist() == [0, 2]
+    assert parser.outputs.output_pdos.get_array('kinds').tolist() == ['O']
+    assert parser.outputs.output_motion_step_info.get_array('energy_au')[2] == -34.231573109
+    assert calculation.outputs.retrieved.list_object_names() == ['aiida.out']
+
+
+def test_error_before_tail(retrieved_calculation):  # pylint: disable=redefined-outer-name
+    """Test that an error followed by a traceback longer than the end of the output read is found"""
+
+    traceback = "#{:<4d} 0x7f0c2d9f1c7a in ???\n"
+    output = MD_OUTPUT.split(" ENERGY|")[0] + "forrtl: severe (41): insufficient virtual memory, Out of memory\n"
+    output += "".join(traceback.format(i) for i in range(20000))
+    parser = Cp2kBaseParser(retrieved_calculation({'aiida.out': output}))
+    assert parser.parse().status == parser.exit_codes.ERROR_OUT_OF_MEMORY.status
+
+
+@pytest.mark.parametrize('settings',
+                         [None, {
+                             'parser_options': {
+                                 'tools_streaming': True,
+                                 'tools_blocks': ['energies']
+                             }
+                         }])
+def test_tools_parser_abort(retrieved_calculation, settings):  # pylint: disable=redefined-outer-name
+    """Test that the cp2k-output-tools parser reports an aborted run, whatever the blocks it keeps"""
+
+    banner = " * [ABORT]                                                                     *\n"
+    output = MD_OUTPUT.replace(" The number of warnings", banner + " The number of warnings")
+    parser = Cp2kToolsParser(retrieved_calculation({'aiida.out': output}, settings))
+    assert parser.parse().status == parser.exit_codes.ERROR_OUTPUT_CONTAINS_ABORT.status
+    assert 'output_parameters' not in parser.outputs
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test the reader of the PDOS files."""
+import os
+
+import numpy as np
+import pytest
+
+from aiida_cp2k.utils.pdos import parse_cp2k_pdos, parse_cp2k_pdos_file
+
+PDOS_O = """\
+# Projected DOS for atomic kind O at iteration step i =        0, E(Fermi) =    -0.200132 a.u.
+#     MO Eigenvalue [a.u.]      Occupation                 s                py                pz                px               d-2               d-1                d0               d+1               d+2
+     1        -0.93219840    2.00000000    0.80000000    0.01000000    0.02000000    0.03000000    0.00100000    0.00200000    0.00300000    0.00400000    0.00500000
+     2        -0.48512345    2.00000000    0.10000000    0.20000000    0.30000000    0.10000000    0.00000000    0.00000000    0.00000000    0.00000000    0.00000000
+     3         0.05123456    0.00000000    0.01000000    0.02000000    0.03000000    0.04000000    0.05000000    0.06000000    0.07000000    0.08000000    0.09000000
+"""
+
+PDOS_H = """\
+# Projected DOS for atomic kind H at iteration step i =        0, E(Fermi) =    -0.200132 a.u.
+#     MO Eigenvalue [a.u.]      Occupation                 s                py                pz                px
+     1        -0.93219840    2.00000000    0.10000000    0.00100000    0.00200000    0.00300000
+     2        -0.48512345    2.00000000    0.20000000    0.01000000    0.02000000    0.03000000
+     3         0.05123456    0.00000000    0.30000000    0.10000000    0.20000000    0.30000000
+"""
+
+
+def test_pdos_file():
+    """Test loading the PDOS file of one atomic kind"""
+
+    pdos = parse_cp2k_pdos_file(PDOS_O)
+    assert pdos["kind"] == "O"
+    assert pdos["fermi_energy"] == -0.200132
+    assert pdos["channels"] == ["s", "py", "pz", "px", "d-2", "d-1", "d0", "d+1", "d+2"]
+    assert pdos["eigenvalues"].tolist() == [-0.93219840, -0.48512345, 0.05123456]
+    assert pdos["occupations"].tolist() == [2.0, 2.0, 0.0]
+    assert pdos["pdos"].shape == (3, 9)
+    assert pdos["pdos"][2, 8] == 0.09
+
+    with pytest.raises(ValueError):
+        parse_cp2k_pdos_file(PDOS_O.replace("d+2\n", "\n"))
+    with pytest.raises(ValueError):
+        parse_cp2k_pdos_file("# Not a PDOS file\n")
+
+
+def test_pdos_files(tmpdir):
+    """Test combining the PDOS files of all the kinds and spins"""
+
+    for fname, content in [("aiida-ALPHA_k1-1.pdos", PDOS_O), ("aiida-BETA_k1-1.pdos", PDOS_O),
+                           ("aiida-ALPHA_k2-1.pdos", PDOS_H),
+                           ("aiida-BETA_k2-1.pdos", PDOS_H.replace("0.3000", "0.4000"))]:
+        tmpdir.join(fname).write(content)
+
+    pdos = parse_cp2k_pdos(sorted(os.listdir(tmpdir)) + ["aiida.out"],
+                           open_file=lambda fname: open(tmpdir.join(fname)),
+                           max_workers=2)
+    assert pdos["kinds"].tolist() == ["O", "H"]
+    assert pdos["channels"].tolist() == ["s", "py", "pz", "px", "d-2", "d-1", "d0", "d+1", "d+2"]
+    assert pdos["pdos"].shape == (2, 2, 3, 9)
+    assert pdos["eigenvalues"].shape == pdos["occupations"].shape == (2, 3)
+    assert pdos["fermi_energy"].tolist() == [-0.200132, -0.200132]
+    assert pdos["pdos"][1, 0, 2].tolist() == [0.3, 0.1, 0.2, 0.3, 0, 0, 0, 0, 0]
+    assert pdos["pdos"][1, 1, 2, 0] == 0.4
+    np.testing.assert_array_equal(pdos["pdos"][0, 0], parse_cp2k_pdos_file(PDOS_O)["pdos"])
+
+    assert parse_cp2k_pdos(["aiida.out"]) is None
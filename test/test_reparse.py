@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test the bulk re-parsing of calculations."""
+import os
+
+import pytest
+
+from aiida.common.links import LinkType
+from aiida.orm import CalcJobNode, FolderData
+
+from aiida_cp2k.utils.parser import parse_cp2k_output
+from aiida_cp2k.utils.reparse import REPARSE_RESULT_EXTRA, REPARSE_VERSION_EXTRA, reparse_calculations
+
+THISDIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def crash_on_bands(handle):
+    """Parse an output, crashing the worker process on a band structure calculation."""
+    content = handle.read()
+    if 'KPOINTS| Band Structure Calculation' in content:
+        os._exit(1)  # pylint: disable=protected-access
+    return parse_cp2k_output(content)
+
+
+def _cp2k_calculation(computer, output):
+    """Create a finished CP2K calculation that retrieved the given output."""
+    calculation = CalcJobNode(computer=computer, process_type='aiida.calculations:cp2k')
+    calculation.set_attribute('output_filename', 'aiida.out')
+    calculation.store()
+    retrieved = FolderData()
+    if output is not None:
+        retrieved.put_object_from_file(os.path.join(THISDIR, 'outputs', output), 'aiida.out')
+    retrieved.add_incoming(calculation, link_type=LinkType.CREATE, link_label='retrieved')
+    retrieved.store()
+    return calculation
+
+
+def test_reparse(aiida_localhost, clear_database):  # pylint: disable=unused-argument
+    """Test re-parsing calculations in parallel, and resuming"""
+
+    bsse = _cp2k_calculation(aiida_localhost, 'BSSE_output_v5.1_.out')
+    bands = _cp2k_calculation(aiida_localhost, 'BANDS_output_v8.1.out')
+    missing = _cp2k_calculation(aiida_localhost, None)
+
+    progress = []
+    failures = reparse_calculations(workers=2, batch_size=1, progress=lambda *args: progress.append(args[:2]))
+
+    assert list(failures) == [missing.pk]
+    assert progress[-1] == (2, 3)
+    # The floats of the extras are stored with 14 significant digits
+    assert bsse.get_extra(REPARSE_RESULT_EXTRA)['energy_scf'] == pytest.approx(-829.920698393915, abs=1e-10)
+    # Only the scalars are stored, not the arrays
+    assert bands.get_extra(REPARSE_RESULT_EXTRA)['cp2k_version'] == 8.1
+    assert bands.get_extra(REPARSE_RESULT_EXTRA)['kpoint_data'] == {'bands_unit': 'eV'}
+    assert REPARSE_VERSION_EXTRA not in missing.extras
+
+    # Only the failed calculation is tried again
+    progress = []
+    failures = reparse_calculations(workers=1, progress=lambda *args: progress.append(args[:2]))
+    assert list(failures) == [missing.pk]
+    assert progress == [(0, 1)]
+
+
+def test_reparse_worker_crash(aiida_localhost, clear_database):  # pylint: disable=unused-argument
+    """Test that the crash of a worker only fails the calculations not parsed yet"""
+
+    bsse = _cp2k_calculation(aiida_localhost, 'BSSE_output_v5.1_.out')
+    bands = _cp2k_calculation(aiida_localhost, 'BANDS_output_v8.1.out')
+    after = _cp2k_calculation(aiida_localhost, 'BSSE_output_v5.1_.out')
+
+    failures = reparse_calculations(parser=crash_on_bands, workers=1, batch_size=1)
+
+    assert sorted(failures) == [bands.pk, after.pk]
+    assert 'nwarnings' in bsse.get_extra(REPARSE_RESULT_EXTRA)  # Parsed before the crash, and stored
+    assert REPARSE_VERSION_EXTRA not in bands.extras
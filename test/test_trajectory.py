@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test trajectory readers."""
+import io
+import struct
+
+import numpy as np
+import pytest
+
+from aiida_cp2k.utils.trajectory import DcdTrajectory, parse_cp2k_md_table, parse_xyz_trajectory
+
+
+def _record(payload, endian="<"):
+    """Wrap a payload in Fortran record markers."""
+    marker = struct.pack(f"{endian}i", len(payload))
+    return marker + payload + marker
+
+
+def write_dcd(fname, positions, cellpars, steps=(0, 1), endian="<"):
+    """Write a DCD file as CP2K does: cells are (a, gamma, b, beta, alpha, c), positions in single precision.
+
+    The frames are written every `steps[1]` steps, starting from step `steps[0]`.
+    """
+    icntrl = [0, steps[0], steps[1], 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 24]
+    header = b"CORD" + struct.pack(f"{endian}20i", *icntrl)
+    title = struct.pack(f"{endian}i", 1) + b"AiiDA-CP2K test".ljust(80)
+    with open(fname, "wb") as fobj:
+        fobj.write(_record(header, endian) + _record(title, endian))
+        fobj.write(_record(struct.pack(f"{endian}i", positions.shape[1]), endian))
+        for frame, cellpar in zip(positions, cellpars):
+            fobj.write(_record(struct.pack(f"{endian}6d", *(cellpar[i] for i in (0, 5, 1, 4, 3, 2))), endian))
+            for axis in range(3):
+                fobj.write(_record(frame[:, axis].astype(f"{endian}f4").tobytes(), endian))
+
+
+def test_dcd_reader(tmpdir):
+    """Test reading positions, cells and steps from a DCD trajectory, with striding"""
+
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(0, 10, size=(7, 5, 3)).astype(np.float32)
+    cellpars = [(10.0 + i, 11.0, 12.0, 90.0, 90.0, 120.0) for i in range(7)]
+    fname = str(tmpdir.join("aiida-pos-1.dcd"))
+
+    for endian in "<>":
+        write_dcd(fname, positions, cellpars, steps=(10, 5), endian=endian)
+        traj = DcdTrajectory(fname)
+        assert len(traj) == 7
+        assert traj.natoms == 5
+        assert (traj.get_positions() == positions).all()
+        assert (traj.get_positions(1, None, 3) == positions[1::3]).all()
+        assert (traj.get_stepids(step=2) == [10, 20, 30, 40]).all()
+        cells = traj.get_cells(step=6)
+        assert cells.shape == (2, 3, 3)
+        assert np.allclose(cells[1, 0], [16.0, 0.0, 0.0])
+        assert np.allclose(np.linalg.norm(cells[1], axis=1), [16.0, 11.0, 12.0])
+        assert np.isclose(np.degrees(np.arccos(np.dot(cells[1, 0], cells[1, 1]) / 16.0 / 11.0)), 120.0)
+
+    # An incomplete last frame is ignored
+    with open(fname, "ab") as fobj:
+        fobj.write(b"\0" * 20)
+    with open(fname, "rb") as fobj:
+        assert len(DcdTrajectory(fobj)) == 7
+
+
+def test_dcd_reader_memory(tmpdir):
+    """Test that the positions stay in single precision and that the stride is fitted to a memory bound"""
+
+    fname = str(tmpdir.join("aiida-pos-1.dcd"))
+    write_dcd(fname, np.zeros((10, 4, 3)), [(10.0, 10.0, 10.0, 90.0, 90.0, 90.0)] * 10)
+    traj = DcdTrajectory(fname)
+    assert traj.get_positions().dtype == np.float32
+    assert traj.get_positions(dtype=np.float64).dtype == np.float64
+
+    # A frame takes 4 * 3 * 8 bytes of positions and 9 * 8 bytes of cell in double precision
+    frame_bytes = 4 * 3 * 8 + 9 * 8
+    assert traj.fit_step(10 * frame_bytes, itemsize=8) == 1
+    assert traj.fit_step(10 * frame_bytes, step=3, itemsize=8) == 3
+    assert traj.fit_step(4 * frame_bytes, itemsize=8) == 3
+    assert len(traj.get_positions(step=traj.fit_step(4 * frame_bytes, itemsize=8))) == 4
+    assert traj.fit_step(1, itemsize=8) == 10
+
+
+def test_dcd_reader_corrupted(tmpdir):
+    """Test that wrong record markers are detected"""
+
+    fname = str(tmpdir.join("aiida-pos-1.dcd"))
+    write_dcd(fname, np.zeros((2, 3, 3)), [(10.0, 10.0, 10.0, 90.0, 90.0, 90.0)] * 2)
+    with open(fname, "r+b") as fobj:
+        fobj.seek(-4, 2)
+        fobj.write(struct.pack("<i", 4))
+
+    with pytest.raises(ValueError):
+        DcdTrajectory(fname)
+
+
+def test_md_tables():
+    """Test loading the .ener, .cell and .stress files of an MD run"""
+
+    header = ("#     Step Nr.          Time[fs]        Kin.[a.u.]          Temp[K]            Pot.[a.u.]"
+              "        Cons Qty[a.u.]        UsedTime[s]")
+    ener = "\n".join([
+        header,
+        "         0            0.000000         0.008316370       350.000000000"
+        "       -34.233017234       -34.224700864         0.000000000",
+        "         1            0.500000         0.007906484       332.749713186"
+        "       -34.232604148       -34.224697663         1.187216401",
+        header,
+        "         2            1.000000         0.006875123       289.345678901"
+        "       -34.231573109       -34.224697986         1.001234567",
+        "         3            1.500000         0.0058",  # Killed while writing
+    ])
+    table = parse_cp2k_md_table(ener, "ener")
+    assert table["step"].tolist() == [0, 1, 2]
+    assert table["time_fs"].tolist() == [0.0, 0.5, 1.0]
+    assert table["temperature_k"][1] == 332.749713186
+    assert table["conserved_quantity_au"][2] == -34.224697986
+
+    cell = ("#   Step   Time [fs]       Ax [Angstrom]       Ay [Angstrom]       Az [Angstrom]       Bx [Angstrom]"
+            "       By [Angstrom]       Bz [Angstrom]       Cx [Angstrom]       Cy [Angstrom]       Cz [Angstrom]"
+            "      Volume [Angstrom^3]\n"
+            "       5       2.500   10.0 0.0 0.0   0.0 11.0 0.0   0.0 0.0 12.0   1320.0\n")
+    table = parse_cp2k_md_table(io.StringIO(cell), "cell")
+    assert table["cell_angs"].shape == (1, 3, 3)
+    assert (table["cell_angs"][0] == np.diag([10.0, 11.0, 12.0])).all()
+    assert table["volume_angs3"].tolist() == [1320.0]
+
+    stress = ("#   Step   Time [fs]   xx [bar]   xy [bar]   xz [bar]   yx [bar]   yy [bar]   yz [bar]   zx [bar]"
+              "   zy [bar]   zz [bar]\n"
+              "       5       2.500   1 2 3 4 5 6 7 8 9\n")
+    assert parse_cp2k_md_table(stress, "stress")["stress_bar"][0].tolist() == [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+
+    assert parse_cp2k_md_table(stress.splitlines()[0] + "\n", "stress") is None
+    with pytest.raises(ValueError):
+        parse_cp2k_md_table(stress, "ener")
+
+
+def test_xyz_reader(tmpdir):
+    """Test streaming an XYZ trajectory, with striding and a memory bound"""
+
+    rng = np.random.default_rng(0)
+    positions = rng.random((20, 3, 3)) * 10
+    fname = str(tmpdir.join("aiida-pos-1.xyz"))
+    with open(fname, "w") as fobj:
+        for i, frame in enumerate(positions):
+            fobj.write(f"       3\n i =     {10 * i:4d}, time =     {5.0 * i:8.3f}, E =     {-17.0 - i:16.10f}\n")
+            for symbol, (x, y, z) in zip(["O", "H", "H"], frame):
+                fobj.write(f"  {symbol} {x:20.10f} {y:20.10f} {z:20.10f}\n")
+        fobj.write("       3\n i =     200, time =    100.000, E =  -37.0\n  O 1.0 2.0")  # Incomplete
+
+    with open(fname) as fobj:
+        xyz = parse_xyz_trajectory(fobj)
+    assert xyz["symbols"] == ["O", "H", "H"]
+    assert np.allclose(xyz["positions"], positions)
+    assert xyz["stepids"].tolist() == list(range(0, 200, 10))
+    assert xyz["times"][3] == 15.0
+    assert xyz["energies"][3] == -20.0
+
+    with open(fname) as fobj:
+        content = fobj.read()
+    xyz = parse_xyz_trajectory(content, step=3)
+    assert np.allclose(xyz["positions"], positions[::3])
+    assert xyz["stepids"].tolist() == list(range(0, 200, 30))
+
+    # Not more than 5 frames: the stride is increased
+    with open(fname) as fobj:
+        xyz = parse_xyz_trajectory(fobj, max_memory=5 * 3 * 3 * 8)
+    assert len(xyz["positions"]) <= 5
+    assert np.allclose(xyz["positions"], positions[::xyz["stride"]])
+
+    # If the size is not known, the frames that do not fit are not read
+    xyz = parse_xyz_trajectory(iter(content.splitlines(True)), max_memory=5 * 3 * 3 * 8)
+    assert np.allclose(xyz["positions"], positions[:5])
+
+    assert parse_xyz_trajectory("") is None
+
+    # A frame with a missing coordinate is an error, not an incomplete end of file
+    with pytest.raises(ValueError):
+        parse_xyz_trajectory("       2\n i = 0\n  O 1.0 2.0 3.0\n  H 1.0 2.0\n")
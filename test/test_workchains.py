@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Copyright (c), The AiiDA-CP2K authors.                                      #
+# SPDX-License-Identifier: MIT                                                #
+# AiiDA-CP2K is hosted on GitHub at https://github.com/aiidateam/aiida-cp2k   #
+# For further information on the license, see the LICENSE.txt file.           #
+###############################################################################
+"""Test the error handlers of the CP2K work chains."""
+import pytest
+
+from aiida.common.links import LinkType
+from aiida.engine.utils import instantiate_process
+from aiida.manage.manager import get_manager
+from aiida.orm import CalcJobNode, Code, Dict, RemoteData
+from plumpy import ProcessState
+
+from aiida_cp2k.calculations import Cp2kCalculation
+from aiida_cp2k.workchains import Cp2kBaseWorkChain
+
+
+@pytest.fixture
+def inspect_calculation(aiida_localhost, clear_database):  # pylint: disable=unused-argument
+    """Return a function that lets a base work chain inspect a calculation that failed with the given exit status, and
+    returns the work chain and the result of the inspection."""
+
+    code = Code(input_plugin_name='cp2k', remote_computer_exec=[aiida_localhost, '/bin/true']).store()
+
+    def inspect(exit_status):
+        inputs = {
+            'code': code,
+            'parameters': Dict(dict={'GLOBAL': {
+                'RUN_TYPE': 'GEO_OPT'
+            }}),
+            'metadata': {
+                'options': {
+                    'resources': {
+                        'num_machines': 1,
+                        'num_mpiprocs_per_machine': 1
+                    }
+                }
+            },
+        }
+        process = instantiate_process(get_manager().get_runner(), Cp2kBaseWorkChain, cp2k=inputs)
+        process.setup()  # pylint: disable=no-value-for-parameter
+
+        calculation = CalcJobNode(computer=aiida_localhost, process_type='aiida.calculations:cp2k')
+        calculation.set_process_state(ProcessState.FINISHED)
+        calculation.set_exit_status(exit_status)
+        calculation.store()
+        remote_folder = RemoteData(computer=aiida_localhost, remote_path='/tmp')
+        remote_folder.add_incoming(calculation, link_type=LinkType.CREATE, link_label='remote_folder')
+        remote_folder.store()
+
+        process.ctx.children = [calculation]
+        process.ctx.iteration = 1
+        return process, process.inspect_process()  # pylint: disable=no-value-for-parameter
+
+    return inspect
+
+
+@pytest.mark.parametrize('exit_code', ['ERROR_GEOMETRY_CONVERGENCE_NOT_REACHED', 'ERROR_OUT_OF_WALLTIME'])
+def test_restart_incomplete_calculation(inspect_calculation, exit_code):  # pylint: disable=redefined-outer-name
+    """Test that a calculation stopped at the maximum number of steps or by the walltime is restarted"""
+
+    process, result = inspect_calculation(getattr(Cp2kCalculation.exit_codes, exit_code).status)  # pylint: disable=no-member
+
+    assert result.status == 0  # Handled: the work chain runs the next calculation
+    assert not process.ctx.unhandled_failure
+    assert process.ctx.inputs.parent_calc_folder.get_remote_path() == '/tmp'
+    params = process.ctx.inputs.parameters.get_dict()
+    assert params['EXT_RESTART']['RESTART_FILE_NAME'] == './parent_calc/aiida-1.restart'
+    assert params['FORCE_EVAL']['DFT']['SCF']['SCF_GUESS'] == 'RESTART'
+    assert params['GLOBAL'] == {'RUN_TYPE': 'GEO_OPT'}
+
+    # The optimization is restarted with new counters, so that MAX_ITER does not stop it straight away
+    restart_counters = params['EXT_RESTART'].get('RESTART_COUNTERS', True)
+    assert restart_counters is (exit_code != 'ERROR_GEOMETRY_CONVERGENCE_NOT_REACHED')